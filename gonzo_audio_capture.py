@@ -0,0 +1,386 @@
+# מנוע לכידת שמע משותף - stream אחד ארוך-חיים לכל התקן פיזי
+import os
+import json
+import threading
+import numpy as np
+import sounddevice as sd
+from gonzo_resampler import StreamingResampler
+
+
+class DeviceCapabilityCache:
+    """Persisted per-device capabilities (the working capture rate).
+
+    Entries are keyed by device name and host API rather than by index, since
+    PortAudio indices change when devices are plugged in or removed. A cached
+    rate lets the next boot skip opening test streams on the device; when a
+    stream no longer opens at the cached rate the entry is invalidated and
+    the device probed again.
+    """
+
+    def __init__(self, path="device_cache.json"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable device cache {path}: {e}")
+
+    @staticmethod
+    def device_key(device_index):
+        """מפתח יציב להתקן: שם + host API"""
+        info = sd.query_devices(device_index)
+        hostapi = sd.query_hostapis(info['hostapi'])['name']
+        return f"{info['name']}|{hostapi}"
+
+    def get(self, key, field):
+        with self._lock:
+            return self._entries.get(key, {}).get(field)
+
+    def set(self, key, field, value):
+        """עדכון ושמירה לדיסק (כתיבה לקובץ זמני והחלפה)"""
+        with self._lock:
+            self._entries.setdefault(key, {})[field] = value
+            self._save()
+
+    def invalidate(self, key):
+        """מחיקת כל מה שנשמר להתקן (למשל כשה-stream כבר לא נפתח בקצב השמור)"""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not save device cache {self.path}: {e}")
+
+
+class AudioBlock:
+    """A pooled 16 kHz int16 buffer with a reference count.
+
+    The capture engine holds one reference while fanning a block out; every
+    subscriber that keeps the block calls retain() and later release(). When
+    the last reference is released the buffer goes back to its pool.
+    """
+
+    __slots__ = ("pool", "samples", "length", "refs", "end", "_bytes")
+
+    def __init__(self, pool, capacity):
+        self.pool = pool
+        self.samples = np.zeros(capacity, dtype=np.int16)
+        self.length = 0
+        self.refs = 0
+        # המיקום בטבעת אחרי הבלוק הזה (None כשאין טבעת או לבלוק pre-roll)
+        self.end = None
+        self._bytes = memoryview(self.samples).cast('B')
+
+    @property
+    def pcm(self):
+        """הדגימות התקפות בבלוק (view, ללא העתקה)"""
+        return self.samples[:self.length]
+
+    def view(self):
+        """memoryview של הבתים התקפים - להעברה למזהה בלי העתקה"""
+        return self._bytes[:self.length * 2]
+
+    def fill(self, samples):
+        """העתקת דגימות לבלוק (למשל קטע pre-roll)"""
+        self.end = None
+        self.length = len(samples)
+        self.samples[:self.length] = samples
+        return self
+
+    def retain(self):
+        self.pool._retain(self)
+
+    def release(self):
+        self.pool._release(self)
+
+
+class AudioBlockPool:
+    """Preallocated AudioBlocks, so the audio path does not allocate per block.
+
+    When the pool runs dry a new block is allocated and counted, which makes
+    leaks or undersized pools visible in stats().
+    """
+
+    def __init__(self, block_capacity, count=64):
+        self.block_capacity = block_capacity
+        self._lock = threading.Lock()
+        self._free = [AudioBlock(self, block_capacity) for _ in range(count)]
+        self.preallocated = count
+        self.allocations = 0       # בלוקים שהוקצו כי המאגר התרוקן
+        self.oversized = 0         # בלוקים חד-פעמיים לקלט גדול מהצפוי
+        self.acquired = 0
+
+    def acquire(self, capacity=None):
+        """בלוק פנוי עם הפניה אחת (של הקורא)"""
+        if capacity is not None and capacity > self.block_capacity:
+            with self._lock:
+                self.oversized += 1
+                self.acquired += 1
+            block = AudioBlock(self, capacity)
+            block.refs = 1
+            return block
+
+        with self._lock:
+            self.acquired += 1
+            if self._free:
+                block = self._free.pop()
+            else:
+                self.allocations += 1
+                block = AudioBlock(self, self.block_capacity)
+            block.refs = 1
+        return block
+
+    def _retain(self, block):
+        with self._lock:
+            block.refs += 1
+
+    def _release(self, block):
+        with self._lock:
+            block.refs -= 1
+            if block.refs == 0 and len(block.samples) == self.block_capacity:
+                block.length = 0
+                self._free.append(block)
+
+    def stats(self):
+        with self._lock:
+            total = self.preallocated + self.allocations
+            return {
+                "block_capacity": self.block_capacity,
+                "preallocated": self.preallocated,
+                "allocations": self.allocations,
+                "oversized_allocations": self.oversized,
+                "acquired": self.acquired,
+                "in_use": total - len(self._free),
+            }
+
+
+class AudioRingBuffer:
+    """Array-backed ring of the most recent int16 samples.
+
+    Positions are absolute sample counts since the engine started. There is a
+    single writer (the audio callback) and no lock: the writer publishes
+    `write_position` with one attribute store after the samples are in place,
+    and readers copy the requested range and then drop whatever the writer
+    overwrote meanwhile.
+    """
+
+    def __init__(self, seconds, sample_rate=16000):
+        self.sample_rate = sample_rate
+        self.capacity = max(1, int(seconds * sample_rate))
+        self._buffer = np.zeros(self.capacity, dtype=np.int16)
+        # מספר הדגימות שנכתבו מאז ההתחלה - מתעדכן רק אחרי שהנתונים בפנים
+        self.write_position = 0
+
+    def write(self, samples):
+        """כתיבת בלוק (כותב יחיד - הקולבק של ה-stream)"""
+        n = len(samples)
+        if n == 0:
+            return
+        if n > self.capacity:
+            samples = samples[-self.capacity:]
+        count = len(samples)
+
+        start = (self.write_position + n - count) % self.capacity
+        first = min(count, self.capacity - start)
+        self._buffer[start:start + first] = samples[:first]
+        if count > first:
+            self._buffer[:count - first] = samples[first:]
+
+        self.write_position += n
+
+    def position_seconds_ago(self, seconds):
+        """המיקום המוחלט של רגע בעבר (מוגבל לתחילת הטבעת)"""
+        end = self.write_position
+        return max(end - int(seconds * self.sample_rate), end - self.capacity, 0)
+
+    def read(self, start_position, end_position=None):
+        """Copy samples in [start_position, end_position).
+
+        Returns (actual_start, samples). actual_start is later than requested
+        when that part of the history has already been overwritten.
+        """
+        end = self.write_position if end_position is None else min(end_position, self.write_position)
+        start = max(start_position, end - self.capacity, 0)
+        if start >= end:
+            return end, np.zeros(0, dtype=np.int16)
+
+        first_index = start % self.capacity
+        count = end - start
+        first = min(count, self.capacity - first_index)
+        out = np.empty(count, dtype=np.int16)
+        out[:first] = self._buffer[first_index:first_index + first]
+        if count > first:
+            out[first:] = self._buffer[:count - first]
+
+        # הכותב אולי דרס את תחילת הטווח בזמן ההעתקה
+        overwritten = self.write_position - self.capacity - start
+        if overwritten > 0:
+            return start + overwritten, out[overwritten:]
+        return start, out
+
+
+class AudioCaptureEngine:
+    """A single long-lived input stream for one physical device.
+
+    The engine owns the PortAudio stream and the device's resampler, and fans
+    every 16 kHz block out to any number of subscribers (wake word, commands,
+    face interaction). Subscribing is cheap - no stream is opened.
+
+    Blocks are pooled AudioBlocks written in place by the resampler. A
+    subscriber that keeps a block must retain() it and release() it when done.
+
+    With preroll_seconds > 0 every block is also kept in an AudioRingBuffer,
+    so a new subscriber can start from a point in the past. The callback never
+    takes a lock: it writes the ring, stamps the block with its end position,
+    and only then reads the subscriber tuple. A subscriber added meanwhile may
+    therefore see a block that is also in its pre-roll - subscribe() returns
+    the pre-roll end so such blocks (block.end <= end) can be skipped.
+
+    `mute` (optional) is asked for every block; while it returns True the
+    block goes to no subscriber and the ring records silence in its place.
+
+    `pool_blocks` should cover the most blocks the subscribers can hold at
+    once (queued plus kept as padding); beyond it blocks are allocated.
+    """
+
+    def __init__(self, device_index, native_rate, target_rate=16000, block_size=1024,
+                 stream_factory=None, preroll_seconds=0, mute=None, pool_blocks=64):
+        self.device_index = device_index
+        self.native_rate = native_rate
+        self.target_rate = target_rate
+        self.block_size = block_size
+        self.stream_factory = stream_factory or sd.RawInputStream
+
+        self.resampler = StreamingResampler(native_rate, target_rate)
+        self.pool = AudioBlockPool(self.resampler.max_output_length(block_size), pool_blocks)
+        self.stream = None
+        self.ring = AudioRingBuffer(preroll_seconds, target_rate) if preroll_seconds > 0 else None
+        self.mute = mute
+        # בקשה מה-subscribe לאפס את המסנן - מבוצעת רק בקולבק, שהוא היחיד שמשתמש בו
+        self._reset_resampler = False
+
+        # רשימת מנויים כ-tuple שמוחלף בשלמותו (copy-on-write) - הקולבק קורא בלי נעילה
+        self._subscribers = ()
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self):
+        return self.stream is not None
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    @property
+    def position(self):
+        """המיקום הנוכחי בשמע (בדגימות 16kHz) - לסימון נקודת התחלה לפקודה"""
+        return self.ring.write_position if self.ring is not None else 0
+
+    def start(self):
+        """פתיחת ה-stream (פעם אחת בלבד לאורך חיי המנוע)"""
+        with self._lock:
+            if self.stream is not None:
+                return
+            stream = self.stream_factory(
+                samplerate=self.native_rate,
+                blocksize=self.block_size,
+                device=self.device_index,
+                dtype="int16",
+                channels=1,
+                callback=self._audio_callback
+            )
+            stream.start()
+            self.stream = stream
+        print(f"Capture engine started on device {self.device_index} at {self.native_rate}Hz")
+
+    def stop(self):
+        """סגירת ה-stream"""
+        with self._lock:
+            stream, self.stream = self.stream, None
+        if stream is not None:
+            try:
+                stream.stop()
+                stream.close()
+            except Exception as e:
+                print(f"Error closing capture engine on device {self.device_index}: {e}")
+
+    def subscribe(self, callback, preroll_from=None):
+        """הרשמה לקבלת בלוקים של 16kHz int16 (AudioBlock)
+
+        Args:
+            callback: פונקציה שמקבלת כל בלוק חדש
+            preroll_from: מיקום בעבר (בדגימות) שממנו להחזיר את השמע שכבר נלכד
+        Returns:
+            tuple: (preroll_end, samples) - השמע מ-preroll_from ועד preroll_end. בלוקים
+                חיים עם block.end <= preroll_end כבר כלולים בו (None כשאין טבעת)
+        """
+        with self._lock:
+            if callback not in self._subscribers:
+                if not self._subscribers and self.ring is None:
+                    # המסנן לא הוזן בזמן שלא היו מנויים - האיפוס עצמו נעשה ב-thread של הקולבק,
+                    # שאולי נמצא עכשיו באמצע process_into
+                    self._reset_resampler = True
+                self._subscribers = self._subscribers + (callback,)
+        if self.ring is None:
+            return None, np.zeros(0, dtype=np.int16)
+
+        # נקרא אחרי ההוספה: כל בלוק שנכתב אחרי הנקודה הזו יגיע גם ל-callback
+        preroll_end = self.ring.write_position
+        if preroll_from is None:
+            return preroll_end, np.zeros(0, dtype=np.int16)
+        _, samples = self.ring.read(preroll_from, preroll_end)
+        return preroll_end, samples
+
+    def unsubscribe(self, callback):
+        """ביטול הרשמה"""
+        with self._lock:
+            self._subscribers = tuple(cb for cb in self._subscribers if cb != callback)
+
+    def _audio_callback(self, indata, frames, time_info, status):
+        """קולבק PortAudio - resample פעם אחת ופיזור לכל המנויים"""
+        if status:
+            print(f"Error in capture device {self.device_index}: {status}")
+
+        if self.ring is None and not self._subscribers:
+            return
+
+        if self._reset_resampler:
+            self._reset_resampler = False
+            self.resampler.reset()
+
+        samples = np.frombuffer(indata, dtype=np.int16)
+        block = self.pool.acquire(self.resampler.max_output_length(len(samples)))
+        block.length = self.resampler.process_into(samples, block.samples)
+
+        try:
+            muted = self.mute is not None and self.mute()
+            if muted:
+                # חצי-דופלקס: השמע של הרמקול לא מגיע למזהים, וב-pre-roll נשמר שקט במקומו
+                block.pcm[:] = 0
+
+            # בלי נעילה: קודם הטבעת, ורק אחר כך צילום המנויים - מנוי שנוסף בינתיים
+            # מקבל את הבלוק גם ב-pre-roll וגם כאן, ומזהה את הכפילות לפי block.end
+            if self.ring is not None:
+                self.ring.write(block.pcm)
+                block.end = self.ring.write_position
+            subscribers = () if muted else self._subscribers
+
+            for callback in subscribers:
+                try:
+                    callback(block)
+                except Exception as e:
+                    print(f"Error in audio subscriber: {e}")
+        finally:
+            # ההפניה של המנוע - מנויים ששמרו את הבלוק החזיקו הפניה משלהם
+            block.release()
@@ -0,0 +1,184 @@
+# מקור שמע מקבצי WAV - מחליף את sd.RawInputStream לבדיקות ומדידות בלי מיקרופון
+import os
+import json
+import time
+import wave
+import threading
+import numpy as np
+from gonzo_resampler import StreamingResampler
+
+
+def load_wav(path, sample_rate=None):
+    """קריאת קובץ WAV כ-int16 מונו, עם דגימה מחדש אם צריך
+
+    Returns:
+        tuple: (samples, sample_rate)
+    """
+    with wave.open(path, 'rb') as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.int16) - 128) << 8
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype=np.int16)
+    elif width == 4:
+        samples = (np.frombuffer(raw, dtype=np.int32) >> 16).astype(np.int16)
+    else:
+        raise ValueError(f"Unsupported sample width {width} in {path}")
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+
+    if sample_rate and sample_rate != rate:
+        samples = StreamingResampler(rate, sample_rate).process_array(samples)
+        rate = sample_rate
+
+    return samples, rate
+
+
+class ReplayClip:
+    """קטע שמע אחד עם התוויות שלו (אם יש)"""
+
+    def __init__(self, path, samples, label=None):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.samples = samples
+        self.label = label or {}
+
+
+class WavReplaySource:
+    """Feeds WAV files to GonzoSTT through the same callback as a live stream.
+
+    Pass it as GonzoSTT(config, audio_source=source). Clips are played one
+    after the other with a short gap of silence, either in real time or as
+    fast as the consumer allows (see `backpressure`). With `start_gate` the
+    replay waits until it returns True before the first block, so audio is
+    not played to a consumer that has not subscribed yet.
+
+    A directory may hold a labels.json file:
+        {"clip.wav": {"wake": true, "wake_end": 1.2, "command": "turn on the light"}}
+    """
+
+    def __init__(self, paths, sample_rate=None, realtime=True, gap_seconds=1.0, backpressure=None,
+                 start_gate=None):
+        if isinstance(paths, str):
+            paths = [paths]
+
+        self.realtime = realtime
+        self.gap_seconds = gap_seconds
+        # בריצה מהירה: פונקציה שמחזירה True כשהצרכן מוכן לבלוק הבא
+        self.backpressure = backpressure
+        # פונקציה שמחזירה True כשאפשר להתחיל להשמיע (למשל כשהמאזין נרשם)
+        self.start_gate = start_gate
+
+        self.clips = []
+        for path in paths:
+            if os.path.isdir(path):
+                sample_rate = self._load_directory(path, sample_rate)
+            else:
+                samples, rate = load_wav(path, sample_rate)
+                sample_rate = sample_rate or rate
+                self.clips.append(ReplayClip(path, samples))
+
+        if not self.clips:
+            raise FileNotFoundError(f"No WAV files found in {paths}")
+        self.sample_rate = sample_rate
+
+        # מצב ההשמעה - לקריאה ע"י כלי המדידה
+        self.current_clip = None
+        self.clip_time = 0.0
+        self.audio_seconds = 0.0
+        self.finished = threading.Event()
+
+    def _load_directory(self, directory, sample_rate):
+        """טעינת כל קבצי ה-WAV בתיקייה - מחזיר את קצב הדגימה המשותף"""
+        labels = {}
+        labels_path = os.path.join(directory, 'labels.json')
+        if os.path.exists(labels_path):
+            with open(labels_path, 'r', encoding='utf-8') as f:
+                labels = json.load(f)
+
+        for name in sorted(os.listdir(directory)):
+            if not name.lower().endswith('.wav'):
+                continue
+            path = os.path.join(directory, name)
+            samples, rate = load_wav(path, sample_rate)
+            sample_rate = sample_rate or rate
+            self.clips.append(ReplayClip(path, samples, labels.get(name)))
+        return sample_rate
+
+    def open_stream(self, samplerate, blocksize, device=None, dtype="int16", channels=1, callback=None):
+        """אותה חתימה כמו sd.RawInputStream"""
+        if samplerate != self.sample_rate:
+            raise ValueError(f"Replay source is {self.sample_rate}Hz, stream requested {samplerate}Hz")
+        return WavReplayStream(self, blocksize, callback)
+
+
+class WavReplayStream:
+    """Stream object returned by WavReplaySource.open_stream"""
+
+    def __init__(self, source, blocksize, callback):
+        self.source = source
+        self.blocksize = blocksize
+        self.callback = callback
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2)
+
+    def close(self):
+        self.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _run(self):
+        source = self.source
+        rate = source.sample_rate
+        gap = np.zeros(int(source.gap_seconds * rate), dtype=np.int16)
+        if source.start_gate is not None:
+            while self.running and not source.start_gate():
+                time.sleep(0.001)
+        start_time = time.time()
+        delivered = 0
+
+        for clip in source.clips:
+            source.current_clip = clip
+            # קטע שקט אחרי כל קליפ כדי שהמזהה יסגור את המשפט
+            audio = np.concatenate((clip.samples, gap))
+
+            for offset in range(0, len(audio) - self.blocksize + 1, self.blocksize):
+                if not self.running:
+                    return
+                block = audio[offset:offset + self.blocksize]
+
+                if source.realtime:
+                    delay = start_time + delivered / rate - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+                elif source.backpressure is not None:
+                    while self.running and not source.backpressure():
+                        time.sleep(0.001)
+
+                self.callback(block.tobytes(), self.blocksize, None, None)
+                delivered += self.blocksize
+                source.clip_time = (offset + self.blocksize) / rate
+                source.audio_seconds = delivered / rate
+
+        source.finished.set()
@@ -0,0 +1,80 @@
+# תיאום חצי-דופלקס בין הרמקול למיקרופונים - בזמן ש-Gonzo מדבר השמע לא מפוענח
+import time
+import threading
+from contextlib import contextmanager
+
+
+class AudioSessionCoordinator:
+    """Shared playback state between GonzoTTS and GonzoSTT.
+
+    GonzoTTS wraps every utterance in playback(); the capture engines ask
+    skip() for every block. While anything is playing, and for `tail_guard`
+    seconds after it ends (room echo, device buffers), skip() is True: the
+    block is counted and neither decoded nor kept in the pre-roll ring.
+
+    `generation` is advanced whenever playback starts, so a decoder can tell
+    that audio was cut out and reset its state before decoding again.
+    """
+
+    def __init__(self, tail_guard=0.3, enabled=True):
+        self.tail_guard = tail_guard
+        self.enabled = enabled
+        self.generation = 0
+        self._active = 0
+        self._guard_until = 0.0
+        self._started = None
+        self._lock = threading.Lock()
+
+        # מדדים
+        self.playbacks = 0
+        self.playback_seconds = 0.0
+        self.skipped = {}
+
+    def playback_started(self):
+        with self._lock:
+            if self._active == 0:
+                self.generation += 1
+                self._started = time.monotonic()
+            self._active += 1
+
+    def playback_finished(self):
+        with self._lock:
+            self._active = max(0, self._active - 1)
+            if self._active == 0:
+                now = time.monotonic()
+                self._guard_until = now + self.tail_guard
+                if self._started is not None:
+                    self.playbacks += 1
+                    self.playback_seconds += now - self._started
+                    self._started = None
+
+    @contextmanager
+    def playback(self):
+        """with session.playback(): ... - המיקרופונים מושתקים עד tail_guard אחרי הסוף"""
+        self.playback_started()
+        try:
+            yield
+        finally:
+            self.playback_finished()
+
+    @property
+    def is_muted(self):
+        # קריאה בלי נעילה - נקרא מהקולבק של השמע
+        return self.enabled and (self._active > 0 or time.monotonic() < self._guard_until)
+
+    def skip(self, stream):
+        """האם לדלג על בלוק של `stream` - ספירת הבלוקים שדולגו"""
+        if not self.is_muted:
+            return False
+        with self._lock:
+            self.skipped[stream] = self.skipped.get(stream, 0) + 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "playbacks": self.playbacks,
+                "playback_seconds": self.playback_seconds,
+                "skipped_blocks": dict(self.skipped),
+                "tail_guard": self.tail_guard,
+            }
@@ -4,6 +4,78 @@ import threading
 import time
 import numpy as np
 import os
+from collections import namedtuple
+
+# תמונה מהמצלמה עם מספר רץ וזמן הלכידה
+CameraFrame = namedtuple("CameraFrame", ["image", "sequence", "timestamp"])
+
+
+class LatestFrameBuffer:
+    """Single latest-frame slot, double buffered.
+
+    The capture thread reads into the back buffer without any lock, then
+    publish() swaps it with the front one; the old front becomes the next back
+    buffer, so once both exist no frame is allocated. Readers copy the front
+    buffer out under the lock, into an array they may reuse.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._front = None
+        self._back = None
+        self.sequence = 0
+        self.timestamp = 0.0
+        # תמונות שנדרסו לפני שמישהו קרא אותן
+        self.dropped = 0
+        self._read_sequence = 0
+
+    def back_buffer(self):
+        """המאגר שהכותב ממלא (לא נגיש לקוראים)"""
+        return self._back
+
+    def publish(self, frame, timestamp):
+        with self._condition:
+            if self.sequence > self._read_sequence:
+                self.dropped += 1
+            self._back, self._front = self._front, frame
+            self.sequence += 1
+            self.timestamp = timestamp
+            self._condition.notify_all()
+
+    def next_sequence(self):
+        """מספר רץ לתמונה שנקראה ישירות (בלי thread לכידה)"""
+        with self._condition:
+            self.sequence += 1
+            self._read_sequence = self.sequence
+            return self.sequence
+
+    def read(self, newer_than=None, timeout=None, out=None):
+        """Copy of the newest frame.
+
+        Args:
+            newer_than: מספר רץ - ממתין עד שתגיע תמונה חדשה ממנו
+            timeout: זמן המתנה מקסימלי בשניות
+            out: מערך לשימוש חוזר (מוקצה מחדש רק אם הגודל שונה)
+        Returns:
+            CameraFrame או None אם אין תמונה חדשה בזמן
+        """
+        with self._condition:
+            if newer_than is not None:
+                if not self._condition.wait_for(lambda: self.sequence > newer_than, timeout):
+                    return None
+            if self._front is None:
+                return None
+            if out is None or out.shape != self._front.shape or out.dtype != self._front.dtype:
+                out = np.empty_like(self._front)
+            np.copyto(out, self._front)
+            self._read_sequence = self.sequence
+            return CameraFrame(out, self.sequence, self.timestamp)
+
+    def wake_all(self):
+        """שחרור קוראים שממתינים (בעצירה)"""
+        with self._condition:
+            self._condition.notify_all()
+
 
 class GonzoFace:
     def __init__(self, config=None):
@@ -14,6 +86,7 @@ class GonzoFace:
         self.face_detected = False
         self.running = True
         self.language = "en"  # ברירת מחדל: אנגלית
+        self.threaded_capture = True
         
         # טעינת קונפיגורציה אם קיימת
         if config:
@@ -25,6 +98,8 @@ class GonzoFace:
                 self.show_video = config['show_video']
             if 'language' in config:
                 self.language = config['language']
+            if 'threaded_capture' in config:
+                self.threaded_capture = config['threaded_capture']
         
         # איתחול מצלמה
         try:
@@ -68,23 +143,89 @@ class GonzoFace:
         
         # מונה תמונות (למטרות דיבוג)
         self.frame_counter = 0
+        
+        # לכידה ב-thread נפרד: התמונה האחרונה בלבד נשמרת, כך שעיבוד איטי לא מייצר תור של תמונות ישנות
+        self.frame_buffer = LatestFrameBuffer()
+        self.last_sequence = 0
+        # המערך ש-get_frame ממלא שוב ושוב (מוקצה מחדש רק כשגודל התמונה משתנה)
+        self._frame_out = None
+        self.capture_running = False
+        self.capture_thread = None
+        if self.threaded_capture and self.cap is not None:
+            self.start_capture()
+    
+    def start_capture(self):
+        """הפעלת thread הלכידה"""
+        if self.capture_running:
+            return
+        self.capture_running = True
+        self.capture_thread = threading.Thread(target=self._capture_loop)
+        self.capture_thread.daemon = True
+        self.capture_thread.start()
+    
+    def stop_capture(self):
+        """עצירת thread הלכידה"""
+        self.capture_running = False
+        self.frame_buffer.wake_all()
+        if self.capture_thread and self.capture_thread.is_alive() and self.capture_thread is not threading.current_thread():
+            self.capture_thread.join(timeout=2)
+        self.capture_thread = None
+    
+    def _capture_loop(self):
+        """קריאה רצופה מהמצלמה לתוך המאגר האחורי ופרסום כתמונה האחרונה"""
+        while self.capture_running:
+            if self.cap is None or not self.cap.isOpened():
+                break
+            try:
+                ret, frame = self.cap.read(self.frame_buffer.back_buffer())
+            except cv2.error as e:
+                print(f"Camera read error: {e}")
+                ret = False
+            if not ret:
+                time.sleep(0.01)
+                continue
+            self.frame_buffer.publish(frame, time.time())
+        self.capture_running = False
+        self.frame_buffer.wake_all()
+    
+    def read_frame(self, newer_than=None, timeout=1.0, out=None):
+        """התמונה האחרונה עם מספר רץ וזמן לכידה
+        
+        Args:
+            newer_than: ממתין לתמונה חדשה מהמספר הרץ הזה (None = מחזיר מיד)
+            timeout: זמן המתנה מקסימלי בשניות
+            out: מערך לשימוש חוזר כדי לא להקצות תמונה בכל קריאה
+        Returns:
+            CameraFrame או None
+        """
+        if not self.capture_running:
+            # בלי thread לכידה - קריאה ישירה
+            if self.cap is None or not self.cap.isOpened():
+                return None
+            ret, frame = self.cap.read(out)
+            if not ret:
+                return None
+            return CameraFrame(frame, self.frame_buffer.next_sequence(), time.time())
+        return self.frame_buffer.read(newer_than, timeout, out)
     
     def get_frame(self):
-        """קבלת תמונה נוכחית מהמצלמה
+        """קבלת תמונה נוכחית מהמצלמה - ממתין לתמונה חדשה מזו שהוחזרה בפעם הקודמת
+
+        The image is written into the same array on every call, so it is valid
+        only until the next get_frame(); copy it to keep it longer.
         Returns:
             numpy.ndarray or None: מערך תמונה או None אם המצלמה לא זמינה
         """
-        if self.cap is None or not self.cap.isOpened():
-            return None
-        
-        ret, frame = self.cap.read()
-        if not ret:
+        camera_frame = self.read_frame(newer_than=self.last_sequence, out=self._frame_out)
+        if camera_frame is None:
             return None
+        self.last_sequence = camera_frame.sequence
+        self._frame_out = camera_frame.image
         
         # הגדלת מונה תמונות
         self.frame_counter += 1
         
-        return frame
+        return camera_frame.image
     
     def detect_faces(self, frame):
         """זיהוי פנים בתמונה
@@ -240,6 +381,7 @@ class GonzoFace:
     def close(self):
         """שחרור משאבים ותצוגה"""
         self.stop_detection()
+        self.stop_capture()
         
         if self.cap and self.cap.isOpened():
             self.cap.release()
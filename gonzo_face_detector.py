@@ -0,0 +1,226 @@
+# זיהוי מיקומי פנים בתמונה מוקטנת, עם קנה מידה שמתכוונן לקצב התמונות הרצוי
+import time
+import cv2
+import face_recognition
+from gonzo_face_tracker import _iou
+
+
+class AdaptiveDetectionScale:
+    """Detection scale that follows the measured time per processed frame.
+
+    HOG detection cost grows with the pixel count, i.e. with scale squared,
+    so every update moves the scale by sqrt(budget / frame_time), damped and
+    clamped to [min_scale, max_scale]. The frame time is smoothed so a single
+    slow frame (e.g. one with several new faces to encode) does not swing it.
+    """
+
+    def __init__(self, scale=0.5, target_fps=5.0, min_scale=0.25, max_scale=1.0,
+                 smoothing=0.2, adaptive=True):
+        self.scale = scale
+        self.target_fps = target_fps
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.smoothing = smoothing
+        self.adaptive = adaptive
+        self.frame_time = None
+
+    @property
+    def budget(self):
+        return 1.0 / self.target_fps
+
+    def update(self, frame_seconds):
+        """עדכון לפי זמן העיבוד של התמונה האחרונה - מחזיר את קנה המידה החדש"""
+        if self.frame_time is None:
+            self.frame_time = frame_seconds
+        else:
+            self.frame_time += self.smoothing * (frame_seconds - self.frame_time)
+
+        if self.adaptive and self.frame_time > 0:
+            ratio = (self.budget / self.frame_time) ** 0.5
+            # צעדים קטנים - הקטנה מהירה יותר מהגדלה
+            ratio = min(max(ratio, 0.8), 1.05)
+            self.scale = min(max(self.scale * ratio, self.min_scale), self.max_scale)
+        return self.scale
+
+    def stats(self):
+        return {
+            "scale": self.scale,
+            "frame_ms": (self.frame_time or 0.0) * 1000,
+            "target_fps": self.target_fps,
+        }
+
+
+def detect_face_locations(rgb_frame, scale=1.0, upsample=1):
+    """face_recognition.face_locations על תמונה מוקטנת, עם המלבנים בקואורדינטות המקור
+
+    Args:
+        rgb_frame: התמונה המלאה (RGB)
+        scale: קנה המידה לזיהוי (1.0 = גודל מלא)
+        upsample: number_of_times_to_upsample של face_recognition
+    Returns:
+        list: [(top, right, bottom, left), ...] ברזולוציה המלאה
+    """
+    if scale >= 1.0:
+        return face_recognition.face_locations(rgb_frame, number_of_times_to_upsample=upsample)
+
+    small_frame = cv2.resize(rgb_frame, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    height, width = rgb_frame.shape[:2]
+    locations = []
+    for top, right, bottom, left in face_recognition.face_locations(small_frame, number_of_times_to_upsample=upsample):
+        locations.append((
+            max(0, int(top / scale)),
+            min(width, int(right / scale)),
+            min(height, int(bottom / scale)),
+            max(0, int(left / scale)),
+        ))
+    return locations
+
+
+class StageStats:
+    """מונה ומדידת זמן לשלב אחד בגלאי"""
+
+    def __init__(self):
+        self.runs = 0
+        self.hits = 0
+        self.seconds = 0.0
+
+    def record(self, hit, seconds):
+        self.runs += 1
+        self.hits += 1 if hit else 0
+        self.seconds += seconds
+
+    def as_dict(self):
+        return {
+            "runs": self.runs,
+            "hit_rate": self.hits / self.runs if self.runs else 0.0,
+            "mean_ms": self.seconds / self.runs * 1000 if self.runs else 0.0,
+        }
+
+
+class StagedFaceDetector:
+    """Cheap stages in front of dlib HOG detection.
+
+    1. Motion: difference of a small blurred grayscale frame against the
+       previous one. Without motion the scene is unchanged and the previous
+       locations are returned as they are.
+    2. Haar: the GonzoFace cascade on the small grayscale frame gives
+       candidate regions. No candidates means no faces.
+    3. HOG: face_recognition.face_locations runs only inside each candidate
+       region (expanded by `roi_margin`), at full resolution - the regions
+       are small already, and downscaling them would push faces below the
+       ~40 px HOG minimum. The adaptive scale applies to full-frame searches.
+
+    Every `refresh_interval` seconds the first two stages are bypassed and
+    the whole frame is searched, so a face the cheap stages miss (a still
+    person, a profile Haar does not see) is picked up eventually.
+    """
+
+    def __init__(self, cascade=None, motion_width=160, motion_threshold=25, motion_fraction=0.002,
+                 haar_width=320, roi_margin=0.4, refresh_interval=5.0):
+        self.cascade = cascade
+        self.motion_width = motion_width
+        self.motion_threshold = motion_threshold
+        self.motion_fraction = motion_fraction
+        self.haar_width = haar_width
+        self.roi_margin = roi_margin
+        self.refresh_interval = refresh_interval
+
+        self._previous = None
+        self._last_locations = []
+        self._last_full_search = None
+
+        self.motion = StageStats()
+        self.haar = StageStats()
+        self.hog = StageStats()
+        self.full_searches = 0
+
+    def _has_motion(self, frame):
+        height, width = frame.shape[:2]
+        scale = self.motion_width / float(width)
+        small = cv2.resize(frame, (self.motion_width, max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        previous, self._previous = self._previous, gray
+        if previous is None or previous.shape != gray.shape:
+            return True
+        changed = cv2.countNonZero(cv2.threshold(cv2.absdiff(gray, previous), self.motion_threshold, 255,
+                                                 cv2.THRESH_BINARY)[1])
+        return changed >= self.motion_fraction * gray.size
+
+    def _haar_regions(self, frame):
+        """מלבני מועמדים מה-Haar בקואורדינטות המקור (top, right, bottom, left)"""
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.haar_width / float(width))
+        small = cv2.resize(frame, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else frame
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        faces = self.cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=4, minSize=(20, 20))
+
+        regions = []
+        for (x, y, w, h) in faces:
+            margin_x, margin_y = w * self.roi_margin, h * self.roi_margin
+            regions.append((
+                max(0, int((y - margin_y) / scale)),
+                min(width, int((x + w + margin_x) / scale)),
+                min(height, int((y + h + margin_y) / scale)),
+                max(0, int((x - margin_x) / scale)),
+            ))
+        return regions
+
+    def locate(self, frame, rgb_frame, scale=1.0, now=None):
+        """Face locations at full resolution, running only the stages that are needed.
+
+        Args:
+            frame: התמונה (BGR) - לשלבים הזולים
+            rgb_frame: אותה תמונה ב-RGB - ל-face_recognition
+            scale: קנה המידה לזיהוי HOG בחיפוש על כל התמונה
+        """
+        now = time.time() if now is None else now
+        refresh = self._last_full_search is None or now - self._last_full_search >= self.refresh_interval
+
+        start = time.perf_counter()
+        moving = self._has_motion(frame)
+        self.motion.record(moving, time.perf_counter() - start)
+
+        if not moving and not refresh:
+            return self._last_locations
+
+        if refresh or self.cascade is None:
+            # חיפוש מלא - גם בלי תנועה ובלי מועמדי Haar
+            if refresh:
+                self._last_full_search = now
+                self.full_searches += 1
+            start = time.perf_counter()
+            locations = detect_face_locations(rgb_frame, scale)
+            self.hog.record(bool(locations), time.perf_counter() - start)
+            self._last_locations = locations
+            return locations
+
+        start = time.perf_counter()
+        regions = self._haar_regions(frame)
+        self.haar.record(bool(regions), time.perf_counter() - start)
+        if not regions:
+            self._last_locations = []
+            return []
+
+        start = time.perf_counter()
+        locations = []
+        for top, right, bottom, left in regions:
+            if bottom - top < 8 or right - left < 8:
+                continue
+            crop = rgb_frame[top:bottom, left:right]
+            # בגודל מלא: אזור מוקטן יכול לרדת מתחת לגודל המינימלי של HOG (~40 פיקסלים)
+            for t, r, b, l in detect_face_locations(crop, 1.0):
+                box = (t + top, r + left, b + top, l + left)
+                # אזורים חופפים עלולים למצוא את אותן פנים פעמיים
+                if all(_iou(box, other) < 0.5 for other in locations):
+                    locations.append(box)
+        self.hog.record(bool(locations), time.perf_counter() - start)
+        self._last_locations = locations
+        return locations
+
+    def stats(self):
+        return {
+            "motion": self.motion.as_dict(),
+            "haar": self.haar.as_dict(),
+            "hog": self.hog.as_dict(),
+            "full_searches": self.full_searches,
+        }
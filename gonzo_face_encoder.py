@@ -0,0 +1,183 @@
+# encoding וזיהוי של כל הפנים בתמונה (או בכמה תמונות) בקריאה אחת לרשת של dlib
+import time
+import numpy as np
+import dlib
+import face_recognition
+# face_recognition לא חושף API ציבורי לקידוד כמה פנים בקריאה אחת: face_encodings עוטף את
+# _raw_face_landmarks ואת face_encoder (dlib.face_recognition_model_v1) ומקודד פנים אחת בכל
+# קריאה. משתמשים בשניהם ישירות (קיימים מאז face_recognition 1.0) - אם ישתנו, זה המקום
+from face_recognition import api as face_recognition_api
+from gonzo_face_matcher import ENCODING_SIZE, FaceMatch
+
+# שורה לכל פנים: התמונה, המלבן (top, right, bottom, left), ה-encoding,
+# שורת ההתאמה במאגר (-1 = לא זוהה), המרחק והפער מהזהות הבאה
+FACE_BATCH_DTYPE = np.dtype([
+    ("frame", np.int32),
+    ("box", np.int32, (4,)),
+    ("encoding", np.float32, (ENCODING_SIZE,)),
+    ("match", np.int32),
+    ("distance", np.float32),
+    ("margin", np.float32),
+])
+
+
+class FaceBatchEncoder:
+    """Encodes every face of one or more frames in a single dlib call.
+
+    face_recognition.face_encodings runs the ResNet once per face. Here the
+    landmarks of all boxes are collected into one full_object_detections and
+    compute_face_descriptor aligns and encodes them as a batch; for several
+    frames the list-of-images overload is used. Older dlib builds without the
+    batched overloads fall back to one call per frame, then per face.
+    """
+
+    def __init__(self, model="small", num_jitters=1):
+        self.model = model
+        self.num_jitters = num_jitters
+        # האם ה-overloads המקובצים של dlib קיימים (None = עוד לא נבדק)
+        self._multi_frame = None
+        self._multi_face = None
+        self.faces_encoded = 0
+        self.batches = 0
+        self.seconds = 0.0
+
+    @staticmethod
+    def _as_batch(frames, boxes):
+        """תמונה אחת עם רשימת מלבנים, או רשימת תמונות עם רשימת מלבנים לכל אחת"""
+        if isinstance(frames, np.ndarray) and frames.ndim == 3:
+            return [frames], [list(boxes)]
+        frames = list(frames)
+        boxes = [list(frame_boxes) for frame_boxes in boxes]
+        if len(frames) != len(boxes):
+            raise ValueError(f"Got {len(frames)} frames for {len(boxes)} box lists")
+        return frames, boxes
+
+    def _shapes(self, frame, boxes):
+        shapes = dlib.full_object_detections()
+        for landmarks in face_recognition_api._raw_face_landmarks(frame, boxes, model=self.model):
+            shapes.append(landmarks)
+        return shapes
+
+    def _descriptors(self, frames, shapes):
+        """encodings לכל הפנים, לפי סדר התמונות והמלבנים"""
+        encoder = face_recognition_api.face_encoder
+        # pybind11 זורק TypeError כשאין overload מתאים (dlib ישן) - נבדק פעם אחת
+        if len(frames) > 1 and self._multi_frame is not False:
+            try:
+                per_frame = encoder.compute_face_descriptor(frames, shapes, self.num_jitters)
+                self._multi_frame = True
+                return [vector for vectors in per_frame for vector in vectors]
+            except TypeError:
+                if self._multi_frame:
+                    raise
+                self._multi_frame = False
+
+        descriptors = []
+        for frame, frame_shapes in zip(frames, shapes):
+            if self._multi_face is not False:
+                try:
+                    descriptors.extend(encoder.compute_face_descriptor(frame, frame_shapes, self.num_jitters))
+                    self._multi_face = True
+                    continue
+                except TypeError:
+                    if self._multi_face:
+                        raise
+                    self._multi_face = False
+            descriptors.extend(encoder.compute_face_descriptor(frame, landmarks, self.num_jitters)
+                               for landmarks in frame_shapes)
+        return descriptors
+
+    def encode(self, frames, boxes):
+        """Encodings of all the boxes.
+
+        Args:
+            frames: תמונת RGB אחת, או רשימת תמונות RGB
+            boxes: רשימת מלבנים (לתמונה אחת), או רשימה של רשימות (לכל תמונה)
+        Returns:
+            np.ndarray: מערך רשומות FACE_BATCH_DTYPE, match=-1 (ללא התאמה למאגר)
+        """
+        frames, boxes = self._as_batch(frames, boxes)
+        result = np.zeros(sum(len(frame_boxes) for frame_boxes in boxes), dtype=FACE_BATCH_DTYPE)
+        result["match"] = -1
+        result["distance"] = np.inf
+        result["margin"] = np.inf
+        if not len(result):
+            return result
+
+        start = time.perf_counter()
+        # רק תמונות שיש בהן פנים נכנסות לקריאה ל-dlib
+        used = [(index, frame, frame_boxes) for index, (frame, frame_boxes) in enumerate(zip(frames, boxes))
+                if frame_boxes]
+        shapes = [self._shapes(frame, frame_boxes) for _, frame, frame_boxes in used]
+        descriptors = self._descriptors([frame for _, frame, _ in used], shapes)
+
+        result["frame"] = np.repeat([index for index, _, _ in used], [len(b) for _, _, b in used])
+        result["box"] = [box for _, _, frame_boxes in used for box in frame_boxes]
+        result["encoding"] = np.asarray(descriptors, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+
+        self.faces_encoded += len(result)
+        self.batches += 1
+        self.seconds += time.perf_counter() - start
+        return result
+
+    def recognize(self, frames, boxes, known_faces, tolerance=0.6):
+        """encode, ואז התאמה של כל הפנים מול המאגר (FaceEncodingMatrix) בחישוב אחד"""
+        result = self.encode(frames, boxes)
+        if len(result):
+            matches = known_faces.match(result["encoding"], tolerance=tolerance)
+            result["match"] = [match.index if match.name is not None else -1 for match in matches]
+            result["distance"] = [match.distance for match in matches]
+            result["margin"] = [match.margin for match in matches]
+        return result
+
+    @staticmethod
+    def names(result, known_faces, unknown="Unknown"):
+        """השם לכל רשומה בתוצאה - חיפוש רק לשורות שהותאמו"""
+        return [known_faces.name_of(row) if row >= 0 else unknown for row in result["match"].tolist()]
+
+    @staticmethod
+    def face_matches(result, known_faces):
+        """הרשומות כ-FaceMatch (כמו FaceEncodingMatrix.match)"""
+        return [FaceMatch(known_faces.name_of(row) if row >= 0 else None, row, distance, margin)
+                for row, distance, margin in zip(result["match"].tolist(), result["distance"].tolist(),
+                                                 result["margin"].tolist())]
+
+    def stats(self):
+        return {
+            "faces_encoded": self.faces_encoded,
+            "batches": self.batches,
+            "faces_per_batch": self.faces_encoded / self.batches if self.batches else 0.0,
+            "ms_per_face": self.seconds / self.faces_encoded * 1000 if self.faces_encoded else 0.0,
+        }
+
+
+def benchmark(face_counts=(1, 4, 8, 16), repeats=5, seed=0):
+    """השוואת face_recognition.face_encodings (פנים אחרי פנים) מול קריאה אחת לכל התמונה"""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8)
+    encoder = FaceBatchEncoder()
+    results = {}
+    for count in face_counts:
+        boxes = []
+        for i in range(count):
+            top, left = 40 + (i // 8) * 160, 20 + (i % 8) * 150
+            boxes.append((top, left + 120, top + 120, left))
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            face_recognition.face_encodings(frame, boxes)
+        per_face_ms = (time.perf_counter() - start) / repeats * 1000
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            encoder.encode(frame, boxes)
+        batched_ms = (time.perf_counter() - start) / repeats * 1000
+
+        results[count] = {"per_face_ms": per_face_ms, "batched_ms": batched_ms}
+        print(f"{count:>3} faces: per-face {per_face_ms:7.1f} ms, batched {batched_ms:7.1f} ms "
+              f"({per_face_ms / batched_ms:4.1f}x)")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark()
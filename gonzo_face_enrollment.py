@@ -0,0 +1,126 @@
+# רישום אדם חדש בלי לעצור את לולאת הווידאו - איסוף דגימות בזמן שהוא עונה מה שמו
+import time
+import numpy as np
+import cv2
+
+
+class FaceEnrollment:
+    """Enrollment of one unknown person, driven from the main loop.
+
+    It starts from the encoding identification already computed for the
+    unknown face and waits on `name_future` (asking and listening run
+    elsewhere). Meanwhile offer() is called with every processed frame and
+    keeps up to `max_samples` good samples of the same person: a fresh
+    encoding within `max_distance` of the first one, a face at least
+    `min_size` pixels high, a sharp enough crop (variance of the Laplacian),
+    and at least `sample_interval` seconds after the previous sample.
+
+    Every frame passed in (the first one and each offer()) must be the image
+    its boxes were computed on - with FaceRecognitionService that is
+    FaceResult.frame, not the newest camera frame - since the sharpness
+    check and the saved crop are cut from it.
+
+    States: listening -> complete (a name was heard) or failed (no name).
+    """
+
+    LISTENING = "listening"
+    COMPLETE = "complete"
+    FAILED = "failed"
+
+    def __init__(self, name_future, encoding, box, frame, now=None, max_samples=5, min_size=80,
+                 min_sharpness=50.0, max_distance=0.45, sample_interval=0.3):
+        self.name_future = name_future
+        self.max_samples = max_samples
+        self.min_size = min_size
+        self.min_sharpness = min_sharpness
+        self.max_distance = max_distance
+        self.sample_interval = sample_interval
+
+        self.state = self.LISTENING
+        self.name = None
+        self.started = time.time() if now is None else now
+        self.box = box
+        self.encodings = []
+        self.crops = []
+        self.sharpness = []
+        self.last_sample = None
+        self.rejected = 0
+        # הדגימה הראשונה היא ה-encoding מהזיהוי, בלי בדיקת איכות
+        self._add(np.asarray(encoding, dtype=np.float32), box, frame, self._sharpness(frame, box), self.started)
+
+    @staticmethod
+    def _sharpness(frame, box):
+        top, right, bottom, left = box
+        crop = frame[max(0, top):bottom, max(0, left):right]
+        if crop.size == 0:
+            return 0.0
+        return float(cv2.Laplacian(cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY), cv2.CV_64F).var())
+
+    def _add(self, encoding, box, frame, sharpness, now):
+        top, right, bottom, left = box
+        self.encodings.append(encoding)
+        self.crops.append(frame[max(0, top):bottom, max(0, left):right].copy())
+        self.sharpness.append(sharpness)
+        self.box = box
+        self.last_sample = now
+
+    def offer(self, frame, face_locations, face_encodings, now=None):
+        """Keep a sample from this frame if it shows the same person with good quality.
+
+        Args:
+            frame: התמונה שעליה חושבו face_locations
+            face_encodings: encoding לכל פנים - None לפנים שלא חושב להן encoding בתמונה הזו
+        Returns:
+            bool: האם נוספה דגימה
+        """
+        now = time.time() if now is None else now
+        if self.state != self.LISTENING or len(self.encodings) >= self.max_samples:
+            return False
+        if now - self.last_sample < self.sample_interval:
+            return False
+
+        reference = self.encodings[0]
+        candidates = [(float(np.linalg.norm(np.asarray(encoding, dtype=np.float32) - reference)), box, encoding)
+                      for box, encoding in zip(face_locations, face_encodings) if encoding is not None]
+        if not candidates:
+            return False
+        distance, box, encoding = min(candidates, key=lambda candidate: candidate[0])
+        if distance > self.max_distance:
+            return False
+
+        top, right, bottom, left = box
+        sharpness = self._sharpness(frame, box)
+        if bottom - top < self.min_size or sharpness < self.min_sharpness:
+            self.rejected += 1
+            return False
+        self._add(np.asarray(encoding, dtype=np.float32), box, frame, sharpness, now)
+        return True
+
+    def poll(self):
+        """מעבר מצב כשהתשובה הגיעה - מחזיר את המצב הנוכחי"""
+        if self.state == self.LISTENING and self.name_future.done():
+            try:
+                self.name = self.name_future.result()
+            except Exception as e:
+                print(f"Error while asking for a name: {e}")
+                self.name = None
+            self.state = self.COMPLETE if self.name else self.FAILED
+        return self.state
+
+    @property
+    def samples(self):
+        """מערך (N, 128) של הדגימות שנאספו"""
+        return np.vstack(self.encodings)
+
+    @property
+    def best_crop(self):
+        """תמונת הפנים החדה ביותר (BGR) לשמירה"""
+        return self.crops[int(np.argmax(self.sharpness))]
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "samples": len(self.encodings),
+            "rejected": self.rejected,
+            "seconds": time.time() - self.started,
+        }
@@ -0,0 +1,379 @@
+# התאמת פנים וקטורית - כל ה-encodings המוכרים במטריצה רציפה אחת
+import time
+from collections import namedtuple
+import numpy as np
+
+ENCODING_SIZE = 128
+
+# תוצאת התאמה לפנים אחת: השם (או None), אינדקס השורה, המרחק, והפער מהזהות הבאה
+FaceMatch = namedtuple("FaceMatch", ["name", "index", "distance", "margin"])
+
+
+class ExactFaceIndex:
+    """Brute force: every query is compared with every known face."""
+
+    kind = "exact"
+
+    def add(self, matrix, start, end):
+        pass
+
+    def search(self, matrix, queries):
+        """None = לסרוק את כל השורות"""
+        return None
+
+    def stats(self):
+        return {"kind": self.kind}
+
+
+class IVFFaceIndex:
+    """Inverted-file ANN index: k-means buckets over the known encodings.
+
+    A query is compared only with the faces in the `nprobe` buckets whose
+    centroids are nearest to it. New faces are appended to their nearest
+    bucket without retraining; the centroids are retrained once the store has
+    grown by `retrain_growth` since the last training. Below `min_train`
+    faces the index is not trained and queries fall back to a full scan.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, n_lists=None, nprobe=4, min_train=512, retrain_growth=4.0, iterations=10, seed=0):
+        self.n_lists = n_lists          # None = sqrt(N) בזמן האימון
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self.retrain_growth = retrain_growth
+        self.iterations = iterations
+        self.rng = np.random.default_rng(seed)
+
+        self.centroids = None
+        self.trained_size = 0
+        self._lists = []
+        self._sizes = None
+
+    def add(self, matrix, start, end):
+        """הוספה אינקרמנטלית - שיוך השורות החדשות לדלי הקרוב"""
+        if self.centroids is None or end > self.trained_size * self.retrain_growth:
+            if end >= self.min_train:
+                self.train(matrix.encodings)
+            return
+        for row, bucket in zip(range(start, end), self._assign(matrix.encodings[start:end]).tolist()):
+            self._append(bucket, row)
+
+    def train(self, encodings):
+        """k-means (Lloyd) על כל ה-encodings ובניית הדליים מחדש"""
+        count = len(encodings)
+        n_lists = min(count, self.n_lists or max(1, int(np.sqrt(count))))
+        centroids = encodings[self.rng.choice(count, n_lists, replace=False)].copy()
+
+        for _ in range(self.iterations):
+            assignment = _nearest(encodings, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, encodings)
+            sizes = np.bincount(assignment, minlength=n_lists)
+            filled = sizes > 0
+            centroids[filled] = sums[filled] / sizes[filled, None]
+
+        self.centroids = centroids
+        self.trained_size = count
+        assignment = _nearest(encodings, centroids)
+        order = np.argsort(assignment, kind='stable').astype(np.int32)
+        sizes = np.bincount(assignment, minlength=n_lists)
+        bounds = np.concatenate(([0], np.cumsum(sizes)))
+        self._lists = [order[bounds[i]:bounds[i + 1]].copy() for i in range(n_lists)]
+        self._sizes = sizes.astype(np.int64)
+
+    def _assign(self, encodings):
+        return _nearest(encodings, self.centroids)
+
+    def _append(self, bucket, row):
+        rows = self._lists[bucket]
+        size = self._sizes[bucket]
+        if size == len(rows):
+            grown = np.empty(max(8, 2 * len(rows)), dtype=np.int32)
+            grown[:size] = rows[:size]
+            self._lists[bucket] = rows = grown
+        rows[size] = row
+        self._sizes[bucket] = size + 1
+
+    def search(self, matrix, queries):
+        """שורות מועמדות לכל שאילתה - מה-nprobe דליים הקרובים"""
+        if self.centroids is None:
+            return None
+        nprobe = min(self.nprobe, len(self.centroids))
+        distances = _squared_distances(queries, self.centroids, np.einsum('ij,ij->i', self.centroids, self.centroids))
+        probes = np.argpartition(distances, nprobe - 1, axis=1)[:, :nprobe]
+        return [np.concatenate([self._lists[bucket][:self._sizes[bucket]] for bucket in row])
+                for row in probes.tolist()]
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "trained_size": self.trained_size,
+            "lists": len(self._lists),
+            "nprobe": self.nprobe,
+        }
+
+
+def create_face_index(kind="exact", **options):
+    """יצירת אינדקס לפי שם (מהקונפיגורציה)"""
+    if kind == "exact":
+        return ExactFaceIndex()
+    if kind == "ivf":
+        return IVFFaceIndex(**options)
+    raise ValueError(f"Unknown face index '{kind}'")
+
+
+def _squared_distances(queries, encodings, norms):
+    """|a - b|^2 לכל זוג, בעזרת מכפלת מטריצות אחת"""
+    squared = queries @ encodings.T
+    squared *= -2
+    squared += norms
+    squared += np.einsum('ij,ij->i', queries, queries)[:, None]
+    return np.maximum(squared, 0, out=squared)
+
+
+def _nearest(encodings, centroids):
+    """אינדקס ה-centroid הקרוב לכל שורה (בקבוצות, לחיסכון בזיכרון)"""
+    norms = np.einsum('ij,ij->i', centroids, centroids)
+    assignment = np.empty(len(encodings), dtype=np.int64)
+    for start in range(0, len(encodings), 8192):
+        chunk = encodings[start:start + 8192]
+        assignment[start:start + len(chunk)] = np.argmin(_squared_distances(chunk, centroids, norms), axis=1)
+    return assignment
+
+
+class FaceEncodingMatrix:
+    """Known face encodings as one contiguous float32 (N, 128) matrix.
+
+    Names are kept in a parallel array of integer label ids, so several
+    encodings may belong to the same person. All faces of a frame are matched
+    in a single matrix product using |a - b|^2 = |a|^2 + |b|^2 - 2 a.b, with
+    the squared norms of the known encodings precomputed.
+
+    Candidate rows come from a pluggable index (ExactFaceIndex scans all,
+    IVFFaceIndex only the nearest buckets); distances to the candidates are
+    always exact.
+    """
+
+    def __init__(self, capacity=64, index=None):
+        self._encodings = np.zeros((capacity, ENCODING_SIZE), dtype=np.float32)
+        self._norms = np.zeros(capacity, dtype=np.float32)
+        self._labels = np.zeros(capacity, dtype=np.int32)
+        self.count = 0
+        # שם לכל label, ומיפוי הפוך
+        self.label_names = []
+        self._label_ids = {}
+        self.index = index if index is not None else ExactFaceIndex()
+
+    @classmethod
+    def from_lists(cls, encodings, names, index=None):
+        """בנייה מהפורמט הישן (רשימת מערכים + רשימת שמות)"""
+        matrix = cls(capacity=max(64, len(names)), index=index)
+        if len(names):
+            matrix.extend(np.asarray(encodings, dtype=np.float32), names)
+        return matrix
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def encodings(self):
+        """view על השורות התקפות"""
+        return self._encodings[:self.count]
+
+    @property
+    def names(self):
+        """שם לכל שורה (רשימה חדשה, לשמירה/תצוגה)"""
+        return [self.label_names[label] for label in self._labels[:self.count]]
+
+    def name_of(self, row):
+        """השם של שורה אחת - O(1), בלי לבנות את רשימת כל השמות"""
+        return self.label_names[self._labels[row]]
+
+    def _label(self, name):
+        label = self._label_ids.get(name)
+        if label is None:
+            label = len(self.label_names)
+            self.label_names.append(name)
+            self._label_ids[name] = label
+        return label
+
+    def _reserve(self, extra):
+        """הגדלת הקיבולת פי 2 כשצריך - הוספה ב-O(1) בממוצע"""
+        needed = self.count + extra
+        capacity = len(self._encodings)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for attr in ("_encodings", "_norms", "_labels"):
+            old = getattr(self, attr)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, attr, new)
+
+    def add(self, encoding, name):
+        """הוספת encoding אחד - מחזיר את אינדקס השורה"""
+        return self.extend(np.asarray(encoding, dtype=np.float32).reshape(1, ENCODING_SIZE), [name])
+
+    def extend(self, encodings, names):
+        """הוספת כמה encodings בבת אחת - מחזיר את אינדקס השורה הראשונה"""
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        if len(encodings) != len(names):
+            raise ValueError(f"Got {len(encodings)} encodings for {len(names)} names")
+        self._reserve(len(encodings))
+        start, end = self.count, self.count + len(encodings)
+        self._encodings[start:end] = encodings
+        self._norms[start:end] = np.einsum('ij,ij->i', encodings, encodings)
+        self._labels[start:end] = [self._label(name) for name in names]
+        self.count = end
+        self.index.add(self, start, end)
+        return start
+
+    def distances(self, encodings):
+        """Euclidean distances, shape (M, N), between M query faces and every known face"""
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        squared = _squared_distances(queries, self.encodings, self._norms[:self.count])
+        return np.sqrt(squared, out=squared)
+
+    def match(self, encodings, tolerance=0.6):
+        """Best known identity for every query face, in one batched computation.
+
+        Args:
+            encodings: מערך (M, 128) או רשימת encodings של הפנים בתמונה
+            tolerance: מרחק מקסימלי שנחשב התאמה
+        Returns:
+            list: FaceMatch לכל פנים. name הוא None כשאין התאמה בטווח; margin הוא
+                הפער בין המרחק הטוב ביותר למרחק הקרוב ביותר של אדם אחר (inf אם אין)
+        """
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        if len(queries) == 0:
+            return []
+        if self.count == 0:
+            return [FaceMatch(None, -1, float('inf'), float('inf')) for _ in range(len(queries))]
+
+        candidates = self.index.search(self, queries)
+        if candidates is None:
+            return self._match_rows(queries, None, tolerance)
+        matches = []
+        for query, rows in zip(queries, candidates):
+            matches.extend(self._match_rows(query[None, :], rows, tolerance))
+        return matches
+
+    def _match_rows(self, queries, rows, tolerance):
+        """התאמה מול כל השורות (rows=None) או מול קבוצת שורות מועמדות"""
+        if rows is None:
+            labels = self._labels[:self.count]
+            squared = _squared_distances(queries, self.encodings, self._norms[:self.count])
+        elif len(rows) == 0:
+            return [FaceMatch(None, -1, float('inf'), float('inf')) for _ in range(len(queries))]
+        else:
+            labels = self._labels[rows]
+            squared = _squared_distances(queries, self._encodings[rows], self._norms[rows])
+
+        best = np.argmin(squared, axis=1)
+        best_squared = squared[np.arange(len(queries)), best]
+
+        # הזהות הקרובה הבאה: מסתירים את כל השורות של אותו אדם
+        best_labels = labels[best]
+        squared[labels[None, :] == best_labels[:, None]] = np.inf
+        runner_up = squared.min(axis=1)
+
+        best_distance = np.sqrt(best_squared)
+        margin = np.sqrt(runner_up) - best_distance
+        indices = best if rows is None else rows[best]
+
+        matches = []
+        for distance, index, label, gap in zip(best_distance.tolist(), indices.tolist(),
+                                               best_labels.tolist(), margin.tolist()):
+            name = self.label_names[label] if distance <= tolerance else None
+            matches.append(FaceMatch(name, index, distance, gap))
+        return matches
+
+
+def _synthetic_identities(count, rng):
+    """encodings אקראיים בגודל ובפיזור דומים ל-dlib (נורמה ~1)"""
+    encodings = rng.normal(0, 0.09, size=(count, ENCODING_SIZE)).astype(np.float32)
+    return encodings, [f"person_{i}" for i in range(count)]
+
+
+def benchmark(sizes=(10, 1000, 100000), faces_per_frame=4, repeats=20, seed=0):
+    """מדידת זמן התאמה לתמונה: לולאה על face_distance מול התאמה וקטורית אחת"""
+    rng = np.random.default_rng(seed)
+    results = {}
+    for size in sizes:
+        encodings, names = _synthetic_identities(size, rng)
+        matrix = FaceEncodingMatrix.from_lists(encodings, names)
+        known_list = [encoding.astype(np.float64) for encoding in encodings]
+        queries = encodings[rng.integers(0, size, faces_per_frame)] + rng.normal(0, 0.01, (faces_per_frame, ENCODING_SIZE)).astype(np.float32)
+
+        # הדרך הקודמת: compare_faces + face_distance לכל פנים (שניהם בונים מערך מהרשימה)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for query in queries:
+                matches = np.linalg.norm(np.array(known_list) - query, axis=1) <= 0.6
+                distances = np.linalg.norm(np.array(known_list) - query, axis=1)
+                int(np.argmin(distances)) if not matches.any() else int(np.argmax(matches))
+        loop_ms = (time.perf_counter() - start) / repeats * 1000
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            matches = matrix.match(queries)
+        batched_ms = (time.perf_counter() - start) / repeats * 1000
+
+        correct = sum(match.name is not None for match in matches)
+        results[size] = {"loop_ms": loop_ms, "batched_ms": batched_ms, "matched": correct}
+        print(f"{size:>7} identities: per-face loop {loop_ms:8.3f} ms/frame, "
+              f"batched {batched_ms:7.3f} ms/frame ({loop_ms / batched_ms:5.1f}x), "
+              f"matched {correct}/{faces_per_frame}")
+    return results
+
+
+def _match_frames(matrix, probe, faces_per_frame):
+    found = []
+    for start in range(0, len(probe), faces_per_frame):
+        found.extend(match.index for match in matrix.match(probe[start:start + faces_per_frame]))
+    return found
+
+
+def benchmark_index(sizes=(1000, 10000, 100000), nprobes=(1, 2, 4, 8, 16, 32), queries=200,
+                    faces_per_frame=4, noise=0.03, seed=0):
+    """Recall@1 מול זמן שאילתה של IVFFaceIndex לכל nprobe, ביחס לסריקה מלאה
+
+    השאילתות נשלחות בקבוצות של faces_per_frame, כמו בתמונה אמיתית.
+    """
+    rng = np.random.default_rng(seed)
+    results = {}
+    for size in sizes:
+        encodings, names = _synthetic_identities(size, rng)
+        # אותו אדם בתמונה אחרת: ה-encoding המקורי + רעש (מרחק ~0.35)
+        probe = encodings[rng.integers(0, size, queries)] + rng.normal(0, noise, (queries, ENCODING_SIZE)).astype(np.float32)
+
+        exact = FaceEncodingMatrix.from_lists(encodings, names)
+        start = time.perf_counter()
+        truth = _match_frames(exact, probe, faces_per_frame)
+        exact_ms = (time.perf_counter() - start) / queries * 1000
+        print(f"{size:>7} identities: exact {exact_ms:.3f} ms/face")
+
+        start = time.perf_counter()
+        ivf = FaceEncodingMatrix.from_lists(encodings, names, index=IVFFaceIndex(min_train=1))
+        train_s = time.perf_counter() - start
+        print(f"         ivf: {ivf.index.stats()['lists']} lists, trained in {train_s:.2f}s")
+
+        rows = []
+        for nprobe in nprobes:
+            ivf.index.nprobe = nprobe
+            start = time.perf_counter()
+            found = _match_frames(ivf, probe, faces_per_frame)
+            ivf_ms = (time.perf_counter() - start) / queries * 1000
+            recall = float(np.mean(np.array(found) == np.array(truth)))
+            rows.append({"nprobe": nprobe, "recall": recall, "ms_per_face": ivf_ms})
+            print(f"         nprobe {nprobe:>3}: recall {recall:.3f}, {ivf_ms:.3f} ms/face "
+                  f"({exact_ms / ivf_ms:5.1f}x)")
+        results[size] = {"exact_ms_per_face": exact_ms, "ivf": rows}
+    return results
+
+
+if __name__ == "__main__":
+    benchmark()
+    benchmark_index()
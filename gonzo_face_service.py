@@ -0,0 +1,434 @@
+# זיהוי פנים מחוץ ללולאה הראשית - צינור הזיהוי, ושירות שמריץ אותו בתהליכים נפרדים
+import time
+import queue
+import signal
+import multiprocessing
+from collections import namedtuple
+from multiprocessing import shared_memory
+import numpy as np
+import cv2
+import face_recognition
+from gonzo_face_matcher import FaceEncodingMatrix, create_face_index
+from gonzo_face_store import FaceStore
+from gonzo_face_tracker import FaceTracker
+from gonzo_face_detector import AdaptiveDetectionScale, StagedFaceDetector, detect_face_locations
+from gonzo_face_encoder import FaceBatchEncoder
+
+# תוצאת זיהוי לתמונה אחת (מהשירות): מיקומים, שמות, מרחקים, והתמונה שאליה היא שייכת.
+# frame - עותק של התמונה שזוהתה (המיקומים מתייחסים אליה, לא לתמונה האחרונה מהמצלמה)
+FaceResult = namedtuple("FaceResult", ["sequence", "timestamp", "locations", "names", "distances",
+                                       "encodings", "worker", "elapsed", "frame"], defaults=(None,))
+
+
+def face_index_from_config(config):
+    """אינדקס החיפוש במאגר הפנים - exact (סריקה מלאה) או ivf (מהיר למאגרים גדולים)"""
+    kind = config.get('face_index', 'exact')
+    if kind == 'ivf':
+        return create_face_index(kind, nprobe=config.get('face_index_nprobe', 8))
+    return create_face_index(kind)
+
+
+def load_haar_cascade():
+    """מסנן ה-Haar המובנה של OpenCV (כמו ב-GonzoFace), או None"""
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    return None if cascade.empty() else cascade
+
+
+class FacePipeline:
+    """Detection, tracking and identification of the faces in one frame.
+
+    Runs in the main process or inside a FaceRecognitionService worker with
+    the same configuration keys. With `collect_unknown` set (during an
+    enrollment) unknown faces are encoded again on every detection, so the
+    enrollment gets fresh samples.
+    """
+
+    def __init__(self, config, known_faces, cascade=None):
+        self.known_faces = known_faces
+        self.collect_unknown = False
+        # encoding של כל הפנים בתמונה בקריאה אחת
+        self.encoder = FaceBatchEncoder(num_jitters=config.get('face_encoding_jitters', 1))
+
+        # מעקב פנים בין תמונות - encoding מחושב רק לפנים חדשות או לאימות מחדש
+        self.tracking = config.get('face_tracking', True)
+        self.tracker = FaceTracker(
+            iou_threshold=config.get('face_track_iou', 0.3),
+            max_missed=config.get('face_track_max_missed', 3),
+            reverify_interval=config.get('face_reverify_interval', 10.0),
+            use_correlation=config.get('face_correlation_tracking', False),
+            detection_interval=config.get('face_detection_interval', 3)
+        )
+
+        # זיהוי מיקומי פנים: staged (תנועה -> Haar -> HOG באזורים), pyramid (תמונה מוקטנת) או full
+        self.detection_mode = config.get('face_detection_mode', 'pyramid')
+        self.detection_scale = AdaptiveDetectionScale(
+            scale=config.get('face_detection_scale', 0.5),
+            target_fps=config.get('face_target_fps', 5.0),
+            min_scale=config.get('face_min_detection_scale', 0.25),
+            adaptive=config.get('face_adaptive_scale', True)
+        )
+        self.staged_detector = None
+        if self.detection_mode == 'staged':
+            # מסנן Haar כשלב זול לפני ה-HOG
+            self.staged_detector = StagedFaceDetector(
+                cascade=cascade,
+                motion_fraction=config.get('face_motion_fraction', 0.002),
+                refresh_interval=config.get('face_full_search_interval', 5.0)
+            )
+
+    def identify(self, frame):
+        """זיהוי פנים בתמונה (BGR)
+
+        Returns:
+            tuple: (locations, names, distances, encodings) - encoding רק לפנים שחושב
+                להן encoding בתמונה הזו, None לשאר
+        """
+        if not len(self.known_faces):
+            return [], [], [], []
+
+        if self.tracking and not self.tracker.detection_due():
+            # בין זיהויים - מעקב קורלציה בלבד, בלי HOG ובלי encoding
+            tracks = self.tracker.predict(frame)
+            return ([track.box for track in tracks], [track.name or "Unknown" for track in tracks],
+                    [track.match.distance if track.match else None for track in tracks],
+                    [None] * len(tracks))
+
+        start = time.perf_counter()
+        try:
+            return self._detect_and_identify(frame)
+        finally:
+            if self.detection_mode in ('pyramid', 'staged'):
+                # קנה המידה מתכוונן לזמן העיבוד בפועל
+                self.detection_scale.update(time.perf_counter() - start)
+
+    def locate_faces(self, frame, rgb_frame):
+        """מיקומי הפנים ברזולוציה המלאה - הזיהוי עצמו על תמונה מוקטנת במצב pyramid/staged"""
+        if self.detection_mode == 'staged':
+            return self.staged_detector.locate(frame, rgb_frame, self.detection_scale.scale)
+        if self.detection_mode == 'pyramid':
+            return detect_face_locations(rgb_frame, self.detection_scale.scale)
+        return face_recognition.face_locations(rgb_frame)
+
+    def _detect_and_identify(self, frame):
+        """זיהוי מיקומים ו-encoding (מהתמונה המלאה) לפנים שצריך לזהות"""
+        # המרה ל-RGB עבור face_recognition
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+        # איתור פנים בתמונה
+        face_locations = self.locate_faces(frame, rgb_frame)
+
+        if not face_locations:
+            if self.tracking:
+                self.tracker.update([], frame)
+            return [], [], [], []
+
+        if not self.tracking:
+            # יצירת encodings לפנים שנמצאו - חשוב! השתמש ב-rgb_frame
+            result = self.recognize(rgb_frame, face_locations)
+            return (face_locations, self.encoder.names(result, self.known_faces),
+                    result["distance"].tolist(), list(result["encoding"]))
+
+        # encoding רק למסלולים חדשים או כאלה שהגיע זמן לאמת
+        now = time.time()
+        tracks = self.tracker.update(face_locations, frame, now)
+        pending = [track for track in tracks if self.tracker.needs_identification(track, now)
+                   or (self.collect_unknown and track.name == "Unknown")]
+        fresh = {}
+        if pending:
+            result = self.recognize(rgb_frame, [track.box for track in pending])
+            matches = self.encoder.face_matches(result, self.known_faces)
+            for track, record, match in zip(pending, result, matches):
+                self.tracker.identified(track, record["encoding"], match.name or "Unknown", match, now)
+                fresh[track.track_id] = record["encoding"]
+
+        return (face_locations, [track.name for track in tracks],
+                [track.match.distance if track.match else None for track in tracks],
+                [fresh.get(track.track_id) for track in tracks])
+
+    def recognize(self, rgb_frame, face_locations):
+        """encoding והתאמה של כל הפנים בתמונה מול המאגר - מערך FACE_BATCH_DTYPE"""
+        # הסף 0.7 כמו קודם: התאמה מתחת ל-0.6, ואם אין - הקרוב ביותר מתחת ל-0.7
+        return self.encoder.recognize(rgb_frame, face_locations, self.known_faces, tolerance=0.7)
+
+    def invalidate(self):
+        """מאגר הפנים השתנה - כל הפנים יזוהו מחדש"""
+        self.tracker.invalidate()
+
+    def stats(self):
+        stats = {}
+        if self.tracking:
+            stats["tracking"] = self.tracker.stats()
+        if self.detection_mode in ('pyramid', 'staged'):
+            stats["detection_scale"] = self.detection_scale.stats()
+        if self.staged_detector is not None:
+            stats["staged_detector"] = self.staged_detector.stats()
+        stats["encoder"] = self.encoder.stats()
+        return stats
+
+
+def _attach_shared_memory(name):
+    """התחברות לזיכרון משותף שהתהליך הראשי יצר ושהוא גם ימחק"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # לפני Python 3.13: עובד spawn חולק את ה-resource tracker של האב, והרישום הכפול לא מזיק
+        return shared_memory.SharedMemory(name=name)
+
+
+def _load_known_faces(config, known_faces=None):
+    """פתיחת מאגר הפנים (mmap, לקריאה בלבד) והוספת השורות שעוד לא נטענו"""
+    store = FaceStore(config.get('face_store_dir', 'face_store'), readonly=True)
+    if known_faces is None:
+        known_faces = FaceEncodingMatrix(capacity=max(64, len(store)), index=face_index_from_config(config))
+    if len(store) > len(known_faces):
+        known_faces.extend(store.encodings[len(known_faces):], store.names[len(known_faces):])
+    return known_faces
+
+
+def _worker_main(worker_id, config, tasks, results):
+    """תהליך עובד: מקבל משימות (תמונה בזיכרון משותף), מחזיר תוצאות זיהוי"""
+    # Ctrl+C מטופל בתהליך הראשי, שסוגר את העובדים בצורה מסודרת
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    known_faces = _load_known_faces(config)
+    cascade = load_haar_cascade() if config.get('face_detection_mode') == 'staged' else None
+    pipeline = FacePipeline(config, known_faces, cascade)
+    attached = {}
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        if task[0] == "sync":
+            _load_known_faces(config, known_faces)
+            pipeline.invalidate()
+            continue
+        if task[0] == "collect":
+            pipeline.collect_unknown = task[1]
+            continue
+
+        _, slot, shm_name, shape, sequence, timestamp = task
+        shm = attached.get(slot)
+        if shm is None or shm.name != shm_name:
+            if shm is not None:
+                shm.close()
+            shm = attached[slot] = _attach_shared_memory(shm_name)
+        frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+
+        start = time.perf_counter()
+        try:
+            locations, names, distances, encodings = pipeline.identify(frame)
+        except Exception as e:
+            print(f"Face worker {worker_id} error: {e}")
+            locations, names, distances, encodings = [], [], [], []
+        del frame
+        results.put((slot, FaceResult(sequence, timestamp, locations, names, distances, encodings,
+                                      worker_id, time.perf_counter() - start)))
+
+    for shm in attached.values():
+        shm.close()
+
+
+class FaceRecognitionService:
+    """Face detection and recognition in worker processes.
+
+    Frames are copied into shared-memory slots; only the slot number, shape
+    and sequence travel through the task queue. Each worker has its own task
+    queue and gets at most one frame at a time. When every worker is busy the
+    newest frame waits in a single pending slot, replacing (dropping) any
+    older frame that was still waiting - recognition always catches up to
+    the camera instead of building a backlog.
+
+    Workers read the face store from disk (mmap); call sync_known_faces()
+    after an enrollment so they pick up the new rows. A worker that exits
+    (e.g. it could not open the store) is detected in poll(), its frame is
+    dropped and it is restarted up to `max_restarts` times.
+    """
+
+    def __init__(self, config, workers=1, max_restarts=3):
+        self.config = config
+        self.worker_count = max(1, workers)
+        self._context = multiprocessing.get_context("spawn")
+        self._results = self._context.Queue()
+        self._tasks = []
+        self._processes = []
+        self._idle = []
+        self._in_flight = {}   # worker_id -> slot
+        self._restarts = [0] * self.worker_count
+        self.max_restarts = max_restarts
+        self._collecting = False
+
+        # worker_count תמונות בעבודה + אחת ממתינה
+        self._slots = [None] * (self.worker_count + 1)
+        self._free_slots = list(range(len(self._slots)))
+        self._pending = None   # (slot, shape, sequence, timestamp)
+        self._shapes = [None] * len(self._slots)
+        self._last_sequence = -1
+
+        # מדדים
+        self.submitted = 0
+        self.dropped = 0
+        self.completed = 0
+        self.stale = 0
+
+    def start(self):
+        self._tasks = [None] * self.worker_count
+        self._processes = [None] * self.worker_count
+        for worker_id in range(self.worker_count):
+            self._start_worker(worker_id)
+        print(f"Face recognition service started with {self.worker_count} worker(s)")
+
+    def _start_worker(self, worker_id):
+        tasks = self._context.Queue()
+        process = self._context.Process(target=_worker_main,
+                                        args=(worker_id, self.config, tasks, self._results),
+                                        name=f"gonzo-face-{worker_id}")
+        process.daemon = True
+        process.start()
+        if self._collecting:
+            tasks.put(("collect", True))
+        self._tasks[worker_id] = tasks
+        self._processes[worker_id] = process
+        self._idle.append(worker_id)
+
+    def _check_workers(self):
+        """עובד שמת (שגיאה בטעינה, קריסה) - הסלוט שלו משוחרר והוא מופעל מחדש"""
+        for worker_id, process in enumerate(self._processes):
+            if process is None or process.is_alive():
+                continue
+            print(f"Face worker {worker_id} exited with code {process.exitcode}")
+            self._processes[worker_id] = None
+            slot = self._in_flight.pop(worker_id, None)
+            if slot is not None:
+                self._free_slots.append(slot)
+            if worker_id in self._idle:
+                self._idle.remove(worker_id)
+            if self._restarts[worker_id] < self.max_restarts:
+                self._restarts[worker_id] += 1
+                self._start_worker(worker_id)
+            elif not any(self._processes):
+                print("All face workers have stopped - face recognition is disabled")
+
+    def _slot_for(self, frame):
+        """סלוט פנוי בגודל המתאים (מוקצה מחדש רק כשגודל התמונה משתנה)"""
+        slot = self._free_slots.pop()
+        shm = self._slots[slot]
+        if shm is None or shm.size < frame.nbytes:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            shm = self._slots[slot] = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+        np.ndarray(frame.shape, dtype=np.uint8, buffer=shm.buf)[...] = frame
+        self._shapes[slot] = frame.shape
+        return slot
+
+    def submit(self, frame, sequence, timestamp=None):
+        """מסירת תמונה לזיהוי - לא חוסם. תמונה ממתינה ישנה יותר נזרקת"""
+        if frame.dtype != np.uint8:
+            raise ValueError(f"Expected a uint8 frame, got {frame.dtype}")
+        timestamp = time.time() if timestamp is None else timestamp
+        self.submitted += 1
+
+        if self._pending is not None:
+            # drop-oldest: התמונה הממתינה מוחלפת בחדשה
+            self._free_slots.append(self._pending[0])
+            self._pending = None
+            self.dropped += 1
+
+        self._pending = (self._slot_for(frame), frame.shape, sequence, timestamp)
+        self._dispatch()
+
+    def _dispatch(self):
+        if self._pending is None or not self._idle:
+            return
+        worker_id = self._idle.pop(0)
+        slot, shape, sequence, timestamp = self._pending
+        self._pending = None
+        self._in_flight[worker_id] = slot
+        self._tasks[worker_id].put(("frame", slot, self._slots[slot].name, shape, sequence, timestamp))
+
+    def poll(self, timeout=0):
+        """התוצאה החדשה ביותר שהגיעה מאז הקריאה הקודמת, או None
+
+        Args:
+            timeout: זמן המתנה לתוצאה ראשונה (0 = לא חוסם)
+        Returns:
+            FaceResult עם frame - התמונה שהמיקומים שלה
+        """
+        latest = None
+        latest_slot = None
+        block = timeout > 0
+        while True:
+            try:
+                slot, result = self._results.get(block=block, timeout=timeout if block else None)
+            except queue.Empty:
+                break
+            block = False
+            if self._in_flight.get(result.worker) != slot:
+                # תוצאה של עובד שכבר הוחלף - הסלוט שלו שוחרר
+                continue
+            del self._in_flight[result.worker]
+            self._idle.append(result.worker)
+            self.completed += 1
+            # עם כמה עובדים תוצאות יכולות להגיע שלא לפי הסדר
+            if result.sequence <= self._last_sequence:
+                self.stale += 1
+                self._free_slots.append(slot)
+                continue
+            if latest_slot is not None:
+                self._free_slots.append(latest_slot)
+            self._last_sequence = result.sequence
+            latest, latest_slot = result, slot
+
+        if latest is not None:
+            # עותק של התמונה שזוהתה, לפני שהסלוט חוזר לשימוש
+            frame = np.ndarray(self._shapes[latest_slot], dtype=np.uint8,
+                               buffer=self._slots[latest_slot].buf).copy()
+            self._free_slots.append(latest_slot)
+            latest = latest._replace(frame=frame)
+        self._check_workers()
+        self._dispatch()
+        return latest
+
+    def sync_known_faces(self):
+        """העובדים טוענים מהמאגר את הפנים שנוספו"""
+        for tasks in self._tasks:
+            tasks.put(("sync",))
+
+    def collect_unknown(self, enabled):
+        """בזמן רישום: העובדים מחשבים encoding לפנים לא מוכרות בכל זיהוי"""
+        self._collecting = enabled
+        for tasks in self._tasks:
+            tasks.put(("collect", enabled))
+
+    def stats(self):
+        return {
+            "workers": self.worker_count,
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "completed": self.completed,
+            "stale": self.stale,
+            "restarts": sum(self._restarts),
+        }
+
+    def close(self, timeout=2.0):
+        """עצירת העובדים ושחרור הזיכרון המשותף"""
+        for tasks in self._tasks:
+            tasks.put(None)
+        deadline = time.time() + timeout
+        for process in filter(None, self._processes):
+            process.join(max(0.0, deadline - time.time()))
+            if process.is_alive():
+                process.terminate()
+                process.join(1.0)
+        self._processes = []
+        self._tasks = []
+        self._idle = []
+        self._in_flight = {}
+
+        for index, shm in enumerate(self._slots):
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+                self._slots[index] = None
+        print(f"Face recognition service stopped: {self.stats()}")
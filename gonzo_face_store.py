@@ -0,0 +1,236 @@
+# מאגר פנים על הדיסק - מטריצת encodings ממופה לזיכרון + יומן הוספות
+import os
+import json
+import shutil
+import pickle
+import argparse
+import threading
+from datetime import datetime
+import numpy as np
+
+ENCODING_SIZE = 128
+STORE_VERSION = 1
+
+
+def _fsync_directory(directory):
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class FaceStore:
+    """Append-only face database: a memory-mapped .npy matrix plus a journal.
+
+    encodings.npy is a float32 (capacity, 128) matrix opened with mmap, so the
+    encodings are never decoded; callers copy them once into a
+    FaceEncodingMatrix, which adds norms and labels. journal.jsonl has one
+    line per enrolled face ({"row", "name", "added"}), read on open, and is
+    the commit record: a row counts only once its journal line is on disk. Enrollment writes the row, msyncs it,
+    then appends and fsyncs the journal line, so a crash at any point leaves
+    the store readable. A torn last line is dropped on the next open.
+
+    The matrix doubles its capacity when full, so appends are O(1) amortized.
+
+    With `readonly` (other processes reading a store that is being written)
+    nothing is created or repaired: a torn last line is only skipped.
+    """
+
+    def __init__(self, directory="face_store", initial_capacity=256, readonly=False):
+        self.directory = directory
+        self.readonly = readonly
+        self.encodings_path = os.path.join(directory, "encodings.npy")
+        self.journal_path = os.path.join(directory, "journal.jsonl")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self._lock = threading.Lock()
+
+        if not os.path.exists(self.meta_path):
+            if readonly:
+                raise FileNotFoundError(f"Face store {directory} does not exist")
+            self._create(initial_capacity)
+
+        with open(self.meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get("version") != STORE_VERSION or meta.get("dimension") != ENCODING_SIZE:
+            raise ValueError(f"Unsupported face store format in {directory}: {meta}")
+
+        self._matrix = np.load(self.encodings_path, mmap_mode='r' if readonly else 'r+')
+        self.names = self._read_journal()
+        if len(self.names) > len(self._matrix):
+            raise ValueError(f"Face store journal has {len(self.names)} rows but the matrix holds {len(self._matrix)}")
+
+    @staticmethod
+    def exists(directory):
+        return os.path.exists(os.path.join(directory, "meta.json"))
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def encodings(self):
+        """view ממופה על השורות שנרשמו ביומן"""
+        return self._matrix[:len(self.names)]
+
+    @property
+    def capacity(self):
+        return len(self._matrix)
+
+    def _create(self, capacity):
+        os.makedirs(self.directory, exist_ok=True)
+        matrix = np.lib.format.open_memmap(self.encodings_path, mode='w+', dtype=np.float32,
+                                           shape=(capacity, ENCODING_SIZE))
+        matrix.flush()
+        del matrix
+        open(self.journal_path, 'a').close()
+        # meta.json נכתב אחרון - בלעדיו המאגר לא נחשב קיים
+        self._write_atomic(self.meta_path, json.dumps({
+            "version": STORE_VERSION,
+            "dimension": ENCODING_SIZE,
+            "dtype": "float32",
+        }))
+
+    def _write_atomic(self, path, text):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._fsync_directory()
+
+    def _fsync_directory(self):
+        _fsync_directory(self.directory)
+
+    def _read_journal(self):
+        """קריאת היומן - שורה קטועה/פגומה בסוף (קריסה באמצע כתיבה) נחתכת"""
+        names = []
+        valid_length = 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    if not line.endswith(b"\n") or entry["row"] != len(names):
+                        raise ValueError(f"unexpected journal entry {entry}")
+                except (ValueError, KeyError) as e:
+                    if not self.readonly:
+                        print(f"Face store journal truncated after {len(names)} entries: {e}")
+                    break
+                names.append(entry["name"])
+                valid_length += len(line)
+
+        if not self.readonly and valid_length != os.path.getsize(self.journal_path):
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(valid_length)
+                os.fsync(f.fileno())
+        return names
+
+    def _grow(self):
+        """הכפלת הקיבולת: קובץ חדש, העתקה, והחלפה אטומית"""
+        capacity = self.capacity * 2
+        tmp_path = self.encodings_path + ".tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32,
+                                          shape=(capacity, ENCODING_SIZE))
+        grown[:len(self.names)] = self.encodings
+        grown.flush()
+        del grown
+        self._matrix = None
+        os.replace(tmp_path, self.encodings_path)
+        self._fsync_directory()
+        self._matrix = np.load(self.encodings_path, mmap_mode='r+')
+
+    def append(self, encoding, name):
+        """Enroll one face durably - returns its row index"""
+        if self.readonly:
+            raise PermissionError(f"Face store {self.directory} is open read-only")
+        encoding = np.asarray(encoding, dtype=np.float32).reshape(ENCODING_SIZE)
+        with self._lock:
+            row = len(self.names)
+            if row == self.capacity:
+                self._grow()
+
+            # קודם הנתונים, אחר כך רשומת היומן שמאשרת אותם
+            self._matrix[row] = encoding
+            self._matrix.flush()
+            entry = {"row": row, "name": name, "added": datetime.now().isoformat(timespec='seconds')}
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.names.append(name)
+        return row
+
+    def extend(self, encodings, names):
+        """הוספת כמה פנים (למשל בהעברה מהפורמט הישן) עם fsync אחד בסוף"""
+        if self.readonly:
+            raise PermissionError(f"Face store {self.directory} is open read-only")
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        if len(encodings) != len(names):
+            raise ValueError(f"Got {len(encodings)} encodings for {len(names)} names")
+        with self._lock:
+            start = len(self.names)
+            while start + len(encodings) > self.capacity:
+                self._grow()
+            self._matrix[start:start + len(encodings)] = encodings
+            self._matrix.flush()
+            added = datetime.now().isoformat(timespec='seconds')
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                for offset, name in enumerate(names):
+                    f.write(json.dumps({"row": start + offset, "name": name, "added": added},
+                                       ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.names.extend(names)
+        return start
+
+
+# קבצים שמאגר שלא הושלם (בלי meta.json) יכול להכיל - מותר למחוק אותם
+_STORE_FILES = {"encodings.npy", "encodings.npy.tmp", "journal.jsonl", "meta.json.tmp"}
+
+
+def _remove_incomplete_store(directory):
+    """מחיקת מאגר שהיצירה שלו נקטעה - רק אם יש בו קבצי מאגר בלבד"""
+    if not os.path.isdir(directory):
+        return
+    leftovers = set(os.listdir(directory))
+    if not leftovers <= _STORE_FILES:
+        raise FileExistsError(f"{directory} exists and is not a face store: {sorted(leftovers - _STORE_FILES)}")
+    shutil.rmtree(directory)
+
+
+def migrate_pickle(pickle_path="known_faces.pkl", directory="face_store"):
+    """One-shot migration from the {"encodings": [...], "names": [...]} pickle.
+
+    This is the layout written by both main.py and main_first_v.py. The store
+    is built in a temporary directory and renamed into place once complete,
+    so a crash during migration leaves no store and the next boot migrates
+    again. The pickle file is left in place.
+    """
+    if FaceStore.exists(directory):
+        raise FileExistsError(f"Face store {directory} already exists")
+
+    with open(pickle_path, "rb") as f:
+        data = pickle.load(f)
+    encodings = data.get("encodings", [])
+    names = list(data.get("names", []))
+
+    tmp_directory = directory.rstrip(os.sep) + ".migrating"
+    _remove_incomplete_store(tmp_directory)
+    _remove_incomplete_store(directory)
+    store = FaceStore(tmp_directory, initial_capacity=max(256, len(names)))
+    if names:
+        store.extend(np.asarray(encodings, dtype=np.float32), names)
+    del store
+    os.replace(tmp_directory, directory)
+    _fsync_directory(os.path.dirname(os.path.abspath(directory)))
+    print(f"Migrated {len(names)} faces from {pickle_path} to {directory}")
+    return FaceStore(directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate known_faces.pkl to the memory-mapped face store")
+    parser.add_argument("pickle_path", nargs="?", default="known_faces.pkl")
+    parser.add_argument("directory", nargs="?", default="face_store")
+    args = parser.parse_args()
+    migrate_pickle(args.pickle_path, args.directory)
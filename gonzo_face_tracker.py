@@ -0,0 +1,220 @@
+# מעקב אחרי פנים בין זיהויים - encoding מחושב רק לפנים חדשות או כשצריך לאמת מחדש
+import time
+import itertools
+import cv2
+
+
+def _iou(a, b):
+    """IoU בין שני מלבנים בפורמט face_recognition: (top, right, bottom, left)"""
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    if right <= left or bottom <= top:
+        return 0.0
+    inter = (right - left) * (bottom - top)
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return inter / float(area_a + area_b - inter)
+
+
+def _centroid_distance(a, b):
+    """מרחק בין מרכזי המלבנים, יחסית לרוחב המלבן הקיים"""
+    ax, ay = (a[1] + a[3]) / 2.0, (a[0] + a[2]) / 2.0
+    bx, by = (b[1] + b[3]) / 2.0, (b[0] + b[2]) / 2.0
+    width = max(1, a[1] - a[3])
+    return ((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5 / width
+
+
+def _create_correlation_tracker():
+    """מעקב קורלציה של OpenCV אם זמין (MOSSE/KCF), אחרת None"""
+    for factory in ("legacy.TrackerMOSSE_create", "TrackerMOSSE_create", "TrackerKCF_create"):
+        owner = cv2
+        try:
+            for part in factory.split("."):
+                owner = getattr(owner, part)
+            return owner()
+        except AttributeError:
+            continue
+    return None
+
+
+class FaceTrack:
+    """One tracked face: its box, and the identity/encoding from its last check"""
+
+    def __init__(self, track_id, box, now):
+        self.track_id = track_id
+        self.box = box
+        self.name = None            # None = עדיין לא זוהה
+        self.encoding = None
+        self.match = None
+        self.first_seen = now
+        self.last_seen = now
+        self.last_verified = None
+        self.missed = 0
+        self.correlation = None
+
+
+class FaceTracker:
+    """IoU/centroid multi-face tracker that decides when re-identification is needed.
+
+    Detections of each processed frame are associated with existing tracks by
+    IoU, then by centroid distance for faces that moved quickly. A track only
+    needs its 128-d encoding recomputed when it is new or when
+    `reverify_interval` seconds have passed since its last check; a track that
+    goes unseen for more than `max_missed` updates is dropped, so a face that
+    comes back is identified again as a new track.
+
+    With `use_correlation` an OpenCV correlation tracker follows every face,
+    and full detection runs only every `detection_interval` processed frames.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_centroid_distance=0.5, max_missed=3,
+                 reverify_interval=10.0, use_correlation=False, detection_interval=3):
+        self.iou_threshold = iou_threshold
+        self.max_centroid_distance = max_centroid_distance
+        self.max_missed = max_missed
+        self.reverify_interval = reverify_interval
+        self.use_correlation = use_correlation and _create_correlation_tracker() is not None
+        if use_correlation and not self.use_correlation:
+            print("OpenCV correlation tracker not available - tracking by detection only")
+        self.detection_interval = max(1, detection_interval)
+
+        self.tracks = []
+        self._ids = itertools.count(1)
+        self._frames_since_detection = 0
+
+        # מדדים
+        self.started = time.time()
+        self.faces_seen = 0
+        self.encodings_computed = 0
+        self.tracks_created = 0
+        self.tracks_lost = 0
+
+    def detection_due(self):
+        """האם להריץ זיהוי מלא בתמונה הזו (תמיד, אלא אם מעקב הקורלציה פעיל)"""
+        if not self.use_correlation or not self.tracks:
+            return True
+        return self._frames_since_detection + 1 >= self.detection_interval
+
+    def update(self, face_locations, frame=None, now=None):
+        """Associate this frame's detections with the tracks.
+
+        Returns:
+            list: FaceTrack לכל פנים שזוהו, באותו סדר כמו face_locations
+        """
+        now = time.time() if now is None else now
+        self._frames_since_detection = 0
+
+        pairs = sorted(
+            ((_iou(track.box, box), t, d) for t, track in enumerate(self.tracks)
+             for d, box in enumerate(face_locations)),
+            reverse=True
+        )
+        assigned = [None] * len(face_locations)
+        used = set()
+        for score, t, d in pairs:
+            if score < self.iou_threshold:
+                break
+            if t in used or assigned[d] is not None:
+                continue
+            assigned[d] = self.tracks[t]
+            used.add(t)
+
+        # פנים שזזו מהר: התאמה לפי מרחק מרכזים
+        for d, box in enumerate(face_locations):
+            if assigned[d] is not None:
+                continue
+            candidates = [(_centroid_distance(track.box, box), t) for t, track in enumerate(self.tracks)
+                          if t not in used]
+            if candidates:
+                distance, t = min(candidates)
+                if distance <= self.max_centroid_distance:
+                    assigned[d] = self.tracks[t]
+                    used.add(t)
+
+        # מסלולים שלא נראו בתמונה הזו
+        kept = []
+        for t, track in enumerate(self.tracks):
+            if t not in used:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    self.tracks_lost += 1
+                    continue
+            kept.append(track)
+
+        for d, box in enumerate(face_locations):
+            track = assigned[d]
+            if track is None:
+                track = FaceTrack(next(self._ids), box, now)
+                kept.append(track)
+                self.tracks_created += 1
+            track.box = box
+            track.last_seen = now
+            track.missed = 0
+            if self.use_correlation and frame is not None:
+                self._start_correlation(track, frame)
+            assigned[d] = track
+
+        self.tracks = kept
+        self.faces_seen += len(face_locations)
+        return assigned
+
+    def predict(self, frame, now=None):
+        """Move the tracks with their correlation trackers, without detection"""
+        now = time.time() if now is None else now
+        self._frames_since_detection += 1
+        visible = []
+        for track in self.tracks:
+            if track.correlation is None:
+                continue
+            ok, (x, y, w, h) = track.correlation.update(frame)
+            if not ok:
+                # המעקב איבד את הפנים - הזיהוי הבא יחליט
+                track.correlation = None
+                continue
+            track.box = (int(y), int(x + w), int(y + h), int(x))
+            track.last_seen = now
+            visible.append(track)
+        self.faces_seen += len(visible)
+        return visible
+
+    def _start_correlation(self, track, frame):
+        top, right, bottom, left = track.box
+        tracker = _create_correlation_tracker()
+        try:
+            tracker.init(frame, (left, top, right - left, bottom - top))
+            track.correlation = tracker
+        except cv2.error:
+            track.correlation = None
+
+    def needs_identification(self, track, now=None):
+        """מסלול חדש, או שעבר זמן האימות מחדש"""
+        if track.last_verified is None:
+            return True
+        now = time.time() if now is None else now
+        return now - track.last_verified >= self.reverify_interval
+
+    def identified(self, track, encoding, name, match=None, now=None):
+        """רישום תוצאת הזיהוי על המסלול"""
+        track.encoding = encoding
+        track.name = name
+        track.match = match
+        track.last_verified = time.time() if now is None else now
+        self.encodings_computed += 1
+
+    def invalidate(self):
+        """מאגר הפנים השתנה - כל מסלול יזוהה מחדש בתמונה הבאה"""
+        for track in self.tracks:
+            track.last_verified = None
+
+    def stats(self):
+        minutes = max((time.time() - self.started) / 60.0, 1e-9)
+        avoided = self.faces_seen - self.encodings_computed
+        return {
+            "active_tracks": len(self.tracks),
+            "tracks_created": self.tracks_created,
+            "tracks_lost": self.tracks_lost,
+            "faces_seen": self.faces_seen,
+            "encodings_computed": self.encodings_computed,
+            "encodings_avoided": avoided,
+            "encodings_avoided_per_minute": avoided / minutes,
+        }
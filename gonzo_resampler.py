@@ -0,0 +1,201 @@
+# מודול דגימה מחדש (resampling) זורמת עבור נתיב השמע של GonzoSTT
+from math import gcd
+import time
+
+import numpy as np
+from scipy import signal
+
+
+class StreamingResampler:
+    """Stateful polyphase resampler for a single input stream.
+
+    The FIR filter is designed once and split into `up` phases. Filter history
+    is kept between blocks, so consecutive PortAudio blocks are resampled as one
+    continuous signal (no FFT block-edge artifacts).
+    """
+
+    def __init__(self, from_rate, to_rate=16000, taps_per_phase=None, kaiser_beta=5.0):
+        self.from_rate = int(from_rate)
+        self.to_rate = int(to_rate)
+
+        g = gcd(self.from_rate, self.to_rate)
+        self.up = self.to_rate // g
+        self.down = self.from_rate // g
+        self.passthrough = (self.up == self.down)
+
+        # ברירת מחדל כמו ב-resample_poly: כ-10 מעברי אפס בכל צד של המסנן
+        if taps_per_phase is None:
+            taps_per_phase = -(-(20 * max(self.up, self.down) + 1) // self.up)
+        self.taps_per_phase = taps_per_phase
+
+        if not self.passthrough:
+            # תכנון מסנן low-pass פעם אחת ופירוק שלו ל-up פאזות
+            num_taps = self.up * taps_per_phase
+            cutoff = 1.0 / max(self.up, self.down)
+            taps = signal.firwin(num_taps, cutoff, window=('kaiser', kaiser_beta)) * self.up
+
+            # phases[p, k] = taps[k * up + p], הפוך כדי להכפיל ישירות בחלון קלט עולה
+            phases = taps.reshape(taps_per_phase, self.up).T
+            self._phases = np.ascontiguousarray(phases[:, ::-1], dtype=np.float32)
+
+            self._table_length = 0
+            self._ensure_tables(self.up + 1024)
+
+        self.reset()
+
+    def _ensure_tables(self, length):
+        """Precompute input index and coefficient rows for output numbers 0..length-1
+
+        Output number m reads its window starting at input (m * down) // up with
+        phase (m * down) % up. Keeping the output counter below `up` means every
+        block only needs a contiguous slice of these tables.
+        """
+        if length <= self._table_length:
+            return
+        t = np.arange(length, dtype=np.int64) * self.down
+        self._input_index = t // self.up
+        self._coefficients = np.ascontiguousarray(self._phases[t % self.up])
+        self._table_length = length
+
+    def reset(self):
+        """Drop filter history (call when a stream is reopened)"""
+        self._history = np.zeros(self.taps_per_phase - 1, dtype=np.float32)
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._index = np.zeros(0, dtype=np.int64)
+        self._windows = np.zeros((0, self.taps_per_phase), dtype=np.float32)
+        self._out = np.zeros(0, dtype=np.float32)
+        # מספר דגימת היציאה הבאה ומיקום תחילת הבלוק בקלט (שניהם מנורמלים מחזורית)
+        self._next_output = 0
+        self._block_start = 0
+
+    def max_output_length(self, input_length):
+        """Upper bound on the number of samples produced for a block"""
+        if self.passthrough:
+            return input_length
+        return (input_length * self.up) // self.down + 1
+
+    def _scratch(self, n_in, n_out):
+        """באפרי עבודה קבועים - מוקצים מחדש רק כשגודל הבלוק משתנה"""
+        history = self.taps_per_phase - 1
+        if len(self._buffer) != history + n_in:
+            self._buffer = np.empty(history + n_in, dtype=np.float32)
+            self._window_view = np.lib.stride_tricks.sliding_window_view(self._buffer, self.taps_per_phase)
+        if len(self._out) < n_out:
+            self._index = np.empty(n_out, dtype=np.int64)
+            self._windows = np.empty((n_out, self.taps_per_phase), dtype=np.float32)
+            self._out = np.empty(n_out, dtype=np.float32)
+
+    def _filter(self, samples):
+        """הרצת המסנן על בלוק - מחזיר view לתוצאה ב-float32 בתוך באפר העבודה"""
+        n_in = len(samples)
+        history = self.taps_per_phase - 1
+
+        # כל דגימות היציאה שהחלון שלהן מסתיים בתוך הבלוק הנוכחי
+        block_end = self._block_start + n_in
+        first = self._next_output
+        last = -(-(block_end * self.up) // self.down)
+        n_out = max(0, last - first)
+        self._ensure_tables(first + n_out)
+        self._scratch(n_in, n_out)
+
+        # באפר עבודה קבוע: היסטוריה + בלוק נוכחי
+        buf = self._buffer
+        buf[:history] = self._history
+        buf[history:] = samples
+
+        index = self._index[:n_out]
+        np.subtract(self._input_index[first:first + n_out], self._block_start, out=index)
+        windows = self._windows[:n_out]
+        # האינדקסים תמיד בטווח - mode='clip' חוסך באפר ביניים
+        np.take(self._window_view, index, axis=0, out=windows, mode='clip')
+        out = self._out[:n_out]
+        np.einsum('nk,nk->n', windows, self._coefficients[first:first + n_out], out=out)
+
+        # עדכון מצב: כל up דגימות יציאה מתאימות בדיוק ל-down דגימות קלט
+        cycles, self._next_output = divmod(first + n_out, self.up)
+        self._block_start = block_end - cycles * self.down
+        self._history[:] = buf[n_in:]
+
+        np.clip(out, -32768, 32767, out=out)
+        return out
+
+    def process_array(self, samples):
+        """Resample an int16 numpy block and return an int16 numpy block"""
+        if self.passthrough:
+            return samples
+        return self._filter(samples).astype(np.int16)
+
+    def process_into(self, samples, out):
+        """Resample straight into a caller-owned int16 array, without allocating.
+
+        Returns:
+            int: מספר הדגימות שנכתבו ל-out
+        """
+        if self.passthrough:
+            n = len(samples)
+            out[:n] = samples
+            return n
+        result = self._filter(samples)
+        n = len(result)
+        np.copyto(out[:n], result, casting='unsafe')
+        return n
+
+    def process(self, audio_data):
+        """Resample raw int16 bytes and return raw int16 bytes"""
+        if self.passthrough:
+            return bytes(audio_data)
+        samples = np.frombuffer(audio_data, dtype=np.int16)
+        return self.process_array(samples).tobytes()
+
+
+def _fft_resample_block(audio_data, from_rate, to_rate):
+    """The original per-block FFT path of GonzoSTT._resample_audio (for comparison)"""
+    audio_np = np.frombuffer(audio_data, dtype=np.int16)
+    new_length = int(len(audio_np) * to_rate / from_rate)
+    resampled = signal.resample(audio_np, new_length)
+    return resampled.astype(np.int16).tobytes()
+
+
+def benchmark(rates=(44100, 48000, 22050), to_rate=16000, block_size=1024, seconds=30):
+    """השוואת זמן CPU לשנייה של שמע בין resample FFT לבין המסנן הפוליפאזי"""
+    rng = np.random.default_rng(0)
+    results = []
+
+    for rate in rates:
+        n_blocks = int(seconds * rate / block_size)
+        t = np.arange(n_blocks * block_size) / rate
+        # טון + רעש כדי שהקלט לא יהיה טריוויאלי
+        audio = (3000 * np.sin(2 * np.pi * 440 * t) + rng.normal(0, 500, len(t)))
+        audio = np.clip(audio, -32768, 32767).astype(np.int16)
+        blocks = [audio[i * block_size:(i + 1) * block_size].tobytes() for i in range(n_blocks)]
+        audio_seconds = n_blocks * block_size / rate
+
+        start = time.process_time()
+        for block in blocks:
+            _fft_resample_block(block, rate, to_rate)
+        fft_cpu = time.process_time() - start
+
+        # הנתיב של מנוע הלכידה: כתיבה ישירה לבאפר קבוע
+        resampler = StreamingResampler(rate, to_rate)
+        out = np.zeros(resampler.max_output_length(block_size), dtype=np.int16)
+        start = time.process_time()
+        for block in blocks:
+            resampler.process_into(np.frombuffer(block, dtype=np.int16), out)
+        poly_cpu = time.process_time() - start
+
+        results.append({
+            "rate": rate,
+            "fft_cpu_per_sec": fft_cpu / audio_seconds,
+            "polyphase_cpu_per_sec": poly_cpu / audio_seconds,
+        })
+
+    return results
+
+
+# מבחן ביצועים אם מריצים את המודול ישירות
+if __name__ == "__main__":
+    print("CPU seconds per second of audio (block size 1024 -> 16000 Hz)")
+    for r in benchmark():
+        speedup = r["fft_cpu_per_sec"] / r["polyphase_cpu_per_sec"] if r["polyphase_cpu_per_sec"] else float('inf')
+        print(f"{r['rate']:>6} Hz: fft={r['fft_cpu_per_sec'] * 1000:.3f} ms/s  "
+              f"polyphase={r['polyphase_cpu_per_sec'] * 1000:.3f} ms/s  (x{speedup:.1f})")
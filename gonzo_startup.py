@@ -0,0 +1,45 @@
+# מדידת זמני שלבי ההפעלה - כדי לראות מה מאט את עליית המערכת
+import time
+import threading
+from contextlib import contextmanager
+
+
+class StartupTimings:
+    """Wall-clock duration of each startup phase.
+
+    Phases may run on different threads (the Vosk model loads in the
+    background while the other modules initialize), so recording is locked.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        """מדידת שלב: with timings.phase("tts"): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.phases[name] = seconds
+        print(f"[startup] {name}: {seconds:.2f}s")
+
+    def elapsed(self):
+        """הזמן מאז תחילת ההפעלה"""
+        return time.perf_counter() - self.started
+
+    def report(self):
+        """סיכום כל השלבים שנמדדו עד עכשיו"""
+        with self._lock:
+            phases = dict(self.phases)
+        print("=== Startup timings ===")
+        for name, seconds in phases.items():
+            print(f"{name}: {seconds:.2f}s")
+        print(f"total: {self.elapsed():.2f}s")
+        return phases
@@ -0,0 +1,154 @@
+# כלי מדידה לנתיב הדיבור - השמעת קבצי WAV דרך GonzoSTT בלי מיקרופון
+#
+# שימוש:
+#   python gonzo_stt_benchmark.py clips_dir [--realtime] [--config config.yaml]
+#
+# התיקייה יכולה להכיל labels.json (ראו WavReplaySource) עם:
+#   wake      - האם מילת ההפעלה נאמרת בקליפ
+#   wake_end  - שנייה בקליפ שבה מילת ההפעלה מסתיימת (למדידת השהיה)
+#   command   - הפקודה שנאמרת אחרי מילת ההפעלה (למדידת WER)
+import argparse
+import os
+import time
+import yaml
+from gonzo_audio_replay import WavReplaySource
+from gonzo_stt_vosk import GonzoSTT
+
+
+def word_error_rate(reference, hypothesis):
+    """WER - מרחק עריכה ברמת מילים חלקי מספר המילים בטקסט הייחוס"""
+    ref = reference.lower().split()
+    hyp = (hypothesis or "").lower().split()
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1,
+                             current[j - 1] + 1,
+                             previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+class STTBenchmark:
+    """Replays labelled clips through a real GonzoSTT and scores the results"""
+
+    def __init__(self, config, paths, realtime=False):
+        self.source = WavReplaySource(paths, realtime=realtime, backpressure=self._consumer_ready,
+                                      start_gate=self._listening)
+        self.stt = GonzoSTT(config, audio_source=self.source)
+        self.stt.on_wake_word_detected = self._on_wake_word
+
+        self.detections = {}  # שם קליפ -> זמני זיהוי בתוך הקליפ
+        self.commands = {}    # שם קליפ -> טקסט הפקודה שזוהתה
+
+    def _listening(self):
+        """ה-thread של מילת ההפעלה כבר רשום למנוע הלכידה"""
+        engine = self.stt.capture_engines.get(self.stt.device_index_listening)
+        return engine is not None and engine.subscriber_count > 0
+
+    def _consumer_ready(self):
+        """בריצה מהירה - בלוק חדש רק אחרי שהמזהה סיים את הקודם"""
+        if not self._listening():
+            return False
+        return self.stt.listening_queue.empty() and self.stt.command_queue.empty()
+
+    def _on_wake_word(self, response):
+        clip = self.source.current_clip
+        self.detections.setdefault(clip.name, []).append(self.source.clip_time)
+
+        if clip.label.get("command") is None:
+            self.stt.resume_wake_word_listening()
+            return
+
+        # אותו זרם כמו GonzoAI.on_wake_word: קודם פקודה ברצף, אחר כך האזנה רגילה
+        command = self.stt.listen_for_followup_command()
+        if not command:
+            command = self.stt.recognize_command()
+        self.commands[clip.name] = command
+
+    def run(self):
+        # טעינת המודל (ברקע כברירת מחדל) לא נכנסת למדידת ה-CPU, וההשמעה לא מתחילה לפניה
+        self.stt.wait_until_ready()
+        cpu_start = time.process_time()
+        wall_start = time.time()
+
+        self.stt.start_listening()
+        while not self.source.finished.wait(0.5):
+            if not self.stt.listening_thread.is_alive():
+                print("Wake word thread stopped before the replay finished")
+                break
+        # המתנה לפענוח הבלוקים האחרונים
+        while not (self.stt.listening_queue.empty() and self.stt.command_queue.empty()):
+            time.sleep(0.05)
+        time.sleep(0.5)
+        self.stt.stop_listening()
+
+        cpu_seconds = time.process_time() - cpu_start
+        return self.report(cpu_seconds, time.time() - wall_start)
+
+    def report(self, cpu_seconds, wall_seconds):
+        latencies = []
+        false_accepts = false_rejects = positives = negatives = 0
+        wers = []
+
+        for clip in self.source.clips:
+            detected = self.detections.get(clip.name, [])
+            if clip.label.get("wake", False):
+                positives += 1
+                if not detected:
+                    false_rejects += 1
+                elif "wake_end" in clip.label:
+                    latencies.append(detected[0] - clip.label["wake_end"])
+            else:
+                negatives += 1
+                if detected:
+                    false_accepts += 1
+
+            if clip.label.get("command") is not None and detected:
+                wers.append(word_error_rate(clip.label["command"], self.commands.get(clip.name)))
+
+        audio_seconds = self.source.audio_seconds
+        return {
+            "clips": len(self.source.clips),
+            "audio_seconds": audio_seconds,
+            "wall_seconds": wall_seconds,
+            "cpu_per_audio_second": cpu_seconds / audio_seconds if audio_seconds else 0.0,
+            "wake_latency_mean": sum(latencies) / len(latencies) if latencies else None,
+            "wake_latency_max": max(latencies) if latencies else None,
+            "false_accept_rate": false_accepts / negatives if negatives else None,
+            "false_reject_rate": false_rejects / positives if positives else None,
+            "command_wer": sum(wers) / len(wers) if wers else None,
+            "vad": self.stt.vad_stats(),
+        }
+
+
+def print_report(report):
+    print("\n=== STT benchmark ===")
+    for key, value in report.items():
+        if key == "vad":
+            for name, stats in value.items():
+                print(f"vad.{name}: skipped {stats['skipped_fraction'] * 100:.1f}% of {stats['audio_seconds']:.1f}s")
+        elif isinstance(value, float):
+            print(f"{key}: {value:.4f}")
+        else:
+            print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay WAV clips through GonzoSTT and report latency/accuracy/CPU")
+    parser.add_argument("paths", nargs="+", help="WAV files or directories of labelled clips")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--realtime", action="store_true", help="play at real-time speed instead of as fast as possible")
+    args = parser.parse_args()
+
+    config = {}
+    if os.path.exists(args.config):
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f) or {}
+
+    benchmark = STTBenchmark(config, args.paths, realtime=args.realtime)
+    print_report(benchmark.run())
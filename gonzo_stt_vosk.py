@@ -3,15 +3,95 @@ import os
 import json
 import queue
 import threading
-import numpy as np
 import sounddevice as sd
 from vosk import Model, KaldiRecognizer
 import time
 import random
-from scipy import signal
+from concurrent.futures import Future
+from gonzo_audio_capture import AudioCaptureEngine, DeviceCapabilityCache
+from gonzo_vad import NoiseFloor, VoiceActivityGate
+
+# ה-API הפנימי של vosk (_c, _ffi ו-recognizer._handle) מאפשר להעביר buffer בלי
+# ההעתקה ל-bytes. הוא לא חלק מה-API הציבורי, לכן משתמשים בו רק בגרסאות שנבדקו
+_ZERO_COPY_VOSK_SERIES = ((0, 3),)
+
+
+def _vosk_version():
+    try:
+        from importlib.metadata import version
+        return tuple(int(part) for part in version("vosk").split(".")[:2])
+    except Exception:
+        return None
+
+
+_vosk_c = _vosk_ffi = None
+if _vosk_version() in _ZERO_COPY_VOSK_SERIES:
+    try:
+        from vosk import _c as _vosk_c, _ffi as _vosk_ffi
+    except ImportError:
+        _vosk_c = _vosk_ffi = None
+
+
+class CommandEndpointer:
+    """Decides when a command utterance is over, from the stream of partials.
+
+    Time is counted in audio samples, so pre-roll audio decoded faster than
+    real time is judged the same way as live audio.
+    """
+    
+    END_OF_UTTERANCE = object()
+    
+    def __init__(self, phrases=(), trailing_silence=None, idle_timeout=None, match_stability=3,
+                 sample_rate=16000, partial_callback=None):
+        self.phrases = phrases
+        self.trailing_silence = int(trailing_silence * sample_rate) if trailing_silence else None
+        self.idle_timeout = int(idle_timeout * sample_rate) if idle_timeout else None
+        self.match_stability = match_stability
+        self.partial_callback = partial_callback
+        
+        self.partial = ""
+        self.stable_blocks = 0
+        self.samples = 0
+        self.last_change = 0
+        self.idle = False
+    
+    def _matched_phrase(self, text):
+        padded = f" {text} "
+        for phrase in self.phrases:
+            if f" {phrase} " in padded:
+                return phrase
+        return None
+    
+    def update(self, partial, samples):
+        """עדכון לאחר כל בלוק - מחזיר טקסט פקודה, END_OF_UTTERANCE או None"""
+        self.samples += samples
+        
+        if partial != self.partial:
+            self.partial = partial
+            self.stable_blocks = 0
+            self.last_change = self.samples
+            if partial and self.partial_callback:
+                self.partial_callback(partial)
+        else:
+            self.stable_blocks += 1
+        
+        if not self.partial:
+            # אין המשך דיבור - לא מחכים את כל זמן הפקודה
+            if self.idle_timeout is not None and self.samples > self.idle_timeout:
+                self.idle = True
+            return None
+        
+        # ביטוי פקודה מוכר שנשאר יציב כמה בלוקים - אין צורך לחכות לסוף המשפט
+        if self.stable_blocks >= self.match_stability and self._matched_phrase(self.partial):
+            return self.partial
+        
+        if self.trailing_silence is not None and self.samples - self.last_change >= self.trailing_silence:
+            return self.END_OF_UTTERANCE
+        return None
+
 
 class GonzoSTT:
-    def __init__(self, config=None):
+    def __init__(self, config=None, audio_source=None, timings=None, audio_session=None):
         # טעינת קונפיגורציה קודם
         if config:
             self.wake_word = config.get('wake_word', "gonzo")
@@ -36,6 +116,14 @@ class GonzoSTT:
                 "he": "models/vosk-model-he"
             }
         
+        # תיאום חצי-דופלקס עם ה-TTS - בזמן ש-Gonzo מדבר הבלוקים לא מפוענחים
+        self.audio_session = audio_session
+        
+        # מקור שמע חלופי (למשל WavReplaySource) במקום המיקרופונים - התקן יחיד
+        self.audio_source = audio_source
+        if audio_source is not None:
+            self.device_index_command = self.device_index_listening
+        
         # קונפיגורציה טכנית - חזרה לבאפר קטן יותר
         self.target_sample_rate = 16000
         self.block_size = 1024  # חזרנו לגודל קטן יותר
@@ -43,9 +131,52 @@ class GonzoSTT:
         self.is_listening = False
         self.command_mode = False
         
-        # מנגנון pause/resume
+        # מנגנון pause/resume - הקולבק קורא את הדגל בלי נעילה, ה-thread ממתין על התנאי
         self.wake_word_paused = False
-        self.pause_lock = threading.Lock()
+        self.pause_condition = threading.Condition()
+        # מונה "דורות" - כל pause/resume מקדם אותו, בלוקים מדור ישן נזרקים בלי לרוקן את התור
+        self.wake_generation = 0
+        
+        # pre-roll - השמע האחרון נשמר בכל התקן כדי שפקודה שנאמרה ברצף עם מילת ההפעלה לא תאבד
+        self.command_preroll_seconds = 5.0
+        self.command_followup_window = 1.0  # זמן המתנה להמשך דיבור אחרי מילת ההפעלה
+        if config:
+            self.command_preroll_seconds = config.get('command_preroll_seconds', self.command_preroll_seconds)
+            self.command_followup_window = config.get('command_followup_window', self.command_followup_window)
+        self.wake_position = None  # מיקום זיהוי מילת ההפעלה בשמע של מיקרופון הפקודות
+        self.wake_remainder = None  # מילים שנאמרו אחרי מילת ההפעלה באותו משפט
+        
+        # לכידת פקודה: זמן מקסימלי, וסיום מוקדם לפי ביטוי פקודה מוכר או שקט אחרי דיבור
+        self.command_timeout = 10
+        self.early_endpointing = True
+        self.command_trailing_silence = 0.6  # שניות שקט אחרי דיבור שמסיימות את הפקודה
+        self.command_match_stability = 3     # מספר בלוקים שתוצאה חלקית עם ביטוי מוכר צריכה להישאר יציבה
+        if config:
+            self.command_timeout = config.get('command_timeout', self.command_timeout)
+            self.early_endpointing = config.get('early_endpointing', self.early_endpointing)
+            self.command_trailing_silence = config.get('command_trailing_silence', self.command_trailing_silence)
+            self.command_match_stability = config.get('command_match_stability', self.command_match_stability)
+        self.command_phrases = ()
+        
+        # מצב מזהה מילת ההפעלה: "grammar" = דקדוק מצומצם (מילת ההפעלה + [unk]), "full" = אוצר מילים מלא
+        self.wake_word_mode = "grammar"
+        self.wake_on_partial = True  # הפעלה כבר על תוצאה חלקית, בלי לחכות לסוף המשפט
+        if config:
+            self.wake_word_mode = config.get('wake_word_mode', self.wake_word_mode)
+            self.wake_on_partial = config.get('wake_on_partial', self.wake_on_partial)
+        
+        # שער VAD - חוסך פענוח Kaldi על שקט
+        self.vad_enabled = True
+        vad_threshold_ratio = 4.0     # פי כמה מעל רצפת הרעש נחשב דיבור
+        vad_hangover_seconds = 0.8    # זמן פתיחה אחרי סוף דיבור (Kaldi צריך שקט לסיום משפט)
+        vad_padding_seconds = 0.3     # שמע שמוזן לפני תחילת הדיבור
+        vad_max_speech_seconds = 5.0  # "דיבור" רצוף ארוך מזה - רצפת הרעש מתחילה לעלות לאט
+        if config:
+            self.vad_enabled = config.get('vad_enabled', self.vad_enabled)
+            vad_threshold_ratio = config.get('vad_threshold_ratio', vad_threshold_ratio)
+            vad_hangover_seconds = config.get('vad_hangover_seconds', vad_hangover_seconds)
+            vad_padding_seconds = config.get('vad_padding_seconds', vad_padding_seconds)
+            vad_max_speech_seconds = config.get('vad_max_speech_seconds', vad_max_speech_seconds)
         
         # Native sample rates
         self.listening_native_rate = 44100
@@ -55,31 +186,53 @@ class GonzoSTT:
         self.listening_queue = queue.Queue(maxsize=20)
         self.command_queue = queue.Queue(maxsize=20)
         
-        # בחירת מודל לפי שפה
-        selected_model_path = self.model_paths.get(self.language, 
-                                                  self.model_paths.get("custom", 
-                                                                      self.model_paths.get("en")))
+        # מדידת שלבי ההפעלה (StartupTimings של המערכת, אם הועבר)
+        self.timings = timings
         
-        # טעינת מודל Vosk
-        if os.path.exists(selected_model_path):
-            self.model = Model(selected_model_path)
-            print(f"Loaded Vosk model from {selected_model_path}")
+        # טעינת מודל Vosk ברקע - שאר המודולים מאותחלים במקביל
+        self.model = None
+        self.wake_recognizer = None
+        self.command_recognizer = None
+        self.model_ready = Future()
+        # כמה בלוקים הועתקו ל-bytes כי המסלול בלי העתקה לא היה זמין
+        self.waveform_copies = 0
+        self._waveform_fallback_logged = False
+        
+        # מודל חסר הוא שגיאת הגדרה - נזרקת כאן, ולא נבלעת ב-thread הטעינה
+        self.model_path = self._resolve_model_path()
+        
+        background_loading = config.get('background_model_loading', True) if config else True
+        if background_loading:
+            loader = threading.Thread(target=self._load_model)
+            loader.daemon = True
+            loader.start()
         else:
-            print(f"Warning: Model path {selected_model_path} not found.")
-            # ניסיון fallback
-            fallback_path = self.model_paths.get("en", "models/vosk-model-small-en-us-0.15")
-            if os.path.exists(fallback_path):
-                self.model = Model(fallback_path)
-                print(f"Using fallback English model from {fallback_path}")
-            else:
-                raise FileNotFoundError(f"No Vosk model found. Please download a model to {selected_model_path}")
+            self._load_model()
+            self.model_ready.result()
         
-        # יצירת מזהי קול
-        self.wake_recognizer = KaldiRecognizer(self.model, self.target_sample_rate)
-        self.command_recognizer = KaldiRecognizer(self.model, self.target_sample_rate)
+        # מטמון יכולות ההתקנים - חוסך פתיחת streams לבדיקה בהפעלות הבאות
+        device_cache_file = config.get('device_cache_file', "device_cache.json") if config else "device_cache.json"
+        self.device_cache = DeviceCapabilityCache(device_cache_file)
         
         # זיהוי sample rates
+        start = time.perf_counter()
         self._detect_microphone_rates()
+        self._record_timing("microphone_rates", time.perf_counter() - start)
+        
+        # מנועי לכידה לפי אינדקס התקן - מיקרופון משותף נפתח פעם אחת בלבד
+        self.capture_engines = {}
+        self.engines_lock = threading.Lock()
+        
+        # שער VAD לפני כל מזהה, עם רצפת רעש נפרדת לכל התקן
+        self.noise_floors = {}
+        vad_settings = {
+            "threshold_ratio": vad_threshold_ratio,
+            "hangover_seconds": vad_hangover_seconds,
+            "padding_seconds": vad_padding_seconds,
+            "max_speech_seconds": vad_max_speech_seconds,
+        }
+        self.wake_gate = VoiceActivityGate(self._noise_floor(self.device_index_listening), **vad_settings)
+        self.command_gate = VoiceActivityGate(self._noise_floor(self.device_index_command), **vad_settings)
         
         # משפטי תגובה לזיהוי מילת ההפעלה
         self.wake_responses = {
@@ -103,8 +256,62 @@ class GonzoSTT:
         if config and 'responses' in config and 'wake_responses' in config['responses']:
             self.wake_responses = config['responses']['wake_responses']
     
+    def _resolve_model_path(self):
+        """בחירת תיקיית המודל לפי שפה (עם fallback לאנגלית) - FileNotFoundError אם אין"""
+        selected_model_path = self.model_paths.get(self.language, 
+                                                  self.model_paths.get("custom", 
+                                                                      self.model_paths.get("en")))
+        if os.path.exists(selected_model_path):
+            return selected_model_path
+        
+        print(f"Warning: Model path {selected_model_path} not found.")
+        # ניסיון fallback
+        fallback_path = self.model_paths.get("en", "models/vosk-model-small-en-us-0.15")
+        if os.path.exists(fallback_path):
+            print(f"Using fallback English model from {fallback_path}")
+            return fallback_path
+        raise FileNotFoundError(f"No Vosk model found. Please download a model to {selected_model_path}")
+    
+    def _load_model(self):
+        """טעינת המודל ויצירת המזהים - משלים את model_ready (או מעביר אליו את השגיאה)"""
+        start = time.perf_counter()
+        try:
+            model = Model(self.model_path)
+            print(f"Loaded Vosk model from {self.model_path}")
+            
+            # יצירת מזהי קול
+            self.model = model
+            self.wake_recognizer = self._create_wake_recognizer()
+            self.command_recognizer = KaldiRecognizer(self.model, self.target_sample_rate)
+        except Exception as e:
+            print(f"Error loading Vosk model: {e}")
+            self.model_ready.set_exception(e)
+            return
+        
+        self._record_timing("vosk_model", time.perf_counter() - start)
+        self.model_ready.set_result(self.model)
+    
+    def wait_until_ready(self, timeout=None):
+        """המתנה לסיום טעינת המודל - זורק את שגיאת הטעינה אם הייתה"""
+        return self.model_ready.result(timeout)
+    
+    @property
+    def is_ready(self):
+        return self.model_ready.done() and self.model_ready.exception() is None
+    
+    def _record_timing(self, name, seconds):
+        if self.timings is not None:
+            self.timings.record(name, seconds)
+        else:
+            print(f"[startup] {name}: {seconds:.2f}s")
+    
     def _detect_microphone_rates(self):
         """Detect the native sample rates for both microphones"""
+        if self.audio_source is not None:
+            self.listening_native_rate = self.command_native_rate = self.audio_source.sample_rate
+            print(f"Using audio source at {self.audio_source.sample_rate} Hz")
+            return
+        
         print("Detecting microphone sample rates...")
         
         self.listening_native_rate = self._get_device_native_rate(self.device_index_listening)
@@ -114,209 +321,508 @@ class GonzoSTT:
         print(f"Command mic (device {self.device_index_command}): {self.command_native_rate} Hz")
     
     def _get_device_native_rate(self, device_index):
-        """Get the native sample rate for a specific device"""
+        """Get the native sample rate for a specific device (cached across boots)"""
         try:
-            device_info = sd.query_devices(device_index)
-            native_rate = int(device_info['default_samplerate'])
-            
-            test_rates = [16000, 22050, 44100, 48000, 96000]
-            
-            if native_rate in test_rates:
-                return native_rate
-            
-            for rate in test_rates:
-                try:
-                    with sd.RawInputStream(
-                        samplerate=rate,
-                        device=device_index,
-                        dtype='int16',
-                        channels=1,
-                        blocksize=self.block_size
-                    ):
-                        return rate
-                except:
-                    continue
+            key = DeviceCapabilityCache.device_key(device_index)
+            cached_rate = self.device_cache.get(key, 'native_rate')
+            if cached_rate:
+                print(f"Using cached sample rate for '{key}'")
+                return cached_rate
             
+            native_rate = self._probe_device_rate(device_index)
+            self.device_cache.set(key, 'native_rate', native_rate)
             return native_rate
             
         except Exception as e:
             print(f"Error detecting sample rate for device {device_index}: {e}")
             return 48000
     
-    def _resample_audio(self, audio_data, from_rate, to_rate):
-        """Resample audio from one rate to another"""
-        if from_rate == to_rate:
-            return audio_data
-        
-        audio_np = np.frombuffer(audio_data, dtype=np.int16)
-        new_length = int(len(audio_np) * to_rate / from_rate)
-        resampled = signal.resample(audio_np, new_length)
-        resampled_int16 = resampled.astype(np.int16)
-        return resampled_int16.tobytes()
-    
-    def listening_callback(self, indata, frames, time, status):
-        """פונקציית קולבק להאזנה למילת ההפעלה"""
-        if status:
-            print(f"Error in listening mic: {status}")
-        
-        # בדיקה אם מושהה
-        with self.pause_lock:
-            if self.wake_word_paused:
-                return  # דילוג על עיבוד כשמושהה
-        
-        resampled_data = self._resample_audio(
-            bytes(indata), 
-            self.listening_native_rate, 
-            self.target_sample_rate
-        )
+    def _probe_device_rate(self, device_index):
+        """בדיקת קצבי דגימה ע"י פתיחת streams על ההתקן"""
+        device_info = sd.query_devices(device_index)
+        native_rate = int(device_info['default_samplerate'])
         
-        # אגרסיבי - רוקן תור אם הוא מתקרב למלא
-        while self.listening_queue.qsize() > 15:
+        test_rates = [16000, 22050, 44100, 48000, 96000]
+        
+        if native_rate in test_rates:
+            return native_rate
+        
+        for rate in test_rates:
             try:
-                self.listening_queue.get_nowait()
-            except queue.Empty:
-                break
+                with sd.RawInputStream(
+                    samplerate=rate,
+                    device=device_index,
+                    dtype='int16',
+                    channels=1,
+                    blocksize=self.block_size
+                ):
+                    return rate
+            except:
+                continue
         
-        # הוספה לתור עם בדיקת overflow
+        return native_rate
+    
+    def _get_capture_engine(self, device_index, native_rate):
+        """מנוע לכידה אחד לכל התקן פיזי - נפתח פעם אחת ומשותף לכל המאזינים"""
+        with self.engines_lock:
+            engine = self.capture_engines.get(device_index)
+            if engine is None:
+                engine = self.capture_engines[device_index] = self._create_capture_engine(device_index, native_rate)
         try:
-            self.listening_queue.put_nowait(resampled_data)
-        except queue.Full:
-            # אם מלא, דלג על הנתון הזה
-            pass
+            engine.start()
+        except Exception as e:
+            if self.audio_source is not None or engine.is_running:
+                raise
+            # ייתכן שהקצב השמור כבר לא מתאים להתקן (הוחלף/הוגדר מחדש) - בדיקה מחדש ופתיחה שוב
+            print(f"Could not open device {device_index} at {engine.native_rate}Hz ({e}), probing again")
+            engine = self._reprobe_capture_engine(device_index)
+        return engine
     
-    def command_callback(self, indata, frames, time, status):
-        """פונקציית קולבק להאזנה לפקודות"""
-        if status:
-            print(f"Error in command mic: {status}")
-        
-        resampled_data = self._resample_audio(
-            bytes(indata), 
-            self.command_native_rate, 
-            self.target_sample_rate
+    def _create_capture_engine(self, device_index, native_rate):
+        return AudioCaptureEngine(
+            device_index,
+            native_rate,
+            target_rate=self.target_sample_rate,
+            block_size=self.block_size,
+            stream_factory=self.audio_source.open_stream if self.audio_source is not None else None,
+            preroll_seconds=self.command_preroll_seconds,
+            mute=self._playback_mute(device_index),
+            pool_blocks=self._pool_blocks(native_rate)
         )
+    
+    def _pool_blocks(self, native_rate):
+        """גודל מאגר הבלוקים לפי הביקוש המקסימלי: שני התורים מלאים, ה-padding של
+        שני השערים, ומרווח לבלוקים שבדרך (בקולבק, במזהה, בזריקה מהתור)"""
+        block_length = max(1, self.block_size * self.target_sample_rate // native_rate)
+        padding_blocks = sum(gate.padding_samples // block_length + 2
+                             for gate in (self.wake_gate, self.command_gate))
+        queued_blocks = self.listening_queue.maxsize + self.command_queue.maxsize
+        return queued_blocks + padding_blocks + 16
+    
+    def _reprobe_capture_engine(self, device_index):
+        """מחיקת הקצב מהמטמון, בדיקה מחדש של ההתקן ומנוע חדש בקצב שנמצא"""
+        key = DeviceCapabilityCache.device_key(device_index)
+        self.device_cache.invalidate(key)
+        native_rate = self._probe_device_rate(device_index)
+        self.device_cache.set(key, 'native_rate', native_rate)
+        if device_index == self.device_index_listening:
+            self.listening_native_rate = native_rate
+        if device_index == self.device_index_command:
+            self.command_native_rate = native_rate
+        
+        engine = self._create_capture_engine(device_index, native_rate)
+        engine.start()
+        with self.engines_lock:
+            self.capture_engines[device_index] = engine
+        return engine
+    
+    def _playback_mute(self, device_index):
+        """שאלת ה-mute של מנוע הלכידה - דילוג (וספירה) בזמן השמעה ו-tail guard אחריה"""
+        if self.audio_session is None:
+            return None
+        stream = f"device {device_index}"
+        return lambda: self.audio_session.skip(stream)
+    
+    def _noise_floor(self, device_index):
+        """רצפת רעש אדפטיבית אחת לכל התקן פיזי"""
+        if device_index not in self.noise_floors:
+            self.noise_floors[device_index] = NoiseFloor()
+        return self.noise_floors[device_index]
+    
+    def _gate(self, gate, block):
+        """העברת בלוק דרך שער ה-VAD (או ישירות אם ה-VAD כבוי)
         
+        כל בלוק שמוחזר מחזיק הפניה משלו - _feed_gated משחרר אותם.
+        """
+        if not self.vad_enabled:
+            block.retain()
+            return (block,)
+        return gate.process(block)
+    
+    def _feed_gated(self, gate, block, accept):
+        """הזנת בלוק דרך השער - מחזיר את התוצאה הראשונה של accept ומשחרר את כל הבלוקים"""
+        result = None
+        gated = self._gate(gate, block)
+        try:
+            for gated_block in gated:
+                if result is None:
+                    result = accept(gated_block)
+        finally:
+            # כל הבלוקים חוזרים למאגר - גם כש-accept נכשל באמצע
+            for gated_block in gated:
+                gated_block.release()
+        return result
+    
+    def _accept_waveform(self, recognizer, block):
+        """AcceptWaveform על הזיכרון של הבלוק עצמו
+        
+        KaldiRecognizer.AcceptWaveform מקבל רק bytes (cffi לא ממיר memoryview
+        ל-char *), לכן קוראים ישירות ל-C API עם ffi.from_buffer. אם ה-API
+        הפנימי לא זמין - העתקה ל-bytes, שנספרת ב-waveform_copies.
+        """
+        view = block.view()
+        handle = getattr(recognizer, '_handle', None)
+        if _vosk_c is not None and handle is not None:
+            result = _vosk_c.vosk_recognizer_accept_waveform(handle, _vosk_ffi.from_buffer(view), len(view))
+            if result < 0:
+                raise Exception("Failed to process waveform")
+            return result
+        if not self._waveform_fallback_logged:
+            self._waveform_fallback_logged = True
+            print(f"Vosk {_vosk_version()} has no tested zero-copy path - copying audio blocks to bytes")
+        self.waveform_copies += 1
+        return recognizer.AcceptWaveform(bytes(view))
+    
+    def vad_stats(self):
+        """סטטיסטיקת שער ה-VAD - כמה שמע לא הגיע למזהים"""
+        return {
+            "wake": self.wake_gate.stats(),
+            "command": self.command_gate.stats(),
+        }
+    
+    def debug_stats(self):
+        """מוני מסלול השמע: מאגרי הבלוקים של כל מנוע והעתקות למזהה"""
+        with self.engines_lock:
+            engines = dict(self.capture_engines)
+        return {
+            "block_pools": {device: engine.pool.stats() for device, engine in engines.items()},
+            "waveform_copies": self.waveform_copies,
+        }
+    
+    def _enqueue_block(self, audio_queue, block, generation=0):
+        """הכנסת בלוק לתור עם זריקת הבלוקים הישנים כשהתור מתמלא"""
         # אגרסיבי - רוקן תור אם הוא מתקרב למלא
-        while self.command_queue.qsize() > 15:
+        while audio_queue.qsize() > 15:
             try:
-                self.command_queue.get_nowait()
+                audio_queue.get_nowait()[1].release()
             except queue.Empty:
                 break
         
-        # הוספה לתור עם בדיקת overflow
+        # הוספה לתור עם בדיקת overflow - התור מחזיק הפניה לבלוק
+        block.retain()
         try:
-            self.command_queue.put_nowait(resampled_data)
+            audio_queue.put_nowait((generation, block))
         except queue.Full:
             # אם מלא, דלג על הנתון הזה
-            pass
+            block.release()
+    
+    def _clear_queue(self, audio_queue):
+        """ריקון תור שמע"""
+        while not audio_queue.empty():
+            try:
+                audio_queue.get_nowait()[1].release()
+            except queue.Empty:
+                break
+    
+    def listening_callback(self, data):
+        """מנוי למנוע הלכידה - בלוקים של 16kHz להאזנה למילת ההפעלה"""
+        # קריאת דגל בלי נעילה - הקולבק של השמע לא ממתין ל-thread אחר
+        if self.wake_word_paused:
+            return  # דילוג על עיבוד כשמושהה
+        
+        self._enqueue_block(self.listening_queue, data, self.wake_generation)
+    
+    def command_callback(self, data):
+        """מנוי למנוע הלכידה - בלוקים של 16kHz להאזנה לפקודות"""
+        self._enqueue_block(self.command_queue, data)
     
     def pause_wake_word_listening(self):
         """השהיית האזנה למילת מפתח זמנית"""
-        with self.pause_lock:
+        with self.pause_condition:
             self.wake_word_paused = True
+            self.wake_generation += 1
             print("Wake word listening paused")
     
     def resume_wake_word_listening(self):
-        """המשך האזנה למילת מפתח"""
-        with self.pause_lock:
+        """המשך האזנה למילת מפתח
+        
+        O(1): מקדם את מונה הדורות ומעיר את ה-thread. בלוקים ישנים שנשארו בתור
+        נזרקים כשהם נשלפים, והמזהה מאופס ב-thread שלו לפני הבלוק החדש הראשון.
+        """
+        with self.pause_condition:
             self.wake_word_paused = False
-            # ניקוי תור ישן
-            while not self.listening_queue.empty():
-                try:
-                    self.listening_queue.get_nowait()
-                except:
-                    break
+            self.wake_generation += 1
+            self.pause_condition.notify_all()
             print("Wake word listening resumed")
     
+    def _wait_while_paused(self):
+        """המתנה בלי polling עד resume או עצירה"""
+        with self.pause_condition:
+            while self.wake_word_paused and self.running:
+                self.pause_condition.wait()
+    
     def listen_for_wake_word(self):
         """האזנה רצופה למילת ההפעלה ב-thread נפרד עם מנגנון pause"""
         try:
-            with sd.RawInputStream(
-                samplerate=self.listening_native_rate,
-                blocksize=self.block_size, 
-                device=self.device_index_listening, 
-                dtype="int16", 
-                channels=1, 
-                callback=self.listening_callback
-            ):
+            # ה-thread מתחיל מיד, ומחכה כאן עד שהמודל נטען
+            self.wait_until_ready()
+            engine = self._get_capture_engine(self.device_index_listening, self.listening_native_rate)
+        except Exception as e:
+            print(f"Error in wake word detection: {e}")
+            return
+        
+        engine.subscribe(self.listening_callback)
+        try:
+            print(f"Listening for wake word '{self.wake_word}' at {self.listening_native_rate}Hz...")
+            
+            decoded_generation = self.wake_generation
+            decoded_session = self.audio_session.generation if self.audio_session is not None else 0
+            while self.running:
+                # בזמן השהיה ה-thread ישן על התנאי עד resume
+                if self.wake_word_paused:
+                    self._wait_while_paused()
+                    continue
                 
-                print(f"Listening for wake word '{self.wake_word}' at {self.listening_native_rate}Hz...")
+                try:
+                    generation, data = self.listening_queue.get(timeout=0.5)
+                except queue.Empty:
+                    # timeout בתור - ממשיכים
+                    continue
                 
-                while self.running:
-                    # בדיקה אם מושהה
-                    with self.pause_lock:
-                        if self.wake_word_paused:
-                            time.sleep(0.1)  # המתנה קצרה
-                            continue
+                if generation != self.wake_generation:
+                    # נלכד לפני ה-pause/resume האחרון
+                    data.release()
+                    continue
+                session = self.audio_session.generation if self.audio_session is not None else 0
+                if generation != decoded_generation or session != decoded_session:
+                    # תחילת דור חדש, או שמע שנחתך בגלל השמעה - איפוס מצב המזהה והשער
+                    self.wake_recognizer.Reset()
+                    self.wake_gate.reset()
+                    decoded_generation = generation
+                    decoded_session = session
+                
+                # רק שמע עם דיבור (ו-padding) מגיע למזהה
+                try:
+                    wake = self._feed_gated(self.wake_gate, data, self._accept_wake_block)
+                finally:
+                    data.release()
+                if wake:
+                    self._handle_wake_word(*wake)
                     
-                    try:
-                        data = self.listening_queue.get(timeout=0.5)
-                        if self.wake_recognizer.AcceptWaveform(data):
-                            result = json.loads(self.wake_recognizer.Result())
-                            text = result.get("text", "").lower()
-                            
-                            if self.wake_word in text:
-                                print(f"Wake word detected: {text}")
-                                
-                                # בחירת תגובה אקראית לפי השפה
-                                responses = self.wake_responses.get(self.language, self.wake_responses["en"])
-                                response = random.choice(responses)
-                                print(f"Response: {response}")
-                                
-                                # השהיית האזנה למילת מפתח
-                                self.pause_wake_word_listening()
-                                
-                                # הפעלת callback
-                                self.on_wake_word_detected(response)
-                                
-                    except queue.Empty:
-                        # timeout בתור - ממשיכים
-                        continue
-                        
         except Exception as e:
             print(f"Error in wake word detection: {e}")
+        finally:
+            engine.unsubscribe(self.listening_callback)
     
-    def listen_for_commands(self):
-        """האזנה לפקודות לאחר זיהוי מילת ההפעלה - רץ על thread ראשי"""
+    def _create_wake_recognizer(self):
+        """יצירת מזהה למילת ההפעלה לפי wake_word_mode"""
+        if self.wake_word_mode == "grammar":
+            # דקדוק מצומצם: מילת ההפעלה או "זבל" - פענוח זול בהרבה מאוצר המילים המלא
+            grammar = json.dumps([self.wake_word, "[unk]"])
+            print(f"Wake word recognizer in grammar mode: {grammar}")
+            return KaldiRecognizer(self.model, self.target_sample_rate, grammar)
+        return KaldiRecognizer(self.model, self.target_sample_rate)
+    
+    def _accept_wake_block(self, block):
+        """הזנת בלוק למזהה מילת ההפעלה - מחזיר (טקסט, block.end) אם מילת ההפעלה נאמרה"""
+        if self._accept_waveform(self.wake_recognizer, block):
+            result = json.loads(self.wake_recognizer.Result())
+            text = result.get("text", "").lower()
+            if self.wake_word in text:
+                return text, block.end
+        elif self.wake_on_partial:
+            partial = json.loads(self.wake_recognizer.PartialResult()).get("partial", "").lower()
+            if self.wake_word in partial:
+                # אותו משפט לא יפעיל שוב כשהתוצאה הסופית תגיע
+                self.wake_recognizer.Reset()
+                return partial, block.end
+        return None
+    
+    def _handle_wake_word(self, text, block_end=None):
+        """טיפול בזיהוי מילת ההפעלה (block_end - סוף הבלוק שבו זוהתה, בטבעת של המנוע שלו)"""
+        print(f"Wake word detected: {text}")
+        
+        # סימון הנקודה שממנה סשן הפקודה יתחיל לפענח
+        self._mark_wake_position(block_end)
+        remainder = text.split(self.wake_word, 1)[1].replace("[unk]", " ").split()
+        self.wake_remainder = " ".join(remainder) or None
+        
+        # בחירת תגובה אקראית לפי השפה
+        responses = self.wake_responses.get(self.language, self.wake_responses["en"])
+        response = random.choice(responses)
+        print(f"Response: {response}")
+        
+        # השהיית האזנה למילת מפתח
+        self.pause_wake_word_listening()
+        
+        # הפעלת callback
+        self.on_wake_word_detected(response)
+    
+    def _mark_wake_position(self, block_end=None):
+        """שמירת נקודת ההתחלה של הפקודה בשמע של מיקרופון הפקודות
+        
+        כשמילת ההפעלה נשמעה באותו מיקרופון - סוף הבלוק שבו זוהתה, כך שבלוקים
+        שעוד חיכו בתור לא מדולגים. במיקרופון אחר המיקומים לא ניתנים להשוואה,
+        ומשתמשים במיקום הנוכחי.
+        """
+        engine = self.capture_engines.get(self.device_index_command)
+        if engine is None or engine.ring is None:
+            self.wake_position = None
+        elif block_end is not None and self.device_index_listening == self.device_index_command:
+            self.wake_position = block_end
+        else:
+            self.wake_position = engine.position
+    
+    def _open_command_session(self, preroll_from=None):
+        """הרשמה למנוע הלכידה של מיקרופון הפקודות - ללא פתיחת stream חדש
+        
+        Returns:
+            tuple: (engine, preroll, preroll_end) - preroll הוא השמע שנלכד מ-preroll_from
+                ועד preroll_end (בלוקים חיים שמסתיימים עד שם כבר כלולים בו)
+        """
+        self.wait_until_ready()
+        engine = self._get_capture_engine(self.device_index_command, self.command_native_rate)
+        self._clear_queue(self.command_queue)
+        self.command_recognizer.Reset()
+        self.command_gate.reset()
+        preroll_end, preroll = engine.subscribe(self.command_callback, preroll_from=preroll_from)
+        return engine, preroll, preroll_end
+    
+    def _accept_command_block(self, block):
+        """הזנת בלוק למזהה הפקודות - מחזיר טקסט כשהסתיים משפט"""
+        if self._accept_waveform(self.command_recognizer, block):
+            result = json.loads(self.command_recognizer.Result())
+            text = result.get("text", "").lower()
+            if text:
+                return text
+        return None
+    
+    def _capture_command(self, timeout=None, preroll_from=None, idle_timeout=None,
+                         partial_callback=None, match_phrases=True):
+        """סשן פקודה אחד על מנוע הלכידה, כולל פענוח ה-pre-roll וסיום מוקדם"""
+        if timeout is None:
+            timeout = self.command_timeout
+        if partial_callback is None:
+            partial_callback = self.on_partial_command
+        
+        endpointer = CommandEndpointer(
+            phrases=self.command_phrases if (match_phrases and self.early_endpointing) else (),
+            trailing_silence=self.command_trailing_silence if self.early_endpointing else None,
+            idle_timeout=idle_timeout,
+            match_stability=self.command_match_stability,
+            sample_rate=self.target_sample_rate,
+            partial_callback=partial_callback
+        )
+        
+        def feed(block):
+            samples = block.length
+            try:
+                command_text = self._feed_gated(self.command_gate, block, self._accept_command_block)
+            finally:
+                block.release()
+            if command_text:
+                return command_text
+            partial = json.loads(self.command_recognizer.PartialResult()).get("partial", "").lower()
+            return endpointer.update(partial, samples)
+        
+        engine = None
         try:
-            with sd.RawInputStream(
-                samplerate=self.command_native_rate,
-                blocksize=self.block_size, 
-                device=self.device_index_command, 
-                dtype="int16", 
-                channels=1, 
-                callback=self.command_callback
-            ):
-                
-                print(f"Listening for commands at {self.command_native_rate}Hz...")
-                command_timeout = time.time() + 10  # 10 שניות לקבלת פקודה
+            engine, preroll, preroll_end = self._open_command_session(preroll_from)
+            
+            print(f"Listening for commands at {self.command_native_rate}Hz...")
+            
+            # קודם פענוח מה שכבר נאמר לפני פתיחת הסשן
+            if len(preroll):
+                print(f"Decoding {len(preroll) / self.target_sample_rate:.2f}s of pre-roll audio")
+            chunk = engine.pool.block_capacity
+            for start in range(0, len(preroll), chunk):
+                command_text = feed(engine.pool.acquire().fill(preroll[start:start + chunk]))
+                if command_text or endpointer.idle:
+                    break
+            else:
+                # ה-pre-roll לא סיים את הפקודה - ממשיכים בשמע חי
+                command_text = None
+                command_timeout = time.time() + timeout
                 
                 while self.running and time.time() < command_timeout:
                     try:
-                        data = self.command_queue.get(timeout=1)
-                        if self.command_recognizer.AcceptWaveform(data):
-                            result = json.loads(self.command_recognizer.Result())
-                            command_text = result.get("text", "").lower()
-                            
-                            if command_text:
-                                print(f"Command detected: {command_text}")
-                                # המשך האזנה למילת מפתח
-                                self.resume_wake_word_listening()
-                                return command_text
+                        _, data = self.command_queue.get(timeout=0.2)
                     except queue.Empty:
                         # טיימאוט בתור - זה בסדר, ממשיכים
-                        pass
-                
-                # אם הגענו לכאן, חלף זמן ההמתנה ללא פקודה
-                print("Command timeout reached")
-                # המשך האזנה למילת מפתח
-                self.resume_wake_word_listening()
+                        continue
+                    if preroll_end is not None and data.end is not None and data.end <= preroll_end:
+                        # הבלוק נכתב לטבעת לפני ההרשמה - כבר פוענח כחלק מה-pre-roll
+                        data.release()
+                        continue
+                    command_text = feed(data)
+                    if command_text or endpointer.idle:
+                        break
+            
+            if command_text == CommandEndpointer.END_OF_UTTERANCE:
+                # שקט אחרי דיבור - סוגרים את המשפט בלי לחכות ל-endpoint של Kaldi
+                result = json.loads(self.command_recognizer.FinalResult())
+                command_text = result.get("text", "").lower() or endpointer.partial or None
+            
+            if command_text:
+                print(f"Command detected: {command_text}")
+                return command_text
+            
+            if endpointer.idle:
                 return None
-                
+            
+            # אם הגענו לכאן, חלף זמן ההמתנה ללא פקודה
+            print("Command timeout reached")
+            return None
+        finally:
+            if engine is not None:
+                engine.unsubscribe(self.command_callback)
+    
+    def set_command_phrases(self, phrases):
+        """רישום ביטויי הפקודות - התאמה יציבה לאחד מהם מסיימת את ההאזנה מיד"""
+        self.command_phrases = tuple(phrase.lower() for phrase in phrases)
+    
+    def on_partial_command(self, partial_text):
+        """פונקציה שתוחלף על-ידי המודול הראשי - מקבלת תוצאות חלקיות בזמן אמירת פקודה"""
+        pass
+    
+    def listen_for_commands(self, timeout=None, preroll_from=None, idle_timeout=None, partial_callback=None):
+        """האזנה לפקודות לאחר זיהוי מילת ההפעלה - רץ על thread ראשי
+        
+        Args:
+            timeout: זמן מקסימלי לקבלת פקודה בשניות (ברירת מחדל: command_timeout)
+            preroll_from: מיקום בשמע שכבר נלכד (למשל wake_position) שממנו להתחיל לפענח
+            idle_timeout: ויתור מוקדם אם לא התחיל דיבור בזמן הזה
+            partial_callback: פונקציה שמקבלת כל תוצאה חלקית חדשה
+        """
+        try:
+            return self._capture_command(timeout, preroll_from, idle_timeout, partial_callback)
         except Exception as e:
             print(f"Error in command detection: {e}")
-            # המשך האזנה למילת מפתח גם במקרה של שגיאה
+            return None
+        finally:
+            # המשך האזנה למילת מפתח (גם במקרה של שגיאה)
             self.resume_wake_word_listening()
+    
+    def listen_for_followup_command(self, idle_timeout=None):
+        """פקודה שנאמרה ברצף עם מילת ההפעלה ("gonzo turn on the light")
+        
+        מפענח מנקודת זיהוי מילת ההפעלה בלי לשאול שוב. אם לא נאמר כלום,
+        מחזיר None וההאזנה למילת המפתח נשארת מושהית לקראת השאלה החוזרת.
+        """
+        remainder, self.wake_remainder = self.wake_remainder, None
+        if remainder:
+            print(f"Command detected with wake word: {remainder}")
+            self.resume_wake_word_listening()
+            return remainder
+        
+        if self.wake_position is None:
             return None
+        
+        if idle_timeout is None:
+            idle_timeout = self.command_followup_window
+        
+        try:
+            command_text = self._capture_command(
+                preroll_from=self.wake_position,
+                idle_timeout=idle_timeout
+            )
+        except Exception as e:
+            print(f"Error in follow-up command detection: {e}")
+            return None
+        
+        if command_text:
+            self.resume_wake_word_listening()
+        return command_text
     
     def listen_for_face_interaction(self):
         """האזנה לתשובה באינטראקציה של זיהוי פנים - רץ על thread ראשי"""
@@ -326,42 +832,20 @@ class GonzoSTT:
         self.pause_wake_word_listening()
         
         try:
-            with sd.RawInputStream(
-                samplerate=self.command_native_rate,
-                blocksize=self.block_size, 
-                device=self.device_index_command, 
-                dtype="int16", 
-                channels=1, 
-                callback=self.command_callback
-            ):
-                
-                interaction_timeout = time.time() + 5  # 5 שניות לתשובה
-                
-                while self.running and time.time() < interaction_timeout:
-                    try:
-                        data = self.command_queue.get(timeout=1)
-                        if self.command_recognizer.AcceptWaveform(data):
-                            result = json.loads(self.command_recognizer.Result())
-                            response_text = result.get("text", "").lower()
-                            
-                            if response_text:
-                                print(f"Face interaction response: {response_text}")
-                                # המשך האזנה למילת מפתח
-                                self.resume_wake_word_listening()
-                                return response_text
-                    except queue.Empty:
-                        pass
-                
+            # 5 שניות לתשובה, בלי התאמה לביטויי פקודות (מצפים לשם)
+            response_text = self._capture_command(timeout=5, match_phrases=False)
+            if response_text:
+                print(f"Face interaction response: {response_text}")
+            else:
                 print("Face interaction timeout reached")
-                # המשך האזנה למילת מפתח
-                self.resume_wake_word_listening()
-                return None
-                
+            return response_text
+            
         except Exception as e:
             print(f"Error in face interaction: {e}")
-            # המשך האזנה למילת מפתח גם במקרה של שגיאה
-            self.resume_wake_word_listening()
             return None
+        finally:
+            # המשך האזנה למילת מפתח (גם במקרה של שגיאה)
+            self.resume_wake_word_listening()
     
     def on_wake_word_detected(self, response):
         """פונקציה שתוחלף על-ידי המודול הראשי"""
@@ -370,6 +854,13 @@ class GonzoSTT:
     def start_listening(self):
         """התחלת האזנה בתהליך נפרד"""
         self.running = True
+        
+        # פתיחה מוקדמת של מנוע הפקודות כדי שסשן פקודה יהיה רק הרשמה
+        try:
+            self._get_capture_engine(self.device_index_command, self.command_native_rate)
+        except Exception as e:
+            print(f"Error starting command capture engine: {e}")
+        
         self.listening_thread = threading.Thread(target=self.listen_for_wake_word)
         self.listening_thread.daemon = True
         self.listening_thread.start()
@@ -377,12 +868,22 @@ class GonzoSTT:
     def stop_listening(self):
         """עצירת האזנה"""
         self.running = False
+        with self.pause_condition:
+            self.pause_condition.notify_all()
         if hasattr(self, 'listening_thread') and self.listening_thread.is_alive():
             self.listening_thread.join(timeout=2)
+        
+        # סגירת מנועי הלכידה
+        with self.engines_lock:
+            engines = list(self.capture_engines.values())
+            self.capture_engines.clear()
+        for engine in engines:
+            engine.stop()
     
-    def recognize_command(self, timeout=10):
+    def recognize_command(self, timeout=None, preroll_from=None, partial_callback=None):
         """האזנה לפקודה ספציפית עם הגבלת זמן"""
-        return self.listen_for_commands()
+        return self.listen_for_commands(timeout=timeout, preroll_from=preroll_from,
+                                        partial_callback=partial_callback)
     
     def list_audio_devices(self):
         """הצגת רשימת התקני שמע זמינים"""
@@ -1,62 +1,163 @@
 # מודול TTS מקומי עם pyttsx3
 import os
+import re
+import wave
+import queue
+import itertools
+from collections import deque
 import pyttsx3
 import threading
 import time
+from contextlib import nullcontext
+from concurrent.futures import Future, CancelledError
+import sounddevice as sd
+from gonzo_tts_cache import PhraseCache, phrase_key
+from gonzo_tts_voices import VoiceCatalog, engine_key
+
+# עדיפויות בתור הדיבור - מספר קטן יותר מושמע קודם
+PRIORITY_URGENT = 0       # כיבוי, שגיאות - יכולות לקטוע את מה שמושמע
+PRIORITY_NORMAL = 5
+PRIORITY_BACKGROUND = 9   # הקלטה מראש למטמון
+_PRIORITY_CONTROL = -1    # שינוי הגדרות המנוע ועצירת ה-worker
+
+_SENTENCE_END = re.compile(r'(?<=[.!?;:])\s+')
+_CLAUSE_END = re.compile(r'(?<=,)\s+')
+
+
+def split_sentences(text, max_chars=120):
+    """חלוקת טקסט למשפטים, ומשפט ארוך מ-max_chars לפסוקיות (לפי פסיקים)"""
+    chunks = []
+    for sentence in _SENTENCE_END.split(text.strip()):
+        if len(sentence) <= max_chars:
+            parts = [sentence]
+        else:
+            parts = []
+            for clause in _CLAUSE_END.split(sentence):
+                if parts and len(parts[-1]) + len(clause) + 1 <= max_chars:
+                    parts[-1] += " " + clause
+                else:
+                    parts.append(clause)
+        chunks.extend(part for part in parts if part)
+    return chunks or [text]
+
+
+class SpeechRequest:
+    """One job on the TTS worker queue.
+
+    `future` resolves to True when the speech played to the end and to False
+    when it was interrupted; it is cancelled when the request never started.
+    `first_audio` is the time from submission to the first audio, in seconds.
+    """
+
+    def __init__(self, tts, kind, payload, priority):
+        self._tts = tts
+        self.kind = kind          # speak / render / call / stop
+        self.payload = payload
+        self.priority = priority
+        self.future = Future()
+        self.created = time.perf_counter()
+        self.first_audio = None
+
+    def cancel(self, immediate=False):
+        """ביטול - בקשה שממתינה לא תתחיל; בקשה שמושמעת נעצרת בסוף המשפט הנוכחי
+        (או מיד עם immediate)"""
+        if not self.future.cancel():
+            self._tts._interrupt_if_current(self, immediate)
+
+    def wait(self, timeout=None):
+        """המתנה לסיום - True אם הושמע עד הסוף"""
+        try:
+            return self.future.result(timeout)
+        except CancelledError:
+            return False
+
 
 class GonzoTTS:
-    def __init__(self, config=None):
+    def __init__(self, config=None, audio_session=None):
         # קונפיגורציה בסיסית
         self.rate = 150  # מהירות דיבור
         self.volume = 1.0  # עוצמת קול
         self.voice_id = None  # קול ספציפי (None = ברירת מחדל)
         self.language = "en"  # ברירת מחדל: אנגלית
         
-        # איתחול מנוע TTS
-        self.engine = pyttsx3.init()
-        self.engine.setProperty('rate', self.rate)
-        self.engine.setProperty('volume', self.volume)
+        # תיאום חצי-דופלקס עם ה-STT - המיקרופונים מושתקים בזמן כל השמעה
+        self.audio_session = audio_session
         
-        # בדיקת קולות זמינים
-        self.available_voices = self.engine.getProperty('voices')
+        # מטמון משפטים מוקלטים מראש (None = כבוי) - השמעה ישירה דרך sounddevice
+        self.phrase_cache = None
+        self.output_device = None
         
-        # מיפוי קולות לפי שפה
-        self.language_voices = {
-            "en": [],  # קולות אנגלית
-            "he": []   # קולות עברית
-        }
+        # worker יחיד שמחזיק את מנוע pyttsx3 - דיבור, הקלטה ושינוי הגדרות עוברים כולם דרכו
+        self._requests = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._current = None
+        self._current_lock = threading.Lock()
+        self._interrupt = threading.Event()         # קטיעה מיידית
+        self._stop_after_chunk = threading.Event()  # עצירה בסוף המשפט הנוכחי
+        self.interrupted = 0
+        self.first_audio_times = deque(maxlen=100)
+        self._rendering = False  # המנוע כותב לקובץ - המילים שלו לא נשמעות
         
-        # מיון הקולות לפי שפה
-        for voice in self.available_voices:
-            voice_lang = voice.id.split('\\')[-1].split('_')[0].lower()
-            if voice_lang in ['en', 'eng', 'english']:
-                self.language_voices["en"].append(voice)
-            elif voice_lang in ['he', 'heb', 'hebrew']:
-                self.language_voices["he"].append(voice)
-            
-            # הדפסת פרטי קול לדיבוג
-            print(f"Found voice: {voice.name}, ID: {voice.id}, Languages: {voice.languages}")
+        # טקסט ארוך מושמע משפט אחרי משפט - המשפט הבא מוקלט בזמן שהנוכחי מושמע
+        self.sentence_chunks = True
+        self.max_chunk_chars = 120
+        
+        # איתחול מנוע TTS (על ה-worker)
+        engine_ready = Future()
+        self.worker = threading.Thread(target=self._worker_loop, args=(engine_ready,), name="gonzo-tts")
+        self.worker.daemon = True
+        self.worker.start()
+        self.engine = engine_ready.result()
+        self._call(lambda: self.engine.setProperty('rate', self.rate))
+        self._call(lambda: self.engine.setProperty('volume', self.volume))
+        
+        # קטלוג הקולות - נטען מהדיסק; המנוע נסרק רק כשאין קטלוג לדרייבר/גרסה הנוכחיים
+        voice_cache = config.get('tts_voice_cache', 'voice_cache.json') if config else 'voice_cache.json'
+        self.voice_catalog = VoiceCatalog(voice_cache, engine_key(self.engine),
+                                   lambda: self._call(lambda: self.engine.getProperty('voices')))
         
         # טעינת קונפיגורציה אם קיימת
         if config:
             if 'tts_rate' in config:
-                self.rate = config['tts_rate']
-                self.engine.setProperty('rate', self.rate)
+                self.set_rate(config['tts_rate'])
             if 'tts_volume' in config:
-                self.volume = config['tts_volume']
-                self.engine.setProperty('volume', self.volume)
+                self.set_volume(config['tts_volume'])
             if 'tts_voice_id' in config and config['tts_voice_id']:
                 self.set_voice(config['tts_voice_id'])
             if 'language' in config:
                 self.set_language(config['language'])
+            if config.get('tts_phrase_cache', False):
+                self.phrase_cache = PhraseCache(config.get('tts_cache_dir', 'tts_cache'),
+                                                max_entries=config.get('tts_cache_entries', 64))
+                self.output_device = config.get('tts_output_device')
+            self.sentence_chunks = config.get('tts_sentence_chunks', True)
+            self.max_chunk_chars = config.get('tts_max_chunk_chars', 120)
+    
+    @property
+    def available_voices(self):
+        """כל הקולות (VoiceInfo) - נסרקים רק בגישה הראשונה אם אין קטלוג שמור"""
+        return self.voice_catalog.voices
+    
+    def _find_voice(self, lookup, description):
+        # קטלוג שמור שלא מכיר את הקול (למשל קול שהותקן מאז) נסרק מחדש פעם אחת.
+        # חיפוש שלא נמצא גם אחרי סריקה נשמר בקטלוג, ולא גורם לסריקה בכל הפעלה
+        found = lookup()
+        if found:
+            return found
+        if not self.voice_catalog.discovered and not self.voice_catalog.missing(description):
+            self.voice_catalog.refresh()
+            found = lookup()
+        if not found:
+            self.voice_catalog.record_miss(description)
+        return found
     
     def set_voice(self, voice_id):
         """הגדרת קול ספציפי לפי מזהה"""
-        for voice in self.available_voices:
-            if voice_id in voice.id:
-                self.voice_id = voice.id
-                self.engine.setProperty('voice', voice.id)
-                return True
+        voice = self._find_voice(lambda: self.voice_catalog.get(voice_id), f"voice:{voice_id}")
+        if voice is not None:
+            self.voice_id = voice.id
+            self._call(lambda: self.engine.setProperty('voice', voice.id))
+            return True
         
         # אם לא נמצא קול מתאים
         print(f"Warning: Voice ID '{voice_id}' not found. Using default voice.")
@@ -74,8 +175,10 @@ class GonzoTTS:
         self.language = language_code
         
         # בחירת קול מתאים לשפה אם קיים
-        if language_code in self.language_voices and self.language_voices[language_code]:
-            voice = self.language_voices[language_code][0]  # בחירת הקול הראשון מהשפה המבוקשת
+        language_voices = self._find_voice(lambda: self.voice_catalog.for_language(language_code),
+                                           f"language:{language_code}")
+        if language_voices:
+            voice = language_voices[0]  # בחירת הקול הראשון מהשפה המבוקשת
             self.set_voice(voice.id)
             print(f"Language set to {language_code}, using voice: {voice.name}")
             return True
@@ -87,44 +190,286 @@ class GonzoTTS:
         """הצגת רשימת קולות זמינים"""
         print("\nAvailable voices:")
         for i, voice in enumerate(self.available_voices):
-            voice_lang = voice.id.split('\\')[-1].split('_')[0].lower()
-            print(f"{i}: ID={voice.id}, Name={voice.name}, Language={voice_lang}")
+            print(f"{i}: ID={voice.id}, Name={voice.name}, Language={voice.language}")
         return self.available_voices
     
-    def speak(self, text, block=True):
+    def _worker_loop(self, engine_ready):
+        """ה-thread היחיד שנוגע במנוע: מריץ את הבקשות לפי עדיפות ואז לפי סדר ההגעה"""
+        try:
+            engine = pyttsx3.init()
+            self._word_events = hasattr(engine, 'connect')
+            if self._word_events:
+                # בדיקת קטיעה בין מילים, ומדידת הזמן עד המילה הראשונה
+                engine.connect('started-word', self._on_word)
+        except Exception as e:
+            engine_ready.set_exception(e)
+            return
+        self.engine = engine
+        engine_ready.set_result(engine)
+        
+        while True:
+            _, _, request = self._requests.get()
+            if request.kind == "stop":
+                request.future.set_result(True)
+                break
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            
+            with self._current_lock:
+                self._current = request
+                self._interrupt.clear()
+                self._stop_after_chunk.clear()
+            try:
+                result = self._run(request)
+            except Exception as e:
+                request.future.set_exception(e)
+            else:
+                request.future.set_result(result)
+            finally:
+                with self._current_lock:
+                    self._current = None
+    
+    def _run(self, request):
+        if request.kind == "call":
+            return request.payload()
+        if request.kind == "render":
+            return self._render_request(request.payload)
+        
+        text = request.payload
+        chunks = split_sentences(text, self.max_chunk_chars) if self.sentence_chunks else [text]
+        # כל הבקשה (כולל ההקלטה בין משפטים) נחשבת השמעה אחת
+        with self.audio_session.playback() if self.audio_session is not None else nullcontext():
+            if self.phrase_cache is not None:
+                return self._speak_pipelined(request, chunks)
+            return self._speak_engine(request, chunks)
+    
+    def _speak_pipelined(self, request, chunks):
+        """השמעה מהמטמון, משפט אחרי משפט - המשפט הבא מוקלט בזמן שהנוכחי מושמע"""
+        phrase = self.phrase_cache.get(self.phrase_key(chunks[0]))
+        if phrase is None and len(chunks) == 1:
+            # משפט יחיד שלא במטמון: המנוע מתחיל לדבר מהר יותר מהקלטה ואז השמעה.
+            # המשפט יוקלט ברקע ויושמע מהמטמון בפעם הבאה
+            self.prerender(chunks)
+            return self._speak_engine(request, chunks)
+        
+        for index, chunk in enumerate(chunks):
+            if phrase is None:
+                phrase = self._rendered(chunk)
+                if phrase is None:
+                    if self._interrupt.is_set():
+                        return self._finished()
+                    # המטמון כבה באמצע - שאר המשפטים דרך המנוע
+                    return self._speak_engine(request, chunks[index:])
+            
+            sd.play(phrase.pcm, phrase.sample_rate, device=self.output_device)
+            self._mark_first_audio(request)
+            end = time.perf_counter() + len(phrase.pcm) / float(phrase.sample_rate)
+            
+            following = None
+            if index + 1 < len(chunks) and not self._stop_after_chunk.is_set():
+                following = self._rendered(chunks[index + 1])
+            
+            if self._interrupt.wait(max(0.0, end - time.perf_counter())):
+                sd.stop()
+                return self._finished()
+            sd.wait()
+            if index + 1 < len(chunks) and self._stop_after_chunk.is_set():
+                self.interrupted += 1
+                return False
+            phrase = following
+        return True
+    
+    def _speak_engine(self, request, chunks):
+        """השמעה ישירה דרך המנוע, משפט אחרי משפט"""
+        for index, chunk in enumerate(chunks):
+            if index and (self._interrupt.is_set() or self._stop_after_chunk.is_set()):
+                self.interrupted += 1
+                return False
+            if not self._word_events:
+                self._mark_first_audio(request)
+            self.engine.say(chunk)
+            self.engine.runAndWait()
+        return self._finished()
+    
+    def _rendered(self, text):
+        """השמע של משפט מהמטמון, או הקלטה שלו עכשיו - None אם המטמון כבוי"""
+        if self.phrase_cache is None:
+            return None
+        phrase = self.phrase_cache.get(self.phrase_key(text))
+        if phrase is None:
+            try:
+                phrase = self.render(text)
+            except (wave.Error, EOFError, ValueError) as e:
+                self._disable_cache(e)
+        return phrase
+    
+    def _mark_first_audio(self, request):
+        if request.first_audio is None:
+            request.first_audio = time.perf_counter() - request.created
+            self.first_audio_times.append(request.first_audio)
+    
+    def _on_word(self, name, location, length):
+        current = self._current
+        # רק דיבור שבאמת נשמע - לא הקלטה למטמון (ברקע או בתוך השמעה)
+        if current is not None and current.kind == "speak" and not self._rendering:
+            self._mark_first_audio(current)
+        if self._interrupt.is_set():
+            self.engine.stop()
+    
+    def _finished(self):
+        """True אם הבקשה הנוכחית הסתיימה בלי קטיעה"""
+        if self._interrupt.is_set():
+            self.interrupted += 1
+            return False
+        return True
+    
+    def _submit(self, kind, payload, priority):
+        request = SpeechRequest(self, kind, payload, priority)
+        self._requests.put((priority, next(self._sequence), request))
+        return request
+    
+    def _call(self, function):
+        """הרצת פעולה על המנוע ב-worker והמתנה לתוצאה"""
+        if threading.current_thread() is self.worker:
+            return function()
+        return self._submit("call", function, _PRIORITY_CONTROL).future.result()
+    
+    def _interrupt_if_current(self, request, immediate=False):
+        with self._current_lock:
+            if self._current is request:
+                (self._interrupt if immediate else self._stop_after_chunk).set()
+    
+    def say(self, text, priority=PRIORITY_NORMAL, preempt=False):
+        """הכנסת טקסט לתור הדיבור בלי לחכות
+        
+        Args:
+            priority: PRIORITY_URGENT / PRIORITY_NORMAL (מספר קטן יותר קודם)
+            preempt: לקטוע דיבור בעדיפות נמוכה יותר שמושמע עכשיו
+        Returns:
+            SpeechRequest: עם future שמסתיים בסוף ההשמעה, ו-cancel()
+        """
+        request = self._submit("speak", text, priority)
+        if preempt:
+            with self._current_lock:
+                current = self._current
+                # הקלטות רקע לא נקטעות - קובץ חלקי היה נשמר במטמון
+                if current is not None and current.kind == "speak" and current.priority > priority:
+                    self._interrupt.set()
+        return request
+    
+    def speak(self, text, block=True, priority=PRIORITY_NORMAL, preempt=False):
         """השמעת טקסט
         Args:
             text: הטקסט להשמעה
-            block: האם לחסום את התהליך הראשי בזמן ההשמעה
+            block: האם לחכות לסוף ההשמעה
+        Returns:
+            SpeechRequest, או None לטקסט ריק
         """
         if not text:
-            return
+            return None
         
+        request = self.say(text, priority, preempt)
         if block:
-            # השמעה סינכרונית (חוסמת)
-            self.engine.say(text)
+            request.wait()
+        return request
+    
+    def cancel_all(self):
+        """ביטול כל מה שבתור וקטיעת מה שמושמע עכשיו"""
+        pending = []
+        while True:
+            try:
+                item = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if item[2].kind in ("call", "stop"):
+                pending.append(item)
+            else:
+                item[2].future.cancel()
+        for item in pending:
+            self._requests.put(item)
+        with self._current_lock:
+            if self._current is not None and self._current.kind == "speak":
+                self._interrupt.set()
+    
+    def close(self, timeout=2.0):
+        """עצירת ה-worker - מה שעוד בתור מבוטל"""
+        if not self.worker.is_alive():
+            return
+        self.cancel_all()
+        self._submit("stop", None, _PRIORITY_CONTROL)
+        self.worker.join(timeout)
+    
+    def phrase_key(self, text):
+        """מפתח המטמון לטקסט בקול, במהירות ובעוצמה הנוכחיים"""
+        return phrase_key(text, self.voice_id, self.rate, self.volume)
+    
+    def prerender(self, texts):
+        """הקלטה ברקע (בעדיפות הנמוכה ביותר) של משפטים למטמון - טקסט ארוך לפי משפטים"""
+        if self.phrase_cache is None:
+            return
+        for text in texts:
+            if not text:
+                continue
+            for chunk in split_sentences(text, self.max_chunk_chars) if self.sentence_chunks else [text]:
+                self._submit("render", chunk, PRIORITY_BACKGROUND)
+    
+    def _render_request(self, text):
+        try:
+            return self.render(text) is not None
+        except (wave.Error, EOFError, ValueError) as e:
+            self._disable_cache(e)
+            return False
+    
+    def _disable_cache(self, error):
+        # המנוע כותב פורמט שאי אפשר לקרוא (למשל AIFF ב-macOS) - חוזרים להשמעה רגילה
+        print(f"TTS output cannot be cached ({error}) - phrase cache disabled")
+        self.phrase_cache = None
+    
+    def render(self, text):
+        """הקלטת משפט לקובץ WAV ושמירתו במטמון - מחזיר את השמע (רץ על ה-worker)"""
+        if self.phrase_cache is None:
+            return None
+        key = self.phrase_key(text)
+        if key in self.phrase_cache:
+            return None
+        path = os.path.join(self.phrase_cache.directory, ".rendering.wav")
+        self._rendering = True
+        try:
+            self.engine.save_to_file(text, path)
             self.engine.runAndWait()
-        else:
-            # השמעה אסינכרונית (לא חוסמת)
-            speech_thread = threading.Thread(target=self._speak_async, args=(text,))
-            speech_thread.daemon = True
-            speech_thread.start()
+        finally:
+            self._rendering = False
+        if self._interrupt.is_set():
+            # ההשמעה שבשבילה הוקלט המשפט נקטעה - הקובץ חלקי ולא נכנס למטמון
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return self.phrase_cache.store(key, path)
+    
+    def speech_stats(self):
+        """זמן עד השמע הראשון (ms) ומספר הקטיעות"""
+        times = list(self.first_audio_times)
+        return {
+            "interrupted": self.interrupted,
+            "first_audio_ms_mean": sum(times) / len(times) * 1000 if times else None,
+            "first_audio_ms_last": times[-1] * 1000 if times else None,
+        }
     
-    def _speak_async(self, text):
-        """פונקציה פנימית להשמעה אסינכרונית"""
-        self.engine.say(text)
-        self.engine.runAndWait()
+    def cache_stats(self):
+        return self.phrase_cache.stats() if self.phrase_cache is not None else None
     
     def set_rate(self, rate):
         """שינוי מהירות הדיבור"""
         self.rate = rate
-        self.engine.setProperty('rate', rate)
+        self._call(lambda: self.engine.setProperty('rate', rate))
     
     def set_volume(self, volume):
         """שינוי עוצמת הקול"""
         if 0.0 <= volume <= 1.0:
             self.volume = volume
-            self.engine.setProperty('volume', volume)
+            self._call(lambda: self.engine.setProperty('volume', volume))
         else:
             print("Volume should be between 0.0 and 1.0")
 
@@ -160,16 +505,17 @@ if __name__ == "__main__":
         
         # דוגמה להשמעה לא חוסמת
         print("Speaking asynchronously in Hebrew...")
-        tts.speak("אני יכול לדבר גם באופן אסינכרוני, כך שהתוכנית יכולה להמשיך לרוץ במקביל.", block=False)
+        request = tts.speak("אני יכול לדבר גם באופן אסינכרוני, כך שהתוכנית יכולה להמשיך לרוץ במקביל.", block=False)
     else:
         # דוגמה להשמעה באנגלית
         tts.speak("Hello, I am Gonzo. Your artificial intelligence system.")
         
         # דוגמה להשמעה לא חוסמת
         print("Speaking asynchronously in English...")
-        tts.speak("I can speak asynchronously, allowing the program to continue running in parallel.", block=False)
+        request = tts.speak("I can speak asynchronously, allowing the program to continue running in parallel.", block=False)
     
-    # המתנה כדי לוודא שההשמעה האסינכרונית תסתיים
-    time.sleep(5)
+    # המתנה לסיום ההשמעה האסינכרונית
+    request.wait()
+    tts.close()
     
     print("TTS test completed.")
@@ -0,0 +1,133 @@
+# מטמון משפטים מוקלטים מראש - שמע PCM לכל (טקסט, קול, מהירות, עוצמה)
+import os
+import wave
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+import numpy as np
+
+# שמע מוכן להשמעה: int16 בצורה (frames, channels)
+RenderedPhrase = namedtuple("RenderedPhrase", ["pcm", "sample_rate"])
+
+
+def phrase_key(text, voice, rate, volume):
+    """מפתח יציב (גם בין הרצות) לטקסט בהגדרות הקול הנוכחיות"""
+    raw = "\x1f".join((text, str(voice), str(rate), str(float(volume))))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def read_wav(path):
+    """WAV של 16 ביט (כמו שמנועי pyttsx3 כותבים) כ-RenderedPhrase"""
+    with wave.open(path, "rb") as f:
+        if f.getsampwidth() != 2:
+            raise ValueError(f"Unsupported sample width {f.getsampwidth()} in {path}")
+        pcm = np.frombuffer(f.readframes(f.getnframes()), dtype="<i2").reshape(-1, f.getnchannels())
+        return RenderedPhrase(pcm, f.getframerate())
+
+
+class PhraseCache:
+    """Synthesized phrases kept in memory (LRU) and on disk (one WAV per key).
+
+    get() looks in memory first, then loads the WAV from `directory`. Both
+    levels evict the least recently used phrase: memory beyond
+    `max_entries`, disk beyond `max_disk_entries` (by file mtime, which is
+    touched on every disk hit).
+    """
+
+    def __init__(self, directory="tts_cache", max_entries=64, max_disk_entries=512):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._phrases = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        # מדדים
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.corrupt = 0
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".wav")
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._phrases:
+                return True
+        return os.path.exists(self.path(key))
+
+    def get(self, key):
+        """השמע המוכן, או None אם המשפט עוד לא הוקלט"""
+        with self._lock:
+            phrase = self._phrases.get(key)
+            if phrase is not None:
+                self._phrases.move_to_end(key)
+                self.hits += 1
+                return phrase
+
+        path = self.path(key)
+        try:
+            phrase = read_wav(path)
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except (OSError, EOFError, wave.Error, ValueError) as e:
+            # קובץ פגום נמחק - אחרת __contains__ ימשיך לדווח עליו והמשפט לא יוקלט מחדש
+            print(f"Removing unreadable cached phrase {path}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            with self._lock:
+                self.misses += 1
+                self.corrupt += 1
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, phrase)
+        return phrase
+
+    def store(self, key, wav_path):
+        """העברת WAV שהוקלט (למשל ע"י engine.save_to_file) למטמון - מחזיר את השמע"""
+        phrase = read_wav(wav_path)
+        os.replace(wav_path, self.path(key))
+        with self._lock:
+            self._remember(key, phrase)
+        self._trim_disk()
+        return phrase
+
+    def _remember(self, key, phrase):
+        self._phrases[key] = phrase
+        self._phrases.move_to_end(key)
+        while len(self._phrases) > self.max_entries:
+            self._phrases.popitem(last=False)
+            self.evictions += 1
+
+    def _trim_disk(self):
+        # קבצים שמתחילים בנקודה הם הקלטות בתהליך
+        files = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                 if name.endswith(".wav") and not name.startswith(".")]
+        if len(files) <= self.max_disk_entries:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._phrases),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "corrupt": self.corrupt,
+            }
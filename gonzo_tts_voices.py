@@ -0,0 +1,159 @@
+# קטלוג קולות ה-TTS - נסרק פעם אחת לכל מנוע/דרייבר ונשמר לדיסק
+import os
+import json
+import platform
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+# קול אחד: מזהה, שם, תגי השפה מהמנוע, ושפה מנורמלת ('en', 'he', ...)
+VoiceInfo = namedtuple("VoiceInfo", ["id", "name", "languages", "language"])
+
+_LANGUAGE_ALIASES = {"eng": "en", "english": "en", "heb": "he", "hebrew": "he", "iw": "he"}
+
+
+def _normalize_language(tag):
+    tag = tag.strip().lower().replace("_", "-").split("-")[0]
+    return _LANGUAGE_ALIASES.get(tag, tag)
+
+
+def voice_language(voice_id, languages=()):
+    """השפה של קול: מתגי השפה של המנוע, ואם אין - מהמזהה (כמו TTS_MS_EN-US_ZIRA_11.0)"""
+    for tag in languages:
+        if isinstance(tag, bytes):
+            # espeak: בית ראשון הוא עדיפות, אחריו התג
+            tag = tag[1:].decode("ascii", "ignore")
+        if tag:
+            return _normalize_language(tag)
+    name = voice_id.replace("/", "\\").split("\\")[-1]
+    return _normalize_language(name.split("_")[0])
+
+
+def engine_key(engine):
+    """מפתח לקטלוג: הדרייבר של pyttsx3, הגרסה שלו והמערכת - קטלוג חדש כשאחד מהם משתנה"""
+    module = getattr(getattr(engine, "proxy", None), "_module", None)
+    driver = getattr(module, "__name__", type(engine).__name__)
+    try:
+        from importlib.metadata import version
+        driver_version = version("pyttsx3")
+    except Exception:
+        driver_version = "unknown"
+    return f"{driver}|pyttsx3 {driver_version}|{platform.system()} {platform.release()}"
+
+
+class VoiceCatalog:
+    """Voices of one TTS engine, discovered lazily and persisted as JSON.
+
+    The catalog is read from `path` under `key` (engine_key); the engine is
+    asked for its voices (`discover`, which may be slow - espeak lists
+    hundreds) only when nothing is cached for that key, or on refresh().
+    Lookups by voice ID and by language are dict lookups.
+
+    Lookups that found nothing even after a discovery are remembered
+    (record_miss) with the catalog, so a configured voice or language that is
+    not installed does not trigger a scan on every boot. refresh() clears
+    them; deleting the cache file does too.
+    """
+
+    def __init__(self, path, key, discover):
+        self.path = path
+        self.key = key
+        self._discover = discover
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._voices = None
+        self._by_id = {}
+        self._by_short_id = {}
+        self._by_language = {}
+        self._misses = set()
+        self.discovered = False
+
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable voice cache {path}: {e}")
+        cached = self._entries.get(key)
+        if cached is not None:
+            self._index([VoiceInfo(*voice) for voice in cached["voices"]])
+            self._misses = set(cached.get("misses", []))
+
+    @property
+    def voices(self):
+        """כל הקולות - סריקה של המנוע רק אם אין קטלוג שמור"""
+        with self._lock:
+            if self._voices is None:
+                self._refresh_locked()
+            return self._voices
+
+    def refresh(self):
+        """סריקה מחדש של המנוע (למשל אחרי התקנת קולות)"""
+        with self._lock:
+            self._refresh_locked()
+        return self._voices
+
+    def _refresh_locked(self):
+        voices = []
+        for voice in self._discover():
+            languages = [tag[1:].decode("ascii", "ignore") if isinstance(tag, bytes) else str(tag)
+                         for tag in (getattr(voice, "languages", None) or [])]
+            voices.append(VoiceInfo(voice.id, voice.name, languages, voice_language(voice.id, languages)))
+        self._index(voices)
+        self._misses = set()
+        self.discovered = True
+        print(f"Discovered {len(voices)} TTS voices")
+
+        self._entries[self.key] = {
+            "discovered": datetime.now().isoformat(timespec='seconds'),
+            "voices": [list(voice) for voice in voices],
+        }
+        self._save_locked()
+
+    def missing(self, lookup):
+        """האם החיפוש הזה ('voice:...', 'language:...') כבר נכשל אחרי סריקה"""
+        return lookup in self._misses
+
+    def record_miss(self, lookup):
+        """שמירת חיפוש שלא נמצא - לא תהיה בגללו סריקה נוספת בהפעלות הבאות"""
+        with self._lock:
+            if lookup in self._misses or self.key not in self._entries:
+                return
+            self._misses.add(lookup)
+            self._entries[self.key]["misses"] = sorted(self._misses)
+            self._save_locked()
+
+    def _save_locked(self):
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not save voice cache {self.path}: {e}")
+
+    def _index(self, voices):
+        self._voices = voices
+        self._by_id = {voice.id: voice for voice in voices}
+        self._by_short_id = {}
+        self._by_language = {}
+        for voice in voices:
+            # המזהה הקצר (החלק האחרון של נתיב ה-registry/הקובץ) - הראשון שנמצא נשמר
+            self._by_short_id.setdefault(voice.id.replace("/", "\\").split("\\")[-1].lower(), voice)
+            self._by_language.setdefault(voice.language, []).append(voice)
+
+    def get(self, voice_id):
+        """קול לפי מזהה מלא או מקוצר - None אם אין כזה"""
+        voices = self.voices
+        voice = self._by_id.get(voice_id) or self._by_short_id.get(voice_id.lower())
+        if voice is None:
+            # כמו קודם: גם חלק מהמזהה מתקבל (סריקה - רק כשאין התאמה מדויקת)
+            voice = next((candidate for candidate in voices if voice_id in candidate.id), None)
+        return voice
+
+    def for_language(self, language_code):
+        """הקולות של שפה ('en', 'he', ...) - הראשון הוא ברירת המחדל"""
+        self.voices
+        return self._by_language.get(_normalize_language(language_code), [])
@@ -0,0 +1,180 @@
+# שער זיהוי דיבור (VAD) לפני מזהי Kaldi - אנרגיה + zero-crossing עם hangover
+from collections import deque
+import numpy as np
+
+
+class NoiseFloor:
+    """Adaptive background energy level for one input device.
+
+    Follows the quiet level of the room: drops quickly when the room gets
+    quieter and rises slowly, so speech does not drag the floor up with it.
+    `creep` is the much slower rate used while the gate hears uninterrupted
+    "speech" for a long time - usually a permanent rise in background noise.
+    """
+
+    def __init__(self, attack=0.3, release=0.02, creep=0.005, minimum=100.0):
+        self.attack = attack      # קצב ירידה (החדר נהיה שקט יותר)
+        self.release = release    # קצב עלייה (רעש רקע מתגבר)
+        self.creep = creep        # קצב עלייה בזמן "דיבור" רצוף וארוך
+        self.minimum = minimum
+        self.level = None
+
+    def update(self, energy, rate=None):
+        if self.level is None:
+            self.level = max(energy, self.minimum)
+            return
+        if rate is None:
+            rate = self.attack if energy < self.level else self.release
+        self.level = max(self.level + rate * (energy - self.level), self.minimum)
+
+
+class VoiceActivityGate:
+    """Passes only speech-bearing audio (plus padding) on to a recognizer.
+
+    Every block is split into short frames; a frame counts as speech when its
+    energy is well above the device noise floor and its zero-crossing rate is
+    in the speech range. After speech the gate stays open for a hangover
+    period so Kaldi still sees the trailing silence it needs for endpointing,
+    and the blocks just before speech onset are replayed as padding.
+
+    The noise floor learns from non-speech blocks, and - at its slow creep
+    rate - from speech that has lasted longer than `max_speech_seconds`, so
+    a lasting rise in background noise cannot hold the gate open forever.
+
+    Blocks are pooled AudioBlocks: the gate retains the ones it keeps as
+    padding and releases them when they are dropped or handed back.
+    """
+
+    def __init__(self, noise_floor=None, sample_rate=16000, frame_ms=10, threshold_ratio=4.0,
+                 zcr_range=(0.01, 0.35), min_speech_frames=2, hangover_seconds=0.8,
+                 padding_seconds=0.3, max_speech_seconds=5.0):
+        self.noise_floor = noise_floor if noise_floor is not None else NoiseFloor()
+        self.sample_rate = sample_rate
+        self.frame_length = max(1, int(sample_rate * frame_ms / 1000))
+        self.threshold_ratio = threshold_ratio
+        self.zcr_min, self.zcr_max = zcr_range
+        self.min_speech_frames = min_speech_frames
+        self.hangover_samples = int(hangover_seconds * sample_rate)
+        self.padding_samples = int(padding_seconds * sample_rate)
+        self.max_speech_samples = int(max_speech_seconds * sample_rate)
+
+        self._padding = deque()
+        self._padding_length = 0
+        self._hangover_left = 0
+        self._speech_run = 0
+
+        # חוצצי עבודה - מוקצים מחדש רק כשמגיע בלוק גדול יותר
+        self._frames = np.empty(0, dtype=np.float32)
+        self._signs = np.empty(0, dtype=bool)
+        self._crossings = np.empty(0, dtype=bool)
+
+        # מונים לסטטיסטיקה
+        self.total_samples = 0
+        self.skipped_samples = 0
+
+    def reset(self):
+        """איפוס מצב השער (לא את רצפת הרעש של ההתקן)"""
+        for block in self._padding:
+            block.release()
+        self._padding.clear()
+        self._padding_length = 0
+        self._hangover_left = 0
+        self._speech_run = 0
+
+    def _buffers(self, n_frames):
+        """מסגרות float32, סימנים ומעברי אפס - views על חוצצים קבועים"""
+        size = n_frames * self.frame_length
+        if len(self._frames) < size:
+            self._frames = np.empty(size, dtype=np.float32)
+            self._signs = np.empty(size, dtype=bool)
+            self._crossings = np.empty(size, dtype=bool)
+        shape = (n_frames, self.frame_length)
+        crossings = self._crossings[:n_frames * (self.frame_length - 1)].reshape(n_frames, self.frame_length - 1)
+        return self._frames[:size].reshape(shape), self._signs[:size].reshape(shape), crossings
+
+    def is_speech(self, samples):
+        """החלטה וקטורית על בלוק: האם יש בו מספיק מסגרות דיבור"""
+        n_frames = len(samples) // self.frame_length
+        if n_frames == 0:
+            return False
+
+        frames, signs, crossings = self._buffers(n_frames)
+        np.copyto(frames, samples[:n_frames * self.frame_length].reshape(n_frames, self.frame_length),
+                  casting='unsafe')
+        energy = np.einsum('ij,ij->i', frames, frames) / self.frame_length
+        np.signbit(frames, out=signs)
+        np.not_equal(signs[:, 1:], signs[:, :-1], out=crossings)
+        zcr = np.count_nonzero(crossings, axis=1) / float(self.frame_length - 1)
+
+        floor = self.noise_floor.level
+        if floor is None:
+            self.noise_floor.update(float(np.median(energy)))
+            return False
+
+        speech_frames = (energy > floor * self.threshold_ratio) & (zcr >= self.zcr_min) & (zcr <= self.zcr_max)
+        speech = int(np.count_nonzero(speech_frames)) >= self.min_speech_frames
+
+        # רצפת הרעש לומדת משמע שאינו דיבור, ולאט מאוד גם מ"דיבור" שלא נגמר
+        if not speech:
+            self._speech_run = 0
+            self.noise_floor.update(float(np.median(energy)))
+        else:
+            self._speech_run += len(samples)
+            if self._speech_run > self.max_speech_samples:
+                self.noise_floor.update(float(np.median(energy)), rate=self.noise_floor.creep)
+        return speech
+
+    def process(self, block):
+        """Gate one 16 kHz int16 block.
+
+        Args:
+            block: AudioBlock של בלוק שמע (בבעלות הקורא)
+        Returns:
+            list: הבלוקים שיש להזין למזהה (ריק כשהבלוק דולג). כל בלוק מוחזר
+                עם הפניה משלו שהקורא צריך לשחרר אחרי ההזנה
+        """
+        samples = block.pcm
+        n = len(samples)
+        self.total_samples += n
+
+        if self.is_speech(samples):
+            self._hangover_left = self.hangover_samples
+            # ה-padding מועבר לקורא יחד עם ההפניות שלו
+            blocks = list(self._padding)
+            block.retain()
+            blocks.append(block)
+            self._padding.clear()
+            self._padding_length = 0
+            return blocks
+
+        if self._hangover_left > 0:
+            self._hangover_left -= n
+            block.retain()
+            return [block]
+
+        # שקט - שומרים כ-padding לתחילת הדיבור הבא
+        block.retain()
+        self._padding.append(block)
+        self._padding_length += n
+        while self._padding and self._padding_length > self.padding_samples:
+            dropped = self._padding.popleft()
+            dropped_length = dropped.length
+            dropped.release()
+            self._padding_length -= dropped_length
+            self.skipped_samples += dropped_length
+        return []
+
+    @property
+    def skipped_fraction(self):
+        """החלק מהשמע שלא הגיע למזהה"""
+        if self.total_samples == 0:
+            return 0.0
+        return self.skipped_samples / self.total_samples
+
+    def stats(self):
+        return {
+            "audio_seconds": self.total_samples / self.sample_rate,
+            "skipped_seconds": self.skipped_samples / self.sample_rate,
+            "skipped_fraction": self.skipped_fraction,
+            "noise_floor": self.noise_floor.level,
+        }
@@ -5,36 +5,53 @@ import yaml
 import random
 import cv2
 import numpy as np
-import face_recognition
-import pickle
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 # ייבוא מודולים מקומיים
 from gonzo_stt_vosk import GonzoSTT
-from gonzo_tts import GonzoTTS
+from gonzo_tts import GonzoTTS, PRIORITY_URGENT
 from gonzo_face import GonzoFace
 from gonzo_serial import GonzoSerial
+from gonzo_startup import StartupTimings
+from gonzo_audio_session import AudioSessionCoordinator
+from gonzo_face_matcher import FaceEncodingMatrix
+from gonzo_face_store import FaceStore, migrate_pickle
+from gonzo_face_service import FacePipeline, FaceRecognitionService, face_index_from_config
+from gonzo_face_enrollment import FaceEnrollment
 
 class GonzoAI:
     def __init__(self, config_file="config.yaml"):
+        # מדידת זמני שלבי ההפעלה
+        self.startup_timings = StartupTimings()
+        
         # טעינת קונפיגורציה
-        self.config = self.load_config(config_file)
+        with self.startup_timings.phase("config"):
+            self.config = self.load_config(config_file)
         
         # הגדרת שפה מועדפת
         self.language = self.config.get('language', 'en')
         
-        # הגדרות מאגר פנים
+        # הגדרות מאגר פנים - known_faces.pkl הישן מועבר פעם אחת למאגר הממופה
         self.face_database_file = 'known_faces.pkl'
+        self.face_store_dir = self.config.get('face_store_dir', 'face_store')
+        self.face_store = None
+        
+        # צינור זיהוי הפנים (זיהוי מיקומים, מעקב, encoding) - בתהליך הזה או בתהליכי עובדים
+        self.face_pipeline = None
+        self.face_service = None
+        self.face_workers = self.config.get('face_workers', 0)
         self.faces_dir = 'face_images'
-        self.known_face_encodings = []
-        self.known_face_names = []
+        # כל ה-encodings המוכרים במטריצה אחת - התאמה וקטורית לכל הפנים בתמונה
+        self.known_faces = FaceEncodingMatrix(index=self.create_face_index())
         
         # יצירת תיקיות נדרשות
         if not os.path.exists(self.faces_dir):
             os.makedirs(self.faces_dir)
         
         # טעינת מאגר פנים
-        self.load_face_database()
+        with self.startup_timings.phase("face_database"):
+            self.load_face_database()
         
         # איתחול מודולים
         self.initialize_modules()
@@ -45,7 +62,9 @@ class GonzoAI:
         
         # מצב זיהוי פנים
         self.asking_for_name = False
-        self.unknown_face_data = None
+        self.enrollment = None
+        # שאלת השם וההאזנה לתשובה - מחוץ ללולאת הווידאו (ברכות הולכות ישר לתור ה-TTS)
+        self.interaction_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gonzo-face-interaction")
         self.last_greeting_time = {}
         self.greeting_interval = 60  # שנייה בין ברכות לאותו אדם
         
@@ -62,139 +81,104 @@ class GonzoAI:
             return {}
     
     def load_face_database(self):
-        """טעינת מאגר פנים קיים"""
-        if os.path.exists(self.face_database_file):
-            print(f"Loading face database from {self.face_database_file}")
-            with open(self.face_database_file, "rb") as f:
-                data = pickle.load(f)
-                self.known_face_encodings = data.get("encodings", [])
-                self.known_face_names = data.get("names", [])
-            print(f"Loaded {len(self.known_face_names)} faces from database")
+        """פתיחת מאגר הפנים (מטריצה ב-mmap + יומן השמות), עם העברה חד-פעמית מה-pickle הישן"""
+        if not FaceStore.exists(self.face_store_dir) and os.path.exists(self.face_database_file):
+            print(f"Migrating face database from {self.face_database_file}")
+            self.face_store = migrate_pickle(self.face_database_file, self.face_store_dir)
+        else:
+            self.face_store = FaceStore(self.face_store_dir)
+        
+        self.known_faces = FaceEncodingMatrix(capacity=max(64, len(self.face_store)),
+                                              index=self.create_face_index())
+        if len(self.face_store):
+            self.known_faces.extend(self.face_store.encodings, self.face_store.names)
+            print(f"Loaded {len(self.known_faces)} faces from {self.face_store_dir}")
         else:
             print("No existing face database found. Creating new database.")
-            self.known_face_encodings = []
-            self.known_face_names = []
     
-    def save_face_database(self):
-        """שמירת מאגר פנים"""
-        print(f"Saving {len(self.known_face_names)} faces to database")
-        with open(self.face_database_file, "wb") as f:
-            pickle.dump({
-                "encodings": self.known_face_encodings,
-                "names": self.known_face_names
-            }, f)
-        print("Face database saved successfully")
+    def create_face_index(self):
+        """אינדקס החיפוש במאגר הפנים - exact (סריקה מלאה) או ivf (מהיר למאגרים גדולים)"""
+        return face_index_from_config(self.config)
     
-    def add_new_face_to_database(self, frame, name):
-        """הוספת פנים חדשות למאגר"""
-        # המרה ל-RGB עבור face_recognition
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # איתור פנים בתמונה
-        face_locations = face_recognition.face_locations(rgb_frame)
-        
-        if not face_locations:
-            return False, "No faces found in the image"
-        
-        # אם יש כמה פנים, לקחת את הגדולות ביותר
-        if len(face_locations) > 1:
-            face_areas = [(right - left) * (bottom - top) for (top, right, bottom, left) in face_locations]
-            largest_face_idx = face_areas.index(max(face_areas))
-            face_locations = [face_locations[largest_face_idx]]
-        
-        # יצירת encoding לפנים - חשוב! השתמש ב-rgb_frame
-        face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-        
-        if not face_encodings:
-            return False, "Failed to encode face"
-        
-        face_encoding = face_encodings[0]
-        
-        # בדיקה אם הפנים כבר קיימות במאגר
-        if self.known_face_encodings:
-            matches = face_recognition.compare_faces(self.known_face_encodings, face_encoding)
-            if True in matches:
-                match_index = matches.index(True)
-                existing_name = self.known_face_names[match_index]
+    def add_face_samples(self, name, face_encodings, face_image):
+        """הוספת אדם חדש למאגר - encoding אחד או כמה דגימות שלו
+        
+        Args:
+            face_encodings: רשימה/מערך (N, 128) של דגימות של אותו אדם
+            face_image: תמונת הפנים (BGR) לשמירה
+        """
+        face_encodings = np.asarray(face_encodings, dtype=np.float32).reshape(-1, 128)
+        
+        # בדיקה אם הפנים כבר קיימות במאגר - לפי הדגימה הקרובה ביותר
+        if len(self.known_faces):
+            matches = [match for match in self.known_faces.match(face_encodings, tolerance=0.6)
+                       if match.name is not None]
+            if matches:
+                existing_name = min(matches, key=lambda match: match.distance).name
                 
                 if existing_name == name:
                     return False, f"{name} is already in the database"
                 else:
                     return False, f"This face is already in the database as {existing_name}"
         
-        # הוספת הפנים למאגר
-        self.known_face_encodings.append(face_encoding)
-        self.known_face_names.append(name)
+        # הוספת הפנים למאגר - רישום לדיסק (fsync אחד לכל הדגימות) ואז לזיכרון
+        names = [name] * len(face_encodings)
+        self.face_store.extend(face_encodings, names)
+        self.known_faces.extend(face_encodings, names)
+        if self.face_pipeline is not None:
+            self.face_pipeline.invalidate()
+        if self.face_service is not None:
+            self.face_service.sync_known_faces()
         
         # שמירת תמונה של הפנים
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         face_img_path = os.path.join(self.faces_dir, f"{name}_{timestamp}.jpg")
-        
-        # חילוץ אזור הפנים ושמירה - השתמש בתמונה המקורית BGR
-        (top, right, bottom, left) = face_locations[0]
-        face_img = frame[top:bottom, left:right]
-        cv2.imwrite(face_img_path, face_img)
-        
-        # שמירת המאגר המעודכן
-        self.save_face_database()
+        cv2.imwrite(face_img_path, face_image)
         
         return True, f"Added {name} to the database"
     
     def identify_faces_in_frame(self, frame):
-        """זיהוי פנים בתמונה"""
-        if not self.known_face_encodings:
-            return [], []
-        
-        # המרה ל-RGB עבור face_recognition
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # איתור פנים בתמונה
-        face_locations = face_recognition.face_locations(rgb_frame)
-        
-        if not face_locations:
-            return [], []
-        
-        # יצירת encodings לפנים שנמצאו - חשוב! השתמש ב-rgb_frame
-        face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-        
-        face_names = []
-        for face_encoding in face_encodings:
-            # השוואה עם פנים ידועות
-            matches = face_recognition.compare_faces(self.known_face_encodings, face_encoding, tolerance=0.6)
-            name = "Unknown"
-            
-            # אם נמצאה התאמה
-            if True in matches:
-                match_index = matches.index(True)
-                name = self.known_face_names[match_index]
-            else:
-                # שימוש במרחק הקטן ביותר
-                face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
-                if len(face_distances) > 0:
-                    best_match_index = np.argmin(face_distances)
-                    if face_distances[best_match_index] < 0.7:
-                        name = self.known_face_names[best_match_index]
-            
-            face_names.append(name)
-        
-        return face_locations, face_names
+        """זיהוי פנים בתמונה - מיקומים, שמות, ו-encodings שחושבו בתמונה הזו"""
+        face_locations, face_names, _, face_encodings = self.face_pipeline.identify(frame)
+        return face_locations, face_names, face_encodings
     
     def initialize_modules(self):
         """איתחול כל המודולים"""
-        # מודול זיהוי דיבור
-        self.stt = GonzoSTT(self.config)
+        # חצי-דופלקס: בזמן ש-Gonzo מדבר (ועוד tail guard) המיקרופונים לא מפוענחים
+        self.audio_session = AudioSessionCoordinator(
+            tail_guard=self.config.get('audio_tail_guard', 0.3),
+            enabled=self.config.get('half_duplex', True)
+        )
+        
+        # מודול זיהוי דיבור - המודל נטען ברקע בזמן שאר המודולים מאותחלים
+        with self.startup_timings.phase("stt_init"):
+            self.stt = GonzoSTT(self.config, timings=self.startup_timings, audio_session=self.audio_session)
         self.stt.on_wake_word_detected = self.on_wake_word
         
         # מודול המרת טקסט לדיבור
-        self.tts = GonzoTTS(self.config)
+        with self.startup_timings.phase("tts"):
+            self.tts = GonzoTTS(self.config, audio_session=self.audio_session)
+        # כל התגובות הקבועות מוקלטות ברקע - ההשמעה שלהן לא עוברת דרך סינתזה
+        self.tts.prerender(self.response_phrases())
         
         # מודול זיהוי פנים (אם מוגדר בקונפיגורציה)
         use_face_detection = self.config.get('use_face_detection', False)
         self.face = None
         if use_face_detection:
             try:
-                self.face = GonzoFace(self.config)
+                with self.startup_timings.phase("camera"):
+                    self.face = GonzoFace(self.config)
                 print("Face detection module initialized")
+                
+                if self.face_workers > 0:
+                    # זיהוי בתהליכים נפרדים - הלולאה הראשית רק מוסרת תמונות ואוספת תוצאות
+                    with self.startup_timings.phase("face_workers"):
+                        self.face_service = FaceRecognitionService(self.config, workers=self.face_workers)
+                        self.face_service.start()
+                else:
+                    # מסנן ה-Haar של GonzoFace משמש כשלב זול במצב staged
+                    self.face_pipeline = FacePipeline(self.config, self.known_faces,
+                                                      cascade=self.face.face_cascade)
             except Exception as e:
                 print(f"Error initializing face detection: {e}")
         
@@ -203,7 +187,8 @@ class GonzoAI:
         self.serial = None
         if use_serial:
             try:
-                self.serial = GonzoSerial(self.config)
+                with self.startup_timings.phase("serial"):
+                    self.serial = GonzoSerial(self.config)
                 print("Serial communication module initialized")
             except Exception as e:
                 print(f"Error initializing serial module: {e}")
@@ -250,6 +235,10 @@ class GonzoAI:
         
         # בחירת מילון פקודות לפי שפה
         self.available_commands = self.en_commands if self.language == 'en' else self.he_commands
+        
+        # ביטויי הפקודות מאפשרים ל-STT לסיים האזנה ברגע שפקודה מוכרת נאמרה
+        self.stt.set_command_phrases(self.available_commands.keys())
+        self.stt.on_partial_command = self.on_partial_command
     
     def get_response_text(self, key, default=None):
         """קבלת טקסט תגובה לפי מפתח בשפה הנוכחית"""
@@ -269,11 +258,28 @@ class GonzoAI:
         
         return default
     
+    def response_phrases(self):
+        """כל טקסטי התגובות בקונפיגורציה בשפה הנוכחית"""
+        phrases = []
+        for value in self.config.get('responses', {}).values():
+            if isinstance(value, dict):
+                value = value.get(self.language, [])
+            phrases.extend(value if isinstance(value, list) else [value])
+        return [phrase for phrase in phrases if isinstance(phrase, str)]
+    
     def on_wake_word(self, response):
         """מטפל בזיהוי מילת ההפעלה"""
         print(f"Wake word detected, responding with: {response}")
         
-        # השמעת תגובה
+        # פקודה שנאמרה ברצף עם מילת ההפעלה - מפוענחת מה-pre-roll (נשמר מנקודת הזיהוי) לפני
+        # התגובה: בחצי-דופלקס מה שנאמר בזמן ההשמעה לא נשמר, והפקודה הייתה נקטעת באמצע
+        command = self.stt.listen_for_followup_command()
+        if command:
+            # אין צורך באישור - התגובה לפקודה עצמה מספיקה
+            self.process_command(command)
+            return
+        
+        # השמעת תגובה (מהמטמון) - ההאזנה לפקודה מתחילה רק אחרי שהיא הסתיימה, כדי לא לשמוע את עצמנו
         self.tts.speak(response)
         
         # האזנה לפקודה
@@ -285,7 +291,11 @@ class GonzoAI:
             # הודעת שגיאה כאשר לא מזוהה פקודה
             error_msg = self.get_response_text('command_not_understood', 
                                                "I didn't understand that command, please try again.")
-            self.tts.speak(error_msg)
+            self.tts.speak(error_msg, priority=PRIORITY_URGENT, preempt=True)
+    
+    def on_partial_command(self, partial_text):
+        """תוצאה חלקית בזמן שהמשתמש עדיין אומר את הפקודה"""
+        print(f"Hearing: {partial_text}")
     
     def process_command(self, command_text):
         """עיבוד פקודה קולית"""
@@ -308,7 +318,7 @@ class GonzoAI:
             else:
                 error_msg = self.get_response_text('command_not_understood', 
                                                   "I didn't understand that command, please try again.")
-                self.tts.speak(error_msg)
+                self.tts.speak(error_msg, priority=PRIORITY_URGENT, preempt=True)
     
     def turn_light_on(self):
         """הדלקת אור"""
@@ -343,14 +353,21 @@ class GonzoAI:
     def stop_system(self):
         """עצירת המערכת"""
         response = self.get_response_text('system_shutdown', "Shutting down the system. Goodbye!")
-        self.tts.speak(response)
+        # הודעת הכיבוי קוטעת כל דיבור אחר
+        self.tts.speak(response, priority=PRIORITY_URGENT, preempt=True)
         self.running = False
     
-    def process_face_interaction(self, frame, face_locations, face_names):
-        """עיבוד אינטראקציה של זיהוי פנים"""
+    def process_face_interaction(self, frame, face_locations, face_names, face_encodings=None):
+        """עיבוד אינטראקציה של זיהוי פנים - לא חוסם את הלולאה הראשית"""
         current_time = time.time()
+        if face_encodings is None:
+            face_encodings = [None] * len(face_locations)
+        
+        if self.enrollment is not None:
+            # רישום בתהליך - דגימה נוספת של האדם החדש מהתמונה הזו
+            self.enrollment.offer(frame, face_locations, face_encodings, current_time)
         
-        for (top, right, bottom, left), name in zip(face_locations, face_names):
+        for (top, right, bottom, left), name, encoding in zip(face_locations, face_names, face_encodings):
             print(f"Processing face: {name} at location ({left}, {top}, {right}, {bottom})")
             
             if name != "Unknown":
@@ -368,54 +385,80 @@ class GonzoAI:
                         greeting = f"Good night {name}, nice to see you again"
                     
                     print(f"Greeting known person: {greeting}")
-                    self.tts.speak(greeting)
+                    self.speak_face_interaction(greeting)
                     self.last_greeting_time[name] = current_time
                     
-            elif not self.asking_for_name:
-                # אדם לא מוכר - שאלה לשם
+            elif self.enrollment is None and encoding is not None:
+                # אדם לא מוכר - שאלה לשם, מתחילים מה-encoding שכבר חושב בזיהוי
                 print("Unknown person detected - asking for name")
-                self.unknown_face_data = {
-                    'location': (top, right, bottom, left),
-                    'frame': frame.copy()
-                }
-                
-                self.asking_for_name = True
-                self.tts.speak("I see a new face, what is your name please?")
-                
-                # שימוש במיקרופון B לקבלת תשובה
-                print("Waiting for name response...")
-                name_response = self.stt.listen_for_face_interaction()
-                
-                if name_response:
-                    print(f"Person said their name is: {name_response}")
-                    
-                    # הוספת הפנים למאגר
-                    success, message = self.add_new_face_to_database(
-                        self.unknown_face_data['frame'], 
-                        name_response
-                    )
-                    
-                    print(f"Add face result: {success}, {message}")
-                    
-                    if success:
-                        self.tts.speak(f"Thank you {name_response}, I'll remember you")
-                        # עדכון רשימת הפנים הידועות
-                        self.last_greeting_time[name_response] = current_time
-                    else:
-                        self.tts.speak(message)
-                else:
-                    print("No name response received")
-                    self.tts.speak("I didn't catch your name, but nice to meet you anyway")
-                
-                # איפוס משתני האינטראקציה
-                self.asking_for_name = False
-                self.unknown_face_data = None
-                print("Face interaction completed")
+                self.start_enrollment(frame, (top, right, bottom, left), encoding)
+    
+    def speak_face_interaction(self, text):
+        """השמעה ישירות דרך תור ה-TTS - לא מחכה לשאלת שם שממתינה לתשובה ב-thread האינטראקציה"""
+        return self.tts.say(text)
+    
+    def ask_for_name(self):
+        """רץ ב-thread של האינטראקציה: השאלה, ואז האזנה לתשובה במיקרופון B"""
+        self.tts.speak("I see a new face, what is your name please?")
+        print("Waiting for name response...")
+        return self.stt.listen_for_face_interaction()
+    
+    def collect_unknown_faces(self, enabled):
+        """בזמן רישום - encoding חדש לפנים לא מוכרות בכל זיהוי (דגימות לרישום)"""
+        if self.face_pipeline is not None:
+            self.face_pipeline.collect_unknown = enabled
+        if self.face_service is not None:
+            self.face_service.collect_unknown(enabled)
+    
+    def start_enrollment(self, frame, location, encoding):
+        """פתיחת רישום - השאלה וההאזנה רצות ברקע והווידאו ממשיך
+        
+        frame חייבת להיות התמונה ש-location חושב עליה (result.frame בשירות העובדים)
+        """
+        self.enrollment = FaceEnrollment(
+            self.interaction_executor.submit(self.ask_for_name), encoding, location, frame,
+            max_samples=self.config.get('face_enrollment_samples', 5),
+            min_size=self.config.get('face_enrollment_min_size', 80),
+            min_sharpness=self.config.get('face_enrollment_min_sharpness', 50.0)
+        )
+        self.asking_for_name = True
+        self.collect_unknown_faces(True)
+    
+    def update_enrollment(self):
+        """בדיקה בכל סבב של הלולאה הראשית אם התשובה לשאלת השם הגיעה"""
+        enrollment = self.enrollment
+        if enrollment is None or enrollment.poll() == FaceEnrollment.LISTENING:
+            return
+        
+        # איפוס משתני האינטראקציה
+        self.enrollment = None
+        self.asking_for_name = False
+        self.collect_unknown_faces(False)
+        
+        if enrollment.state == FaceEnrollment.COMPLETE:
+            name_response = enrollment.name
+            print(f"Person said their name is: {name_response}")
+            
+            # הוספת כל הדגימות שנאספו למאגר
+            success, message = self.add_face_samples(name_response, enrollment.samples, enrollment.best_crop)
+            print(f"Add face result: {success}, {message} ({enrollment.stats()})")
+            
+            if success:
+                self.speak_face_interaction(f"Thank you {name_response}, I'll remember you")
+                self.last_greeting_time[name_response] = time.time()
+            else:
+                self.speak_face_interaction(message)
+        else:
+            print("No name response received")
+            self.speak_face_interaction("I didn't catch your name, but nice to meet you anyway")
+        print("Face interaction completed")
     
     def start(self):
         """התחלת פעולת המערכת"""
-        # התחלת האזנה למילת הפעלה
+        # התחלת האזנה למילת הפעלה (ה-thread מחכה לטעינת המודל)
         self.stt.start_listening()
+        # סיכום זמני ההפעלה ברגע שהמודל מוכן
+        self.stt.model_ready.add_done_callback(lambda _: self.startup_timings.report())
         
         # התחלת לולאה ראשית
         print(f"Gonzo AI system is running. Say '{self.config.get('wake_word', 'gonzo')}' to activate.")
@@ -430,6 +473,10 @@ class GonzoAI:
         try:
             # לולאה ראשית
             while self.running:
+                # שגיאה בטעינת מודל הדיבור ברקע עוצרת את המערכת (במקום STT שמת בשקט)
+                if self.stt.model_ready.done():
+                    self.stt.wait_until_ready()
+                
                 face_locations = []
                 face_names = []
                 # אם מודול זיהוי פנים פעיל, הפעל אותו
@@ -440,13 +487,27 @@ class GonzoAI:
                         frame_count += 1
                         process_this_frame = (frame_count % 3 == 0)
                         
-                        if process_this_frame and not self.asking_for_name:
+                        # רישום פעיל - האם הגיעה תשובה לשאלת השם
+                        self.update_enrollment()
+                        
+                        if self.face_service is not None:
+                            # כל תמונה נמסרת לעובדים; תמונה שלא הספיקו לעבד מוחלפת בחדשה
+                            self.face_service.submit(frame, self.face.last_sequence)
+                            result = self.face_service.poll()
+                            if result is not None:
+                                face_locations, face_names = result.locations, result.names
+                                if face_locations:
+                                    # המיקומים שייכים לתמונה שזוהתה (result.frame), לא לתמונה האחרונה
+                                    self.process_face_interaction(result.frame, face_locations, face_names,
+                                                                  result.encodings)
+                        
+                        elif process_this_frame:
                             # זיהוי פנים בתמונה באמצעות face_recognition
-                            face_locations, face_names = self.identify_faces_in_frame(frame)
+                            face_locations, face_names, face_encodings = self.identify_faces_in_frame(frame)
                             
                             if face_locations:
                                 # עיבוד אינטראקציית זיהוי פנים
-                                self.process_face_interaction(frame, face_locations, face_names)
+                                self.process_face_interaction(frame, face_locations, face_names, face_encodings)
                             
                         # ציור מסגרות סביב פנים (אם מוצג וידאו)
                         if self.config.get('show_video', False): #and face_locations:
@@ -485,9 +546,9 @@ class GonzoAI:
         if hasattr(self, 'stt'):
             self.stt.stop_listening()
         
-        # סגירת מצלמה
-        if self.face and hasattr(self.face, 'cap') and self.face.cap:
-            self.face.cap.release()
+        # סגירת מצלמה (כולל עצירת thread הלכידה)
+        if self.face:
+            self.face.close()
         
         # סגירת חלונות
         cv2.destroyAllWindows()
@@ -496,6 +557,22 @@ class GonzoAI:
         if self.serial:
             self.serial.close()
         
+        # אינטראקציה שעוד בתור לא תתחיל
+        self.interaction_executor.shutdown(wait=False, cancel_futures=True)
+        
+        print(f"TTS speech stats: {self.tts.speech_stats()}")
+        print(f"Audio session (half-duplex): {self.audio_session.stats()}")
+        if self.tts.phrase_cache is not None:
+            print(f"TTS phrase cache: {self.tts.cache_stats()}")
+        # עצירת ה-worker של הדיבור
+        self.tts.close()
+        
+        # עצירת תהליכי זיהוי הפנים ושחרור הזיכרון המשותף
+        if self.face_service is not None:
+            self.face_service.close()
+        if self.face_pipeline is not None:
+            print(f"Face pipeline stats: {self.face_pipeline.stats()}")
+        
         print("Gonzo AI system stopped.")
 
 # הפעלת המערכת כאשר התסריט רץ ישירות
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("sounddevice")
+from gonzo_audio_capture import AudioRingBuffer
+
+
+def _ramp(start, count):
+    return (np.arange(start, start + count) % 30000).astype(np.int16)
+
+
+def test_read_within_capacity():
+    ring = AudioRingBuffer(1, sample_rate=100)
+    ring.write(_ramp(0, 60))
+    start, samples = ring.read(10, 50)
+    assert start == 10
+    assert np.array_equal(samples, _ramp(10, 40))
+
+
+def test_wraparound_keeps_the_newest_samples_in_order():
+    ring = AudioRingBuffer(1, sample_rate=100)
+    for offset in range(0, 370, 37):
+        ring.write(_ramp(offset, 37))
+    assert ring.write_position == 370
+
+    start, samples = ring.read(0)
+    # רק 100 הדגימות האחרונות נשארו - ההתחלה שנדרסה מדולגת
+    assert start == 270
+    assert np.array_equal(samples, _ramp(270, 100))
+
+
+def test_block_larger_than_capacity():
+    ring = AudioRingBuffer(1, sample_rate=100)
+    ring.write(_ramp(0, 30))
+    ring.write(_ramp(30, 250))
+    assert ring.write_position == 280
+    start, samples = ring.read(0)
+    assert start == 180
+    assert np.array_equal(samples, _ramp(180, 100))
+
+
+def test_position_seconds_ago_is_clamped_to_the_ring():
+    ring = AudioRingBuffer(1, sample_rate=100)
+    ring.write(_ramp(0, 50))
+    assert ring.position_seconds_ago(0.2) == 30
+    assert ring.position_seconds_ago(5) == 0
+    ring.write(_ramp(50, 200))
+    assert ring.position_seconds_ago(5) == 150
+
+
+def test_empty_range():
+    ring = AudioRingBuffer(1, sample_rate=100)
+    ring.write(_ramp(0, 10))
+    start, samples = ring.read(10)
+    assert start == 10
+    assert len(samples) == 0
@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip("sounddevice")
+pytest.importorskip("vosk")
+from gonzo_stt_vosk import CommandEndpointer
+
+BLOCK = 1600  # 100ms ב-16kHz
+
+
+def _run(endpointer, partials):
+    """הזנת partial לכל בלוק - מחזיר (מספר הבלוק, תוצאה) של התוצאה הראשונה"""
+    for i, partial in enumerate(partials):
+        result = endpointer.update(partial, BLOCK)
+        if result is not None:
+            return i, result
+    return None, None
+
+
+def test_known_phrase_ends_after_it_is_stable():
+    endpointer = CommandEndpointer(phrases=("lights on",), trailing_silence=2.0, match_stability=3)
+    index, result = _run(endpointer, ["turn", "turn the", "turn the lights on"] + ["turn the lights on"] * 5)
+    assert result == "turn the lights on"
+    assert index == 5
+
+
+def test_phrase_must_match_whole_words():
+    endpointer = CommandEndpointer(phrases=("on",), trailing_silence=0.5, match_stability=1)
+    index, result = _run(endpointer, ["turn onward"] * 10)
+    assert result is CommandEndpointer.END_OF_UTTERANCE
+    # 0.5 שניות מאז השינוי האחרון
+    assert index == 5
+
+
+def test_trailing_silence_restarts_when_the_partial_changes():
+    endpointer = CommandEndpointer(trailing_silence=0.3)
+    index, result = _run(endpointer, ["what", "what", "what time", "what time", "what time", "what time"])
+    assert result is CommandEndpointer.END_OF_UTTERANCE
+    assert index == 5
+
+
+def test_idle_without_speech():
+    endpointer = CommandEndpointer(trailing_silence=0.5, idle_timeout=1.0)
+    index, result = _run(endpointer, [""] * 11)
+    assert result is None
+    assert endpointer.idle
+
+
+def test_partial_callback_only_on_change():
+    seen = []
+    endpointer = CommandEndpointer(partial_callback=seen.append)
+    _run(endpointer, ["", "hello", "hello", "hello there", ""])
+    assert seen == ["hello", "hello there"]
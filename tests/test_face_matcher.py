@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from gonzo_face_matcher import FaceEncodingMatrix, create_face_index
+
+
+def _identities(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(0, 0.09, size=(count, 128)).astype(np.float32), [f"person_{i}" for i in range(count)]
+
+
+def test_distances_match_numpy_norm():
+    encodings, names = _identities(50)
+    matrix = FaceEncodingMatrix.from_lists(encodings, names)
+    queries = encodings[:3] + 0.01
+    expected = np.linalg.norm(encodings[None, :, :] - queries[:, None, :], axis=2)
+    assert np.allclose(matrix.distances(queries), expected, atol=1e-4)
+
+
+def test_match_names_and_margin():
+    encodings, names = _identities(20)
+    matrix = FaceEncodingMatrix.from_lists(encodings, names)
+    # שני encodings לאותו אדם - ה-margin נמדד מול אדם אחר
+    matrix.add(encodings[3] + 0.001, "person_3")
+
+    far = np.full(128, 5.0, dtype=np.float32)
+    matches = matrix.match([encodings[3], encodings[7], far], tolerance=0.6)
+    assert [match.name for match in matches] == ["person_3", "person_7", None]
+    assert matches[0].index == 3
+    second = np.sort(np.linalg.norm(np.delete(encodings, 3, axis=0) - encodings[3], axis=1))[0]
+    assert matches[0].margin == pytest.approx(second, abs=1e-3)
+    assert matrix.name_of(20) == "person_3"
+
+
+def test_empty_matrix_and_empty_query():
+    matrix = FaceEncodingMatrix()
+    assert matrix.match([]) == []
+    match, = matrix.match(np.zeros((1, 128), dtype=np.float32))
+    assert match.name is None and match.index == -1
+
+
+def test_growth_keeps_rows():
+    encodings, names = _identities(200)
+    matrix = FaceEncodingMatrix(capacity=4)
+    for encoding, name in zip(encodings, names):
+        matrix.add(encoding, name)
+    assert len(matrix) == 200
+    assert np.array_equal(matrix.encodings, encodings)
+    assert matrix.names == names
+
+
+def test_ivf_recall_against_exact_search():
+    encodings, names = _identities(4000)
+    exact = FaceEncodingMatrix.from_lists(encodings, names)
+    ivf = FaceEncodingMatrix.from_lists(encodings, names, index=create_face_index("ivf", nprobe=8))
+    assert ivf.index.centroids is not None
+
+    rng = np.random.default_rng(1)
+    probe = encodings[rng.choice(len(encodings), 200, replace=False)]
+    probe = probe + rng.normal(0, 0.02, probe.shape).astype(np.float32)
+    expected = [match.index for match in exact.match(probe)]
+    found = [match.index for match in ivf.match(probe)]
+    recall = np.mean(np.array(expected) == np.array(found))
+    assert recall >= 0.95
+
+
+def test_ivf_untrained_falls_back_to_full_scan():
+    encodings, names = _identities(100)
+    ivf = FaceEncodingMatrix.from_lists(encodings, names, index=create_face_index("ivf"))
+    assert ivf.index.centroids is None
+    assert [match.index for match in ivf.match(encodings[:10])] == list(range(10))
+
+
+def test_ivf_appends_new_rows_to_buckets():
+    encodings, names = _identities(1200)
+    ivf = FaceEncodingMatrix.from_lists(encodings[:1000], names[:1000],
+                                        index=create_face_index("ivf", nprobe=4))
+    ivf.extend(encodings[1000:], names[1000:])
+    assert ivf.index.trained_size == 1000
+    matches = ivf.match(encodings[1000:1050])
+    assert [match.index for match in matches] == list(range(1000, 1050))
+
+
+def test_unknown_index_kind():
+    with pytest.raises(ValueError):
+        create_face_index("lsh")
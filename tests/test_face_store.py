@@ -0,0 +1,101 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from gonzo_face_store import FaceStore, migrate_pickle
+
+
+def _encoding(value):
+    return np.full(128, value, dtype=np.float32)
+
+
+def test_append_survives_reopen_and_growth(tmp_path):
+    directory = str(tmp_path / "store")
+    store = FaceStore(directory, initial_capacity=2)
+    for i in range(5):
+        assert store.append(_encoding(i), f"person_{i}") == i
+    assert store.capacity == 8
+    del store
+
+    reopened = FaceStore(directory)
+    assert reopened.names == [f"person_{i}" for i in range(5)]
+    assert np.array_equal(reopened.encodings[:, 0], np.arange(5, dtype=np.float32))
+
+
+def test_torn_journal_line_is_dropped(tmp_path):
+    directory = str(tmp_path / "store")
+    store = FaceStore(directory)
+    store.append(_encoding(1), "alice")
+    store.append(_encoding(2), "bob")
+    journal = store.journal_path
+    del store
+
+    size = os.path.getsize(journal)
+    with open(journal, 'ab') as f:
+        f.write(b'{"row": 2, "name": "car')
+
+    readonly = FaceStore(directory, readonly=True)
+    assert readonly.names == ["alice", "bob"]
+    # קריאה בלבד לא מתקנת את הקובץ
+    assert os.path.getsize(journal) > size
+    del readonly
+
+    repaired = FaceStore(directory)
+    assert repaired.names == ["alice", "bob"]
+    assert os.path.getsize(journal) == size
+    assert repaired.append(_encoding(3), "carol") == 2
+
+
+def test_journal_rows_out_of_order_stop_the_replay(tmp_path):
+    directory = str(tmp_path / "store")
+    store = FaceStore(directory)
+    store.append(_encoding(1), "alice")
+    with open(store.journal_path, 'a', encoding='utf-8') as f:
+        f.write('{"row": 5, "name": "mallory", "added": ""}\n')
+    del store
+    assert FaceStore(directory).names == ["alice"]
+
+
+def test_readonly_store(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        FaceStore(str(tmp_path / "missing"), readonly=True)
+    FaceStore(str(tmp_path / "store")).append(_encoding(1), "alice")
+    readonly = FaceStore(str(tmp_path / "store"), readonly=True)
+    with pytest.raises(PermissionError):
+        readonly.append(_encoding(2), "bob")
+
+
+def test_migrate_pickle(tmp_path):
+    pickle_path = tmp_path / "known_faces.pkl"
+    encodings = [_encoding(i) for i in range(3)]
+    with open(pickle_path, 'wb') as f:
+        pickle.dump({"encodings": encodings, "names": ["a", "b", "a"]}, f)
+
+    directory = str(tmp_path / "face_store")
+    # שארית של העברה שנקטעה
+    os.makedirs(directory + ".migrating")
+    open(os.path.join(directory + ".migrating", "journal.jsonl"), 'w').close()
+
+    store = migrate_pickle(str(pickle_path), directory)
+    assert store.names == ["a", "b", "a"]
+    assert np.array_equal(store.encodings, np.stack(encodings))
+    assert not os.path.exists(directory + ".migrating")
+    assert pickle_path.exists()
+
+    with pytest.raises(FileExistsError):
+        migrate_pickle(str(pickle_path), directory)
+
+
+def test_migrate_refuses_to_delete_foreign_directory(tmp_path):
+    pickle_path = tmp_path / "known_faces.pkl"
+    with open(pickle_path, 'wb') as f:
+        pickle.dump({"encodings": [], "names": []}, f)
+    directory = tmp_path / "face_store"
+    directory.mkdir()
+    (directory / "notes.txt").write_text("keep me")
+
+    with pytest.raises(FileExistsError):
+        migrate_pickle(str(pickle_path), str(directory))
+    assert (directory / "notes.txt").exists()
@@ -0,0 +1,64 @@
+import pytest
+
+pytest.importorskip("cv2")
+from gonzo_face_tracker import FaceTracker, _iou
+
+
+def test_iou():
+    box = (0, 10, 10, 0)
+    assert _iou(box, box) == 1.0
+    assert _iou(box, (20, 30, 30, 20)) == 0.0
+    # חפיפה של חצי רוחב: 50 / (100 + 100 - 50)
+    assert _iou(box, (0, 15, 10, 5)) == pytest.approx(1 / 3)
+
+
+def test_moving_face_keeps_its_track():
+    tracker = FaceTracker()
+    first, = tracker.update([(100, 200, 200, 100)], now=0.0)
+    second, = tracker.update([(105, 210, 205, 110)], now=0.1)
+    assert second is first
+    assert second.box == (105, 210, 205, 110)
+    assert tracker.tracks_created == 1
+
+
+def test_fast_move_matches_by_centroid():
+    tracker = FaceTracker(iou_threshold=0.3, max_centroid_distance=0.5)
+    first, = tracker.update([(100, 200, 200, 100)], now=0.0)
+    # IoU נמוך, אבל המרכז זז פחות מחצי רוחב
+    second, = tracker.update([(100, 240, 200, 140)], now=0.1)
+    assert second is first
+
+
+def test_two_faces_are_assigned_by_best_overlap():
+    tracker = FaceTracker()
+    left, right = tracker.update([(0, 100, 100, 0), (0, 300, 100, 200)], now=0.0)
+    new_right, new_left = tracker.update([(0, 305, 100, 205), (0, 95, 100, -5)], now=0.1)
+    assert new_left is left and new_right is right
+
+
+def test_lost_track_is_identified_again():
+    tracker = FaceTracker(max_missed=2)
+    track, = tracker.update([(0, 100, 100, 0)], now=0.0)
+    tracker.identified(track, encoding=None, name="alice", now=0.0)
+    assert not tracker.needs_identification(track, now=1.0)
+
+    for step in range(3):
+        tracker.update([], now=0.1 * (step + 1))
+    assert tracker.tracks == []
+    assert tracker.tracks_lost == 1
+
+    again, = tracker.update([(0, 100, 100, 0)], now=1.0)
+    assert again is not track
+    assert tracker.needs_identification(again, now=1.0)
+
+
+def test_reverify_interval_and_invalidate():
+    tracker = FaceTracker(reverify_interval=5.0)
+    track, = tracker.update([(0, 100, 100, 0)], now=0.0)
+    tracker.identified(track, encoding=None, name="alice", now=0.0)
+    assert not tracker.needs_identification(track, now=4.9)
+    assert tracker.needs_identification(track, now=5.0)
+
+    tracker.identified(track, encoding=None, name="alice", now=5.0)
+    tracker.invalidate()
+    assert tracker.needs_identification(track, now=5.1)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from scipy import signal
+
+from gonzo_resampler import StreamingResampler
+
+
+def _reference(resampler, samples):
+    """אותו מסנן, על כל האות בבת אחת"""
+    taps = signal.firwin(resampler.up * resampler.taps_per_phase, 1.0 / max(resampler.up, resampler.down),
+                         window=('kaiser', 5.0)) * resampler.up
+    expected = signal.upfirdn(taps, samples.astype(np.float64), resampler.up, resampler.down)
+    return np.clip(expected, -32768, 32767)
+
+
+@pytest.mark.parametrize("rate", [44100, 48000, 22050, 8000])
+@pytest.mark.parametrize("block_size", [1024, 333])
+def test_streaming_blocks_match_upfirdn(rate, block_size):
+    rng = np.random.default_rng(0)
+    samples = rng.normal(0, 3000, rate).astype(np.int16)
+    resampler = StreamingResampler(rate)
+
+    out = np.zeros(resampler.max_output_length(block_size), dtype=np.int16)
+    chunks = []
+    for start in range(0, len(samples), block_size):
+        n = resampler.process_into(samples[start:start + block_size], out)
+        chunks.append(out[:n].copy())
+    streamed = np.concatenate(chunks)
+
+    expected = _reference(resampler, samples)[:len(streamed)]
+    assert len(streamed) == 16000  # שנייה אחת של קלט
+    # float32 מול float64 וחיתוך ל-int16 - עד יחידה אחת
+    assert np.abs(streamed.astype(np.float64) - np.trunc(expected)).max() <= 1
+
+
+def test_block_output_never_exceeds_max_output_length():
+    resampler = StreamingResampler(44100)
+    samples = np.zeros(1024, dtype=np.int16)
+    for _ in range(500):
+        assert len(resampler.process_array(samples)) <= resampler.max_output_length(1024)
+
+
+def test_passthrough_returns_input():
+    resampler = StreamingResampler(16000)
+    samples = np.arange(100, dtype=np.int16)
+    assert resampler.passthrough
+    assert np.array_equal(resampler.process_array(samples), samples)
+
+
+def test_reset_drops_history():
+    rng = np.random.default_rng(1)
+    samples = rng.normal(0, 3000, 4410).astype(np.int16)
+    fresh = StreamingResampler(44100).process_array(samples)
+
+    resampler = StreamingResampler(44100)
+    resampler.process_array(rng.normal(0, 3000, 1000).astype(np.int16))
+    resampler.reset()
+    assert np.array_equal(resampler.process_array(samples), fresh)
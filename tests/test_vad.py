@@ -0,0 +1,105 @@
+import numpy as np
+
+from gonzo_vad import NoiseFloor, VoiceActivityGate
+
+BLOCK = 1600  # 100ms ב-16kHz
+
+
+class _Block:
+    """AudioBlock מינימלי שסופר הפניות"""
+
+    def __init__(self, samples):
+        self.pcm = samples
+        self.length = len(samples)
+        self.refs = 1
+
+    def retain(self):
+        self.refs += 1
+
+    def release(self):
+        self.refs -= 1
+
+
+def _quiet(rng):
+    return rng.normal(0, 30, BLOCK).astype(np.int16)
+
+
+def _speech(amplitude=5000, frequency=300):
+    t = np.arange(BLOCK) / 16000
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+
+
+def _feed(gate, samples):
+    block = _Block(samples)
+    passed = gate.process(block)
+    block.release()
+    return block, passed
+
+
+def _gate(**options):
+    settings = dict(hangover_seconds=0.3, padding_seconds=0.2)
+    settings.update(options)
+    return VoiceActivityGate(**settings)
+
+
+def test_silence_is_skipped_and_padding_is_bounded():
+    rng = np.random.default_rng(0)
+    gate = _gate()
+    blocks = [_feed(gate, _quiet(rng)) for _ in range(10)]
+
+    assert all(passed == [] for _, passed in blocks)
+    # רק 2 הבלוקים האחרונים (0.2 שניות) מוחזקים כ-padding
+    assert [block.refs for block, _ in blocks] == [0] * 8 + [1, 1]
+    assert gate.skipped_samples == 8 * BLOCK
+
+
+def test_speech_onset_replays_padding_then_hangover_passes_silence():
+    rng = np.random.default_rng(0)
+    gate = _gate()
+    quiet = [_feed(gate, _quiet(rng))[0] for _ in range(5)]
+
+    onset, passed = _feed(gate, _speech())
+    assert passed == quiet[-2:] + [onset]
+    for block in passed:
+        block.release()
+
+    # hangover של 0.3 שניות: שלושה בלוקים שקטים עוד עוברים, הרביעי לא
+    after = [_feed(gate, _quiet(rng)) for _ in range(4)]
+    assert [len(passed) for _, passed in after] == [1, 1, 1, 0]
+    for _, passed in after:
+        for block in passed:
+            block.release()
+
+    gate.reset()
+    assert all(block.refs == 0 for block in quiet + [onset] + [block for block, _ in after])
+
+
+def test_noise_floor_only_learns_from_non_speech():
+    rng = np.random.default_rng(0)
+    gate = _gate()
+    for _ in range(5):
+        _feed(gate, _quiet(rng))
+    floor = gate.noise_floor.level
+    for _ in range(10):
+        _feed(gate, _speech())
+    assert gate.noise_floor.level == floor
+
+
+def test_lasting_noise_rise_closes_the_gate():
+    rng = np.random.default_rng(0)
+    gate = _gate(max_speech_seconds=1.0)
+    for _ in range(5):
+        _feed(gate, _quiet(rng))
+    # "רעש" קבוע שנראה כמו דיבור - הרצפה מתחילה לעלות אחרי שנייה ברציפות
+    hum = [gate.is_speech(_speech(amplitude=600)) for _ in range(600)]
+    assert hum[0]
+    assert not hum[-1]
+
+
+def test_noise_floor_falls_fast_and_rises_slowly():
+    floor = NoiseFloor(attack=0.5, release=0.1, minimum=1.0)
+    floor.update(100.0)
+    floor.update(0.0)
+    assert floor.level == 50.0
+    floor.update(150.0)
+    assert floor.level == 60.0